@@ -0,0 +1,514 @@
+import numpy as np
+import pandas as pd
+import constants
+import normalization
+
+# Hours either side of the schedule still counted as "On schedule"
+COMPLIANCE_TOLERANCE = 0.5
+
+COMPLIANCE_COLUMNS = ['Date', 'Year', 'Month', 'Weekday', 'Generator', 'Expected', 'Actual', 'Variance', 'Status']
+
+
+def schedule_frame(schedule=None):
+    """DAILY_SCHEDULE as a (Weekday, Generator, Expected) table."""
+    schedule = constants.DAILY_SCHEDULE if schedule is None else schedule
+    rows = [(day, gen, hours) for day, gens in schedule.items() for gen, hours in gens.items()]
+    return pd.DataFrame(rows, columns=['Weekday', 'Generator', 'Expected'])
+
+
+def compute_schedule_compliance(run_time, schedule=None, tolerance=COMPLIANCE_TOLERANCE):
+    """Expected vs actual generator hours for every day of the runtime log.
+
+    The schedule is expanded over the whole date range of the log with a
+    single merge on weekday, then outer-joined with the actual hours per
+    generator per day, so days a scheduled generator never ran (and runs
+    with no schedule) both show up. No Python loop over days.
+    """
+    if run_time is None or run_time.empty or 'Date' not in run_time.columns:
+        return pd.DataFrame(columns=COMPLIANCE_COLUMNS)
+
+    log = pd.DataFrame({
+        'Date': pd.to_datetime(run_time['Date'], errors='coerce').dt.normalize(),
+        'Generator': run_time['Generator'].astype(str),
+        'Actual': pd.to_numeric(run_time['Hours Operated'], errors='coerce').fillna(0),
+    }).dropna(subset=['Date'])
+    if log.empty:
+        return pd.DataFrame(columns=COMPLIANCE_COLUMNS)
+
+    actual = log.groupby(['Date', 'Generator'], as_index=False, observed=True)['Actual'].sum()
+
+    days = pd.DataFrame({'Date': pd.date_range(actual['Date'].min(), actual['Date'].max(), freq='D')})
+    days['Weekday'] = days['Date'].dt.dayofweek
+    expected = days.merge(schedule_frame(schedule), on='Weekday')
+
+    compliance = expected.merge(actual, on=['Date', 'Generator'], how='outer')
+    compliance['Weekday'] = compliance['Date'].dt.dayofweek
+    compliance['Expected'] = compliance['Expected'].fillna(0)
+    compliance['Actual'] = compliance['Actual'].fillna(0)
+    compliance['Variance'] = compliance['Actual'] - compliance['Expected']
+
+    compliance['Status'] = np.select(
+        [
+            (compliance['Expected'] == 0) & (compliance['Actual'] > 0),
+            compliance['Variance'] > tolerance,
+            compliance['Variance'] < -tolerance,
+        ],
+        ['Unscheduled', 'Over-run', 'Under-run'],
+        default='On schedule'
+    )
+    # Generators that were neither scheduled nor run that day carry no information
+    compliance = compliance[(compliance['Expected'] > 0) | (compliance['Actual'] > 0)]
+
+    compliance['Year'] = compliance['Date'].dt.strftime('%Y')
+    compliance['Month'] = compliance['Date'].dt.strftime('%B')
+    return compliance[COMPLIANCE_COLUMNS].sort_values(['Date', 'Generator']).reset_index(drop=True)
+
+
+def summarize_compliance(compliance):
+    """Per-generator totals for a (filtered) compliance table."""
+    if compliance.empty:
+        return pd.DataFrame(columns=['Generator', 'Expected', 'Actual', 'Variance', 'Over-run', 'Under-run', 'Scheduled Days', 'On Schedule'])
+
+    status = pd.crosstab(compliance['Generator'], compliance['Status'])
+    summary = compliance.groupby('Generator')[['Expected', 'Actual', 'Variance']].sum()
+    summary['Over-run'] = status.get('Over-run', 0)
+    summary['Under-run'] = status.get('Under-run', 0)
+    summary['Scheduled Days'] = compliance[compliance['Expected'] > 0].groupby('Generator').size()
+    summary['On Schedule'] = status.get('On schedule', 0)
+    summary = summary.fillna(0)
+    summary[['Over-run', 'Under-run', 'Scheduled Days', 'On Schedule']] = summary[['Over-run', 'Under-run', 'Scheduled Days', 'On Schedule']].astype(int)
+    return summary.reset_index()
+
+
+# --- Fuel Efficiency ---
+# Robust z-score (median/MAD) above which a month's litres per hour is flagged
+FUEL_ANOMALY_Z = 3.0
+
+FUEL_EFFICIENCY_COLUMNS = [
+    'Year', 'Month', 'Generator', 'Fuel Purchased', 'Total Fuel Used', 'Hours Operated', 'Fuel Cost',
+    'Litres per Hour', 'Cost per Hour', 'Cost per Litre', 'Deviation %', 'Anomaly', 'Anomaly Reason'
+]
+
+
+def compute_fuel_efficiency(df_supplied, df_agg, df_cost, z_threshold=FUEL_ANOMALY_Z):
+    """Monthly fuel/runtime/cost fact table with efficiency ratios and anomaly flags.
+
+    Joins fuel supplied and used, hours operated and fuel spend on
+    Year/Month (and Generator when the fuel sheet records it; otherwise the
+    Generator column is 'All'). Months whose litres per hour sit far from
+    that generator's typical rate, or where fuel was used without any
+    runtime logged (or the reverse), are flagged.
+    """
+    if df_supplied is None or df_supplied.empty:
+        return pd.DataFrame(columns=FUEL_EFFICIENCY_COLUMNS)
+
+    per_generator = 'Generator' in df_supplied.columns
+    keys = ['Year', 'Month', 'Generator'] if per_generator else ['Year', 'Month']
+
+    fuel = df_supplied[keys + ['Fuel Purchased', 'Total Fuel Used']].copy()
+    for col in ['Fuel Purchased', 'Total Fuel Used']:
+        fuel[col] = pd.to_numeric(fuel[col], errors='coerce')
+    fuel = fuel.groupby(keys, as_index=False, observed=True)[['Fuel Purchased', 'Total Fuel Used']].sum(min_count=1)
+
+    hours = df_agg.copy()
+    hours['Month'] = hours['Month'].astype(str)
+    hours = hours.groupby(keys, as_index=False, observed=True)['Hours Operated'].sum()
+
+    fuel_rows = df_cost[df_cost['Type of Activity'].astype(str).str.contains('Fuel', case=False, na=False)]
+    spend = fuel_rows.assign(**{'Fuel Cost': pd.to_numeric(fuel_rows['Amount (NGN)'], errors='coerce')})
+    spend = spend.groupby(keys, as_index=False, observed=True)['Fuel Cost'].sum()
+
+    table = fuel.merge(hours, on=keys, how='left').merge(spend, on=keys, how='left')
+    if not per_generator:
+        table['Generator'] = 'All'
+    table[['Hours Operated', 'Fuel Cost']] = table[['Hours Operated', 'Fuel Cost']].fillna(0)
+
+    used = table['Total Fuel Used']
+    hrs = table['Hours Operated']
+    table['Litres per Hour'] = (used / hrs).where(hrs > 0)
+    table['Cost per Hour'] = (table['Fuel Cost'] / hrs).where(hrs > 0)
+    table['Cost per Litre'] = (table['Fuel Cost'] / table['Fuel Purchased']).where(table['Fuel Purchased'] > 0)
+
+    rate = table['Litres per Hour']
+    median = rate.groupby(table['Generator'], observed=True).transform('median')
+    mad = (rate - median).abs().groupby(table['Generator'], observed=True).transform('median')
+    table['Deviation %'] = ((rate - median) / median * 100).where(median > 0)
+    robust_z = ((rate - median) / (1.4826 * mad)).where(mad > 0)
+
+    table['Anomaly Reason'] = np.select(
+        [
+            (used > 0) & (hrs == 0),
+            (used.fillna(0) == 0) & (hrs > 0),
+            robust_z > z_threshold,
+            robust_z < -z_threshold,
+        ],
+        ['Fuel used with no runtime logged', 'Runtime logged with no fuel used',
+         'Consumption high for runtime', 'Consumption low for runtime'],
+        default=''
+    )
+    table['Anomaly'] = table['Anomaly Reason'] != ''
+
+    table['Month'] = pd.Categorical(table['Month'], categories=constants.MONTH_ORDER, ordered=True)
+    return table[FUEL_EFFICIENCY_COLUMNS].sort_values(['Year', 'Month']).reset_index(drop=True)
+
+
+# --- Downtime Reliability ---
+DOWNTIME_PARTITION_KEYS = ['Year', 'Month', 'Generator']
+DOWNTIME_PARTITION_COLUMNS = DOWNTIME_PARTITION_KEYS + ['Outages', 'Downtime Hours', 'Longest Outage', 'Period Hours']
+
+
+def build_downtime_events(df_downTime):
+    """Individual outage events as a compact table indexed by start time.
+
+    Generator, Year and Month are categoricals and durations float32. Events
+    without a usable Date are placed at the start of their Year/Month.
+    """
+    month = df_downTime['Month'].astype(str)
+    period_start = pd.to_datetime(df_downTime['Year'].astype(str) + '-' + month, format='%Y-%B', errors='coerce')
+    if 'Date' in df_downTime.columns:
+        start = pd.to_datetime(df_downTime['Date'], errors='coerce').fillna(period_start)
+    else:
+        start = period_start
+
+    events = pd.DataFrame({
+        'Year': df_downTime['Year'].astype(str).astype('category'),
+        'Month': pd.Categorical(month, categories=constants.MONTH_ORDER, ordered=True),
+        'Generator': df_downTime['Generator'] if isinstance(df_downTime['Generator'].dtype, pd.CategoricalDtype)
+                     else df_downTime['Generator'].astype(str).astype('category'),
+        'Duration_Hours': pd.to_numeric(df_downTime['Duration_Hours'], errors='coerce').fillna(0).astype('float32'),
+    })
+    events.index = pd.DatetimeIndex(start, name='Start')
+    return events[events.index.notna() & events['Month'].notna()].sort_index()
+
+
+def rollup_downtime_partitions(events):
+    """Per Year/Month/Generator outage aggregates, the partitions the reliability metrics combine."""
+    if events.empty:
+        return pd.DataFrame(columns=DOWNTIME_PARTITION_COLUMNS)
+
+    rows = events.reset_index()
+    rows['Month'] = rows['Month'].astype(str)
+    rows['Year'] = rows['Year'].astype(str)
+    rows['Generator'] = rows['Generator'].astype(str)
+    partitions = rows.groupby(DOWNTIME_PARTITION_KEYS, as_index=False).agg(
+        **{'Outages': ('Duration_Hours', 'size'),
+           'Downtime Hours': ('Duration_Hours', 'sum'),
+           'Longest Outage': ('Duration_Hours', 'max')}
+    )
+    period = pd.to_datetime(partitions['Year'] + '-' + partitions['Month'], format='%Y-%B', errors='coerce')
+    partitions['Period Hours'] = period.dt.days_in_month * 24
+    partitions['Month'] = pd.Categorical(partitions['Month'], categories=constants.MONTH_ORDER, ordered=True)
+    return partitions[DOWNTIME_PARTITION_COLUMNS].sort_values(DOWNTIME_PARTITION_KEYS).reset_index(drop=True)
+
+
+def observed_hours(run_time, events, years=None, months=None):
+    """Hours each generator was under observation, limited to the selected years and months.
+
+    A generator is observed from the first to the last day it has a record
+    (hours operated or an outage), whether or not it had outages in between.
+    """
+    dates = pd.concat([
+        pd.DataFrame({'Generator': run_time['Generator'].astype(str), 'Date': pd.to_datetime(run_time['Date'], errors='coerce')})
+        if {'Generator', 'Date'} <= set(run_time.columns) else None,
+        pd.DataFrame({'Generator': events['Generator'].astype(str).to_numpy(), 'Date': events.index}),
+    ]).dropna()
+    if dates.empty:
+        return pd.Series(dtype=float)
+
+    span = dates.groupby('Generator')['Date'].agg(['min', 'max'])
+    days = pd.concat([
+        pd.DataFrame({'Generator': generator, 'Day': pd.date_range(first.normalize(), last.normalize(), freq='D')})
+        for generator, (first, last) in span.iterrows()
+    ])
+    if years:
+        days = days[days['Day'].dt.strftime('%Y').isin([str(y) for y in years])]
+    if months:
+        days = days[days['Day'].dt.strftime('%B').isin(months)]
+    return (days.groupby('Generator').size() * 24.0).astype(float)
+
+
+def reliability_metrics(partitions, observed=None):
+    """Outage count, total downtime, MTTR, MTBF and longest outage per generator.
+
+    MTBF is the generator's observed hours (see observed_hours) minus its
+    downtime, divided by the number of outages. Without `observed`, the
+    months in `partitions` are taken as the observed period.
+    """
+    columns = ['Generator', 'Outages', 'Downtime Hours', 'MTTR', 'MTBF', 'Longest Outage']
+    if partitions.empty:
+        return pd.DataFrame(columns=columns)
+
+    metrics = partitions.groupby('Generator', as_index=False, observed=True).agg(
+        **{'Outages': ('Outages', 'sum'),
+           'Downtime Hours': ('Downtime Hours', 'sum'),
+           'Longest Outage': ('Longest Outage', 'max')}
+    )
+    window = partitions.drop_duplicates(['Year', 'Month'])['Period Hours'].sum()
+    hours = metrics['Generator'].astype(str).map(observed) if observed is not None else pd.Series(float('nan'), index=metrics.index)
+    metrics['MTTR'] = metrics['Downtime Hours'] / metrics['Outages']
+    metrics['MTBF'] = (hours.fillna(window) - metrics['Downtime Hours']) / metrics['Outages']
+    return metrics[columns].sort_values('Downtime Hours', ascending=False).reset_index(drop=True)
+
+
+# --- Stock Reorder Alerts ---
+# The month-end stock level is the first of these columns the stock sheet has
+STOCK_LEVEL_COLUMNS = ['Closing Stock', 'Stock Level', 'Quantity', 'Balance', 'In Stock']
+STOCK_RECEIVED_COLUMNS = ['Received', 'Restocked', 'Purchased']
+STOCK_RATE_MONTHS = 6        # monthly use is averaged over this many recent months
+STOCK_LEAD_MONTHS = 1.0      # from ordering filters to having them on the shelf
+STOCK_SAFETY_MONTHS = 0.5    # extra use kept in hand on top of the lead time
+STOCK_COVER_MONTHS = 3       # a reorder tops stock up to this many months of use
+STOCK_STATUSES = ['Out of stock', 'Reorder', 'OK']
+
+STOCK_KEYS = ['Generator_Size', 'Filter_Type']
+STOCK_ALERT_COLUMNS = STOCK_KEYS + ['As Of', 'Stock', 'Monthly Use', 'Months Left',
+                                    'Depletion Date', 'Reorder Point', 'Reorder Qty', 'Status']
+
+
+def stock_levels(df_stock):
+    """Month-end stock and stock received per generator, filter type and month, or None if the sheet has no levels."""
+    level_col = next((c for c in STOCK_LEVEL_COLUMNS if c in df_stock.columns), None)
+    if df_stock.empty or level_col is None or not set(STOCK_KEYS) <= set(df_stock.columns):
+        return None
+    received_col = next((c for c in STOCK_RECEIVED_COLUMNS if c in df_stock.columns), None)
+
+    levels = pd.DataFrame({
+        'Generator_Size': df_stock['Generator_Size'].astype(str),
+        'Filter_Type': df_stock['Filter_Type'].astype(str).str.strip(),
+        'Date': pd.to_datetime(df_stock['Year'].astype(str) + '-' + df_stock['Month'].astype(str), format='%Y-%B', errors='coerce'),
+        'Stock': pd.to_numeric(df_stock[level_col], errors='coerce'),
+        'Received': pd.to_numeric(df_stock[received_col], errors='coerce').fillna(0) if received_col else 0.0,
+    }).dropna(subset=['Date', 'Stock'])
+    return levels.groupby(STOCK_KEYS + ['Date'], as_index=False)[['Stock', 'Received']].sum()
+
+
+def _project_stock(levels):
+    """Use rate, depletion date and reorder status for every generator/filter type in `levels`."""
+    levels = levels.sort_values(STOCK_KEYS + ['Date'])
+    previous = levels.groupby(STOCK_KEYS)['Stock'].shift()
+    levels['Used'] = (previous + levels['Received'] - levels['Stock']).clip(lower=0)
+
+    recent = levels.dropna(subset=['Used']).groupby(STOCK_KEYS).tail(STOCK_RATE_MONTHS)
+    alerts = levels.groupby(STOCK_KEYS, as_index=False).last()[STOCK_KEYS + ['Date', 'Stock']].rename(columns={'Date': 'As Of'})
+    alerts = alerts.merge(recent.groupby(STOCK_KEYS, as_index=False)['Used'].mean().rename(columns={'Used': 'Monthly Use'}),
+                          on=STOCK_KEYS, how='left')
+    alerts['Monthly Use'] = alerts['Monthly Use'].fillna(0)
+
+    using = alerts['Monthly Use'] > 0
+    alerts['Months Left'] = (alerts['Stock'] / alerts['Monthly Use']).where(using)
+    # Levels are month-end, so stock starts running down from the next month
+    next_month = alerts['As Of'] + pd.offsets.MonthBegin(1)
+    alerts['Depletion Date'] = (next_month + pd.to_timedelta(alerts['Months Left'] * 30.44, unit='D')).dt.normalize()
+    alerts['Reorder Point'] = alerts['Monthly Use'] * (STOCK_LEAD_MONTHS + STOCK_SAFETY_MONTHS)
+    alerts['Reorder Qty'] = np.ceil((alerts['Monthly Use'] * STOCK_COVER_MONTHS - alerts['Stock']).clip(lower=0)).astype(int)
+    alerts['Status'] = np.select(
+        [alerts['Stock'] <= 0, using & (alerts['Stock'] <= alerts['Reorder Point'])],
+        STOCK_STATUSES[:2],
+        default='OK'
+    )
+    return alerts
+
+
+def compute_stock_alerts(df_stock):
+    """Reorder alerts per generator size and filter type, indexed by both.
+
+    Monthly use is the drop in stock from one month-end to the next plus
+    what was received, averaged over STOCK_RATE_MONTHS. Stock at or below
+    the use expected over the lead time plus safety margin is flagged for
+    reorder.
+    """
+    levels = stock_levels(df_stock)
+    if levels is None or levels.empty:
+        return pd.DataFrame(columns=STOCK_ALERT_COLUMNS).set_index(STOCK_KEYS)
+
+    alerts = _project_stock(levels)
+    alerts['Status'] = pd.Categorical(alerts['Status'], categories=STOCK_STATUSES, ordered=True)
+    return alerts[STOCK_ALERT_COLUMNS].set_index(STOCK_KEYS).sort_index()
+
+
+# --- Meter Revenue Anomalies ---
+METER_Z = 3.0                # latest month's z-score against the meter's own monthly history
+METER_MIN_HISTORY = 3        # months of history a meter needs before it's scored
+METER_DROP_MONTHS = 3        # a drop is measured against the median of this many preceding months
+METER_DROP_RATIO = 0.5       # ... and flagged when the month falls below this share of it
+METER_GAP_FACTOR = 3.0       # a top-up is missing after this many of the meter's usual intervals
+METER_MIN_GAP_DAYS = 14      # ... and never sooner than this
+# A transaction's own id, where the sheet has one, tells a repeat purchase from a double entry
+TRANSACTION_ID_COLUMNS = ['Transaction ID', 'Receipt No', 'Receipt Number', 'Token']
+
+METER_ANOMALY_COLUMNS = [
+    'Subscriber', 'Transactions', 'Last Top-up', 'Days Since Top-up', 'Usual Interval', 'Month',
+    'Month Revenue', 'Baseline', 'Z-Score', 'Drop %', 'Duplicates', 'Flags', 'Anomaly'
+]
+
+
+def compute_meter_anomalies(power_df, meter_to_name=None):
+    """Revenue checks for every meter in the power transactions, indexed by meter number.
+
+    Transactions are summed into a meters x months matrix and the latest
+    month in the data is scored against each meter's earlier months, all at
+    once. A latest month that isn't over yet is scaled up to a full month by
+    the days elapsed. Flags:
+
+        Revenue high / low   z-score beyond METER_Z against the meter's own history
+        Sudden drop          below METER_DROP_RATIO of the median of the preceding months
+        Missing top-up       no top-up for METER_GAP_FACTOR times the meter's usual interval
+        Duplicate            the same transaction recorded more than once: the same meter and
+                             transaction id (TRANSACTION_ID_COLUMNS) where the sheet has one,
+                             else the same meter, timestamp and amount
+
+    Days are counted to the last transaction in the data, so a stored
+    snapshot gives the answer it gave when it was live.
+    """
+    if power_df.empty or not {'Meter Number', 'Transaction Date', 'Amount'} <= set(power_df.columns):
+        return pd.DataFrame(columns=METER_ANOMALY_COLUMNS, index=pd.Index([], name='Meter Number'))
+
+    meter_to_name = constants.METER_TO_NAME if meter_to_name is None else meter_to_name
+    timestamp = pd.to_datetime(power_df['Transaction Date'], errors='coerce')
+    id_column = next((column for column in TRANSACTION_ID_COLUMNS if column in power_df.columns), None)
+    frame = pd.DataFrame({
+        'Meter Number': normalization.meter_numbers(power_df['Meter Number']),
+        'Timestamp': timestamp,
+        'Date': timestamp.dt.normalize(),
+        'Amount': pd.to_numeric(power_df['Amount'], errors='coerce'),
+        'Address': power_df['Resident Address'].astype(str) if 'Resident Address' in power_df.columns else '',
+    }).dropna(subset=['Date', 'Amount'])
+    if id_column is not None:
+        ids = power_df[id_column]
+        frame['Transaction ID'] = ids.astype(str).str.strip().where(ids.notna())
+    if frame.empty:
+        return pd.DataFrame(columns=METER_ANOMALY_COLUMNS, index=pd.Index([], name='Meter Number'))
+    as_of = frame['Date'].max()
+
+    # Monthly totals; months before a meter's first transaction are history it doesn't have (NaN)
+    month = frame['Date'].dt.to_period('M')
+    matrix = frame['Amount'].groupby([frame['Meter Number'], month]).sum().unstack()
+    matrix = matrix.reindex(columns=pd.period_range(month.min(), month.max(), freq='M'))
+    matrix = matrix.fillna(0).where(matrix.notna().cummax(axis=1))
+
+    history = matrix.iloc[:, :-1]
+    latest = matrix.iloc[:, -1].fillna(0) / min(as_of.day / as_of.days_in_month, 1.0)
+    months_known = history.notna().sum(axis=1)
+    baseline = history.mean(axis=1)
+    spread = history.std(axis=1)
+    recent = history.iloc[:, -METER_DROP_MONTHS:].median(axis=1)
+
+    anomalies = pd.DataFrame({
+        'Month': matrix.columns[-1].strftime('%B %Y'),
+        'Month Revenue': matrix.iloc[:, -1].fillna(0),
+        'Baseline': baseline,
+        'Z-Score': ((latest - baseline) / spread).where((months_known >= METER_MIN_HISTORY) & (spread > 0)),
+        'Drop %': ((recent - latest) / recent * 100).where((months_known >= METER_DROP_MONTHS) & (recent > 0)),
+    })
+
+    # Top-up intervals: days between a meter's distinct transaction dates
+    days = frame[['Meter Number', 'Date']].drop_duplicates().sort_values(['Meter Number', 'Date'])
+    days['Interval'] = days.groupby('Meter Number')['Date'].diff().dt.days
+    per_meter = days.groupby('Meter Number').agg(**{'Last Top-up': ('Date', 'max'), 'Usual Interval': ('Interval', 'median')})
+    per_meter['Days Since Top-up'] = (as_of - per_meter['Last Top-up']).dt.days
+
+    counts = frame.groupby('Meter Number').agg(Transactions=('Amount', 'size'), Address=('Address', 'last'))
+    if id_column is not None:
+        repeated = frame.duplicated(['Meter Number', 'Transaction ID']) & frame['Transaction ID'].notna()
+    else:
+        repeated = frame.duplicated(['Meter Number', 'Timestamp', 'Amount'])
+    counts['Duplicates'] = repeated.groupby(frame['Meter Number']).sum()
+    anomalies = anomalies.join(per_meter).join(counts)
+
+    anomalies['Subscriber'] = normalization.meter_names(anomalies.index.to_series(), meter_to_name).fillna(anomalies['Address'])
+
+    gap = np.maximum(METER_GAP_FACTOR * anomalies['Usual Interval'], METER_MIN_GAP_DAYS)
+    checks = {
+        'Revenue high': anomalies['Z-Score'] > METER_Z,
+        'Revenue low': anomalies['Z-Score'] < -METER_Z,
+        'Sudden drop': anomalies['Drop %'] > (1 - METER_DROP_RATIO) * 100,
+        'Missing top-up': anomalies['Usual Interval'].notna() & (anomalies['Days Since Top-up'] > gap),
+        'Duplicate': anomalies['Duplicates'] > 0,
+    }
+    flags = pd.DataFrame(checks)
+    anomalies['Flags'] = flags.dot(pd.Index(checks).map(lambda name: name + ', ')).str.rstrip(', ')
+    anomalies['Anomaly'] = flags.any(axis=1)
+    anomalies.index.name = 'Meter Number'
+    return anomalies[METER_ANOMALY_COLUMNS].sort_index()
+
+
+# --- Resampled Time Series ---
+def subscriber_transactions(power_df, meter_to_name=None, aliases=None):
+    """Power transactions with meter numbers mapped to subscriber names, non-subscribers dropped and
+    grouped locations (e.g. NBIC 1/2) combined, per the alias table."""
+    meter_to_name = constants.METER_TO_NAME if meter_to_name is None else meter_to_name
+    aliases = aliases or normalization.default_aliases
+    frame = power_df.copy()
+    frame['Resident Address'] = normalization.meter_names(frame['Meter Number'], meter_to_name).fillna(frame['Resident Address'])
+    frame = frame[~frame['Resident Address'].isin(aliases.trend_excluded)]
+    frame['Resident Address'] = frame['Resident Address'].astype(str).str.strip().replace(aliases.trend_groups)
+    return frame
+
+
+def resample_series(frame, date_col, key_col, value_col, rules=None):
+    """Sum `value_col` per `key_col` into periods, once for every resample rule.
+
+    Returns {granularity: DataFrame[Period, Year, Month, key_col, value_col]}
+    with Year/Month taken from the start of each period so the sidebar
+    filters apply to the cached series directly. Empty periods inside a
+    key's date range are filled with 0.
+    """
+    rules = rules or constants.GRANULARITIES
+    columns = ['Period', 'Year', 'Month', key_col, value_col]
+    if date_col not in frame.columns:
+        return {name: pd.DataFrame(columns=columns) for name in rules}
+
+    dated = frame[[date_col, key_col, value_col]].dropna(subset=[date_col])
+    if dated.empty:
+        return {name: pd.DataFrame(columns=columns) for name in rules}
+    dated = dated.set_index(pd.DatetimeIndex(dated[date_col]))[[key_col, value_col]]
+    return {name: _resample(dated, key_col, value_col, rule) for name, rule in rules.items()}
+
+
+def _resample(dated, key_col, value_col, rule, min_count=0):
+    """Sum `value_col` per `key_col` into `rule` periods of `dated`'s DatetimeIndex.
+
+    With `min_count=1`, periods without any rows are left out instead of summing to 0.
+    """
+    out = dated.groupby(key_col, observed=True)[value_col].resample(rule, label='left', closed='left').sum(min_count=min_count)
+    out = out.dropna().rename_axis([key_col, 'Period']).reset_index()
+    out['Year'] = out['Period'].dt.strftime('%Y')
+    out['Month'] = out['Period'].dt.strftime('%B')
+    return out[['Period', 'Year', 'Month', key_col, value_col]].sort_values(['Period', key_col]).reset_index(drop=True)
+
+
+def build_time_series(power_df, run_time, meter_to_name=None, aliases=None):
+    """Revenue per subscriber and hours per generator at every granularity."""
+    revenue = subscriber_transactions(power_df, meter_to_name, aliases) if 'Transaction Date' in power_df.columns else power_df
+    return {
+        'revenue': resample_series(revenue, 'Transaction Date', 'Resident Address', 'Amount'),
+        'runtime': resample_series(run_time, 'Date', 'Generator', 'Hours Operated'),
+    }
+
+
+def slice_series(series, years=None, months=None, keys=None, key_col=None):
+    """Filter a cached resampled series by the sidebar selections."""
+    if years:
+        series = series[series['Year'].isin(years)]
+    if months:
+        series = series[series['Month'].isin(months)]
+    if keys and key_col:
+        series = series[series[key_col].isin(keys)]
+    return series
+
+
+def select_series(series, granularity, years=None, months=None, keys=None, key_col=None):
+    """A cached series ({granularity: DataFrame}) at `granularity`, filtered by the sidebar selections.
+
+    Weeks and quarters can straddle the selected years or months, so with
+    either filter they are summed again from the selected days instead of
+    being kept or dropped whole by the month they start in.
+    """
+    if granularity in ('day', 'month') or not (years or months):
+        return slice_series(series[granularity], years, months, keys, key_col)
+    daily = slice_series(series['day'], years, months, keys, key_col)
+    if daily.empty:
+        return daily
+    value_col = daily.columns[-1]
+    return _resample(daily.set_index('Period')[[key_col, value_col]], key_col, value_col,
+                     constants.GRANULARITIES[granularity], min_count=1)
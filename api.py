@@ -0,0 +1,196 @@
+"""Read-only query API over the loaded data, registered on the Dash Flask server.
+
+    GET /api/v1/                         list of datasets
+    GET /api/v1/<dataset>?year=2025&month=March,April&format=csv&limit=100&offset=0
+    GET /api/v1/export/<view>?year=2025&format=parquet   full table, streamed
+
+Filters take the same values as the sidebar (`year`, `month`, `location`,
+`generator`; repeat the parameter or separate values with commas) and have
+the same meaning as in the dashboard (`filter` is the stock filter type,
+`meter` a meter number). `site` and `as_of` pick the site and
+a stored snapshot. Results are cached per data generation, and every
+response carries an ETag so pollers get a 304 until the data changes.
+"""
+import hashlib
+import io
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import Response, abort, jsonify, request
+
+import data_loader
+import export
+import memory
+import queries
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# --- API Configuration ---
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+RESULT_CACHE_SIZE = 256
+
+# dataset -> (query function, sidebar filters it accepts)
+DATASETS = {
+    'revenue/monthly': (queries.revenue_by_month, ['year', 'month']),
+    'revenue/locations': (queries.revenue_by_location, ['year', 'month', 'location']),
+    'cost/generators': (queries.cost_by_generator, ['year', 'month', 'generator']),
+    'cost/breakdown': (queries.cost_breakdown, ['year', 'month', 'generator']),
+    'margin/monthly': (queries.margin_by_month, ['year', 'month', 'generator']),
+    'runtime/share': (queries.runtime_share, ['year', 'month', 'generator']),
+    'stock/alerts': (queries.stock_alerts, ['generator', 'filter']),
+    'meters/anomalies': (queries.meter_anomalies, ['location', 'meter']),
+    'forecast': (queries.forecast, ['location', 'generator']),
+}
+
+_FILTER_ARGS = {'year': 'years', 'month': 'months', 'location': 'locations', 'generator': 'generators', 'filter': 'filter_types', 'meter': 'meters'}
+
+_results = memory.LRUCache('api', RESULT_CACHE_SIZE)
+
+
+def _list_arg(name):
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return sorted(set(values))
+
+
+def _int_arg(name, default, maximum=None):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        abort(400, f"'{name}' must be an integer")
+    if value < 0:
+        abort(400, f"'{name}' must not be negative")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _snapshot_arg():
+    site_id = request.args.get('site')
+    if site_id is not None and site_id not in data_loader.sites:
+        abort(404, f"Unknown site '{site_id}'")
+    return data_loader.get_snapshot(site_id, request.args.get('as_of'))
+
+
+def _query(dataset, snap, filters):
+    """Run a dataset query once per (snapshot, filters); later calls are served from memory."""
+    key = (snap.site_id, snap.as_of, snap.generation, dataset, tuple(sorted((k, tuple(v)) for k, v in filters.items())))
+    result = _results.get(key)
+    if result is not None:
+        return result
+
+    query, _ = DATASETS[dataset]
+    result = query(snap, **{_FILTER_ARGS[k]: v for k, v in filters.items()})
+    result = result.assign(**{c: result[c].astype(str) for c in result.columns if str(result[c].dtype) == 'category'})
+
+    _results.put(key, result)
+    return result
+
+
+def _etag(snap, dataset, filters, fmt, limit, offset):
+    raw = json.dumps([snap.site_id, str(snap.as_of), snap.generation, dataset, filters, fmt, limit, offset], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def register_api(app):
+    server = app.server
+
+    @server.route('/api/v1/')
+    def api_index():
+        return jsonify(
+            datasets={name: {'filters': filters} for name, (_, filters) in DATASETS.items()},
+            sites=list(data_loader.sites),
+            formats=['json', 'csv'] + (['arrow'] if pa is not None else []),
+            exports={view: {'filters': filters, 'formats': export.formats()} for view, (_, _, filters) in export.VIEWS.items()},
+        )
+
+    @server.route('/api/v1/export/<view>')
+    def api_export(view):
+        if view not in export.VIEWS:
+            abort(404, f"Unknown export '{view}'")
+        fmt = request.args.get('format', 'csv')
+        if fmt not in export.formats():
+            abort(400, f"Unsupported format '{fmt}'")
+        snap = _snapshot_arg()
+
+        _, _, accepted = export.VIEWS[view]
+        filters = {name: _list_arg(name) for name in accepted if _list_arg(name)}
+        etag = _etag(snap, f"export/{view}", filters, fmt, None, None)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        chunks = export.export_view(view, snap, fmt, **{_FILTER_ARGS[k]: v for k, v in filters.items()})
+        stamp = (snap.as_of or datetime.now()).strftime('%Y%m%d-%H%M')
+        response = Response(chunks, mimetype=export.MIMETYPES[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename="{snap.site_id}-{view}-{stamp}.{fmt}"'
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    @server.route('/api/v1/<path:dataset>')
+    def api_dataset(dataset):
+        if dataset not in DATASETS:
+            abort(404, f"Unknown dataset '{dataset}'")
+        fmt = request.args.get('format', 'json')
+        if fmt not in ('json', 'csv', 'arrow') or (fmt == 'arrow' and pa is None):
+            abort(400, f"Unsupported format '{fmt}'")
+
+        snap = _snapshot_arg()
+
+        _, accepted = DATASETS[dataset]
+        filters = {name: _list_arg(name) for name in accepted if _list_arg(name)}
+        limit = _int_arg('limit', DEFAULT_LIMIT, MAX_LIMIT)
+        offset = _int_arg('offset', 0)
+
+        etag = _etag(snap, dataset, filters, fmt, limit, offset)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        result = _query(dataset, snap, filters)
+        page = result.iloc[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(result) else None
+
+        if fmt == 'csv':
+            response = Response(page.to_csv(index=False), mimetype='text/csv')
+        elif fmt == 'arrow':
+            sink = io.BytesIO()
+            table = pa.Table.from_pandas(page, preserve_index=False)
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            response = Response(sink.getvalue(), mimetype='application/vnd.apache.arrow.stream')
+        else:
+            response = jsonify(
+                dataset=dataset,
+                site=snap.site_id,
+                data_as_of=snap.as_of.isoformat() if snap.as_of else None,
+                generation=snap.generation,
+                filters=filters,
+                total=len(result),
+                limit=limit,
+                offset=offset,
+                next_offset=next_offset,
+                rows=json.loads(page.to_json(orient='records', date_format='iso')),
+            )
+
+        response.headers['X-Total-Count'] = str(len(result))
+        if next_offset is not None:
+            response.headers['Link'] = f'<{request.base_url}?{_with_offset(next_offset)}>; rel="next"'
+        response.set_etag(etag)
+        # Cacheable, but revalidate every time: the ETag changes with each data generation
+        response.cache_control.no_cache = True
+        return response
+
+
+def _with_offset(offset):
+    args = request.args.to_dict(flat=False)
+    args['offset'] = [str(offset)]
+    return urlencode(args, doseq=True)
@@ -1,5 +1,4 @@
 from dash import dash
-import dash_bootstrap_components as dbc
 import os
 import threading
 import sys
@@ -7,6 +6,8 @@ import webbrowser
 import data_loader
 import layout
 import callbacks
+import server_setup
+import api
 
 # Determine assets folder path based on whether running as source or frozen executable
 if getattr(sys, 'frozen', False):
@@ -16,16 +17,23 @@ else:
     # Running from source
     assets_folder = 'assets'
 
+# Bootstrap 5 stylesheet (the dash-bootstrap-components theme URL, without importing the package)
+BOOTSTRAP_CSS = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.6/dist/css/bootstrap.min.css"
 
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], assets_folder=assets_folder)
+app = dash.Dash(__name__, external_stylesheets=[BOOTSTRAP_CSS], assets_folder=assets_folder)
 server = app.server
 app.config.suppress_callback_exceptions = True
+server_setup.configure_server(app)
+api.register_api(app)
 
-# Initial data load
-data_loader.load_all_data()
+# Initial data load, in the background so the server starts listening straight away.
+# Until it lands the dashboard shows empty tables and /readyz answers 503; under
+# gunicorn the master waits for it before forking workers (gunicorn.conf.py).
+data_loader.request_refresh()
 
 # --- App Layout ---
-app.layout = layout.create_layout(app)
+# A function, so each page load gets the current site's filter options
+app.layout = lambda: layout.create_layout(app)
 callbacks.register_callbacks(app)
 
 if __name__ == "__main__":
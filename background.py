@@ -0,0 +1,84 @@
+"""Background callbacks: heavy callbacks run in a separate process, off the request thread.
+
+Opt-in with GRAVITAS_BACKGROUND_CALLBACKS=true. Dash's DiskcacheManager
+starts a new process for every job (there's no pool), which costs far more
+than a chart build from a precomputed snapshot, so by default callbacks run
+inline and only views that take seconds are worth sending here. Results are
+kept in an on-disk cache that every worker of the container shares, so no
+broker is needed. Results are cached per data generation (see `data_key`), so users
+asking for the same filters on the same data get the stored figures instead
+of a new job. While a job runs the browser polls for progress, and can
+cancel it.
+
+Without diskcache installed, or unless enabled, the same callbacks run
+inline as ordinary callbacks.
+"""
+import os
+import sys
+import tempfile
+
+import data_loader
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+# --- Background Job Configuration ---
+JOB_DIR = os.environ.get("GRAVITAS_JOB_DIR", os.path.join(tempfile.gettempdir(), "gravitas-jobs"))
+JOB_CACHE_MB = int(os.environ.get("GRAVITAS_JOB_CACHE_MB", 256))     # older results are culled beyond this
+JOB_EXPIRE = int(os.environ.get("GRAVITAS_JOB_EXPIRE", 3600))        # seconds a result is kept after its last use
+POLL_INTERVAL_MS = 500                                               # how often the browser asks for progress
+ENABLED = os.environ.get("GRAVITAS_BACKGROUND_CALLBACKS", "false").lower() == "true"
+
+
+def data_key():
+    """Identifies the data every site is serving; cached results are only reused while it's unchanged."""
+    return tuple(
+        (site.id, site.snapshot.generation, str(site.snapshot.as_of))
+        for site in data_loader.sites.values() if site.snapshot is not None
+    )
+
+
+def _create_manager():
+    # The frozen desktop build can't start job processes from a bundled interpreter
+    if diskcache is None or not ENABLED or getattr(sys, 'frozen', False):
+        return None
+    return DiskcacheManager(_open_cache(), cache_by=[data_key], expire=JOB_EXPIRE)
+
+
+def _open_cache():
+    return diskcache.Cache(JOB_DIR, size_limit=JOB_CACHE_MB * 1024 * 1024)
+
+
+manager = _create_manager()
+
+
+def after_fork():
+    """Open the job cache afresh in a forked worker instead of sharing the master's sqlite handle."""
+    if manager is not None:
+        manager.handle = _open_cache()
+
+
+def callback_options(progress=None, cancel=None, ignore=None):
+    """Extra app.callback() arguments that make a callback run in the background (none when disabled).
+
+    `ignore` lists positional arguments (by index) that shouldn't be part of
+    the cache key, such as the refresh interval's tick count.
+    """
+    if manager is None:
+        return {}
+    options = {'background': True, 'manager': manager, 'interval': POLL_INTERVAL_MS, 'cache_args_to_ignore': ignore or []}
+    if progress:
+        options['progress'] = progress
+    if cancel:
+        options['cancel'] = cancel
+    return options
+
+
+def split_progress(args):
+    """(set_progress, callback args): background callbacks receive set_progress first, inline ones don't."""
+    if manager is None:
+        return (lambda value: None), args
+    return args[0], args[1:]
@@ -0,0 +1,106 @@
+"""Compare peak memory of the workbook readers used by data_loader.
+
+Builds a synthetic workbook (see dev_source.py), then parses it once with
+each reader in a fresh subprocess and reports wall time and how far the
+process's peak RSS grew while parsing:
+
+    python benchmark_memory.py --transactions 5000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+READERS = ['pandas', 'streaming']
+
+
+def _reset_peak_rss():
+    """Start the peak RSS over from the current RSS; False where the kernel doesn't support it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _max_rss_mb():
+    """Peak RSS since the last reset (VmHWM), else since the process started."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux; it also counts what a parent had before forking us,
+    # which is why the workbook is built in a process of its own
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path, reader):
+    """Parse `path` with `reader` in this process and return the measurements."""
+    import data_loader  # imported here so the baseline RSS includes pandas/openpyxl
+
+    _reset_peak_rss()
+    baseline_rss = _max_rss_mb()
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        frames = data_loader.read_workbook(f, reader=reader)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'reader': reader,
+        'seconds': round(elapsed, 2),
+        'peak_rss_growth_mb': round(_max_rss_mb() - baseline_rss, 1),
+        'output_mb': round(sum(df.memory_usage(deep=True).sum() for df in frames.values()) / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=2000, help="power transactions per month")
+    parser.add_argument('--workbook', help="benchmark an existing .xlsx instead of a synthetic one")
+    parser.add_argument('--measure', choices=READERS, help=argparse.SUPPRESS)
+    parser.add_argument('--build', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.workbook, args.measure)))
+        return
+    if args.build:
+        import dev_source
+        with open(args.workbook, 'wb') as f:
+            f.write(dev_source.build_workbook(transactions_per_month=args.transactions))
+        return
+
+    path = args.workbook
+    if path is None:
+        # Built in its own process so this one stays small for the measuring children it starts
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        subprocess.run([sys.executable, __file__, '--build', '--workbook', path, '--transactions', str(args.transactions)],
+                       check=True)
+
+    try:
+        print(f"Workbook: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        print(f"{'reader':<10} {'time (s)':>9} {'peak RSS +MB':>13} {'output MB':>10}")
+        for reader in READERS:
+            # A fresh interpreter per reader so one run's peak can't hide the other's
+            out = subprocess.run(
+                [sys.executable, __file__, '--measure', reader, '--workbook', path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{r['reader']:<10} {r['seconds']:>9} {r['peak_rss_growth_mb']:>13} {r['output_mb']:>10}")
+    finally:
+        if args.workbook is None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
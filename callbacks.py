@@ -1,13 +1,29 @@
-from dash import Input, Output, callback_context, html, dash_table
-import plotly.express as px
+from dash import Input, Output, State, Patch, callback_context, html, dash_table, no_update
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
 import calendar
-from collections import Counter
-from datetime import datetime
+from urllib.parse import urlencode
 import data_loader
 import constants
+import analytics
+import background
+import downsample
+import export
+import queries
+import layout
+import memory
+import warmup
+
+# Day/week/quarter trend charts: graph -> (time series, key column, value column)
+TRENDS = {
+    'trans_chart': ('revenue', 'Resident Address', 'Amount'),
+    'runtime_chart': ('runtime', 'Generator', 'Hours Operated'),
+}
+TREND_CACHE_SIZE = 64
+
+# Full-resolution series behind the downsampled trend charts, so zooming re-slices them
+# here instead of the browser posting the figure back
+_trends = memory.LRUCache('trends', TREND_CACHE_SIZE)
 
 def register_callbacks(app):
     @app.callback(
@@ -39,246 +55,756 @@ def register_callbacks(app):
 
     @app.callback(
         [
-            Output('revenue_cost_chart', 'figure'),
-            Output('trans_chart', 'figure'),
-            Output('total_revenue', 'children'),
-            Output('operated_hours', 'children'),
-            Output('unplanned_outage', 'children'),
-            Output('total_cost_kpi', 'children'),
-            Output('revenue_change_kpi', 'children'),
-            Output('cost_chart', 'figure'),
-            Output('fuel_chart', 'figure'),
-            Output('fuel_change_kpi', 'children'),
-            Output('downtime_chart', 'figure'),
-            Output('stock_table_container', 'children'),
-            Output('runtime_chart', 'figure'),
-            Output('electrical_table_container', 'children'),
+            Output('location_filter', 'options'),
+            Output('year_filter', 'options'),
+            Output('month_filter', 'options'),
+            Output('generator_type', 'options'),
+            Output('filter_type', 'options'),
+        ],
+        Input('site_filter', 'value'),
+        Input('data-refresh-interval', 'n_intervals'),
+        prevent_initial_call=True
+    )
+    def update_filter_options(selected_site, n_intervals):
+        # Each site has its own locations, years and generators, and they grow as refreshes land
+        options = layout.filter_options(data_loader.get_snapshot(selected_site))
+        return options['location'], options['year'], options['month'], options['generator'], options['filter']
+
+    @app.callback(
+        Output('asof_filter', 'options'),
+        Output('asof_filter', 'value'),
+        Input('site_filter', 'value'),
+        Input('data-refresh-interval', 'n_intervals'),
+    )
+    def update_asof_options(selected_site, n_intervals):
+        # Stored snapshots change as refreshes land and retention thins them out;
+        # switching site goes back to live data since snapshot keys are per site
+        site_changed = any(t['prop_id'] == 'site_filter.value' for t in callback_context.triggered)
+        return layout.asof_options(selected_site), 'live' if site_changed else no_update
+
+    @app.callback(
+        Output('data_status', 'children'),
+        Output('data_status', 'className'),
+        Output('data_status', 'title'),
+        Output('data-refresh-interval', 'interval'),
+        Input('site_filter', 'value'),
+        Input('asof_filter', 'value'),
+        Input('data-refresh-interval', 'n_intervals'),
+    )
+    def update_data_status(selected_site, selected_as_of, n_intervals):
+        # Kick off a background refresh if the data is due; never wait on the source here.
+        # (Not in update_chart: that may run in a job process, which must not start refreshes.)
+        data_loader.request_refresh()
+        interval = layout.poll_interval(selected_site)
+
+        if selected_as_of and selected_as_of != 'live':
+            snap = data_loader.get_snapshot(selected_site, selected_as_of)
+            if snap is not data_loader.get_snapshot(selected_site):
+                return f"Viewing history: data as of {snap.as_of:%d %b %Y, %H:%M}", 'data-status history', "", interval
+
+        status = data_loader.data_status(selected_site)
+        reason = f"Last refresh failed: {status['error']}" if status['error'] else ""
+        if status['as_of'] is None:
+            return "No data loaded yet", 'data-status stale', reason, interval
+
+        text = f"Data as of {status['as_of']:%d %b %Y, %H:%M}"
+        if status['quarantined']:
+            # Rows that failed validation aren't in the figures; say so rather than under-report silently
+            text += f" · {sum(status['quarantined'].values())} row(s) quarantined"
+            counts = ", ".join(f"{sheet}: {n}" for sheet, n in status['quarantined'].items())
+            reason = f"{reason}\n" if reason else ""
+            reason += f"Rows failing validation ({counts}) are left out; download them via Export > Quarantined rows"
+        if status['stale']:
+            return f"{text} (refresh failed, showing last good data)", 'data-status stale', reason, interval
+        return text, 'data-status', reason, interval
+
+    @app.callback(
+        [
+            Output('compliance_chart', 'figure'),
+            Output('schedule_compliance_kpi', 'children'),
         ],
         [
-            Input('location_filter', 'value'),
             Input('month_filter', 'value'),
             Input('year_filter', 'value'),
             Input('generator_type', 'value'),
-            Input('filter_type', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
             Input('data-refresh-interval', 'n_intervals'),
         ]
-    
     )
-    def update_chart(selected_locations, selected_months, selected_years, selected_generators, selected_filter, n_intervals):
-        # Ensure data is fresh
-        data_loader.load_all_data()
-    
-        # Create thread-safe copies of the data for this callback
-        with data_loader.data_lock:
-            local_df_meter = data_loader.df_meter.copy()
-            local_df_cost_2025 = data_loader.df_cost_2025.copy()
-            local_power_df = data_loader.power_df.copy()
-            local_df_supplied = data_loader.df_supplied.copy()
-            local_df_downTime = data_loader.df_downTime.copy()
-            local_df_rc_melt = data_loader.df_rc_melt.copy()
-            local_df_agg = data_loader.df_agg.copy()
-            local_df_cost = data_loader.df_cost.copy()
-            local_run_time = data_loader.run_time.copy()
-            local_df_electrical = data_loader.df_electrical.copy() if data_loader.df_electrical is not None else pd.DataFrame()
-        
-        # === Apply Year Filter ===
-        if selected_years:
-            # Filter all dataframes by selected years
-            if 'Year' in local_df_cost_2025.columns:
-                local_df_cost_2025 = local_df_cost_2025[local_df_cost_2025['Year'].isin(selected_years)]
-            if 'Year' in local_power_df.columns:
-                local_power_df = local_power_df[local_power_df['Year'].isin(selected_years)]
-            if 'Year' in local_df_supplied.columns:
-                local_df_supplied = local_df_supplied[local_df_supplied['Year'].isin(selected_years)]
-            if 'Year' in local_df_downTime.columns:
-                local_df_downTime = local_df_downTime[local_df_downTime['Year'].isin(selected_years)]
-            if 'Year' in local_df_rc_melt.columns:
-                local_df_rc_melt = local_df_rc_melt[local_df_rc_melt['Year'].isin(selected_years)]
-            if 'Year' in local_df_agg.columns:
-                local_df_agg = local_df_agg[local_df_agg['Year'].isin(selected_years)]
-            if 'Year' in local_df_meter.columns:
-                local_df_meter = local_df_meter[local_df_meter['Year'].isin(selected_years)]
-
-        filtered_meter = local_df_meter.copy()
+    def update_compliance(selected_months, selected_years, selected_generators, selected_site, selected_as_of, n_intervals):
+        # Precomputed once per refresh; only filtering and a small groupby happen here
+        compliance = data_loader.get_snapshot(selected_site, selected_as_of).df_compliance
 
-        if selected_locations:
-            filtered_meter = filtered_meter[filtered_meter["Location"].isin(selected_locations)]
-
-        if selected_months:
-            filtered_meter = filtered_meter[filtered_meter["Month"].isin(selected_months)]
-
-        filtered_meter['Total Revenue'] = pd.to_numeric(filtered_meter['Total Revenue'], errors='coerce').fillna(0)
-    
-        gravitas_partner = round(filtered_meter.loc[
-            filtered_meter['Location'].isin(['9mobile', 'Providus', 'Western Lodge']), "Total Revenue"
-        ].sum(), 2)
-
-        gravitas_subscriber = round(filtered_meter.loc[
-            filtered_meter['Location'] == 'Canteen', "Total Revenue"
-        ].sum(), 2)
-    
-        # === Revenue & Cost Calculation ===
-        revenue_from_trans = local_power_df.copy()
-        revenue_from_trans['Amount'] = pd.to_numeric(revenue_from_trans['Amount'], errors='coerce').fillna(0)
-    
-        # Apply year and month filters to transaction data
         if selected_years:
-            revenue_from_trans = revenue_from_trans[revenue_from_trans['Year'].isin(selected_years)]
+            compliance = compliance[compliance['Year'].isin(selected_years)]
         if selected_months:
-            revenue_from_trans = revenue_from_trans[revenue_from_trans['Month'].isin(selected_months)]
-    
-        monthly_revenue = revenue_from_trans.groupby('Month')['Amount'].sum().reset_index()
-        monthly_revenue.columns = ['Month', 'Revenue']
+            compliance = compliance[compliance['Month'].isin(selected_months)]
+        if selected_generators:
+            compliance = compliance[compliance['Generator'].isin(selected_generators)]
 
-        # Add meter revenue to transaction revenue
-        meter_rev_df = local_df_meter.copy()
-        meter_rev_df['Total Revenue'] = pd.to_numeric(meter_rev_df['Total Revenue'], errors='coerce').fillna(0)
-    
-        # Apply year and month filters to meter data
-        if selected_years:
-            meter_rev_df = meter_rev_df[meter_rev_df['Year'].isin(selected_years)]
-        if selected_months:
-            meter_rev_df = meter_rev_df[meter_rev_df['Month'].isin(selected_months)]
-    
-        monthly_meter_revenue = meter_rev_df.groupby('Month')['Total Revenue'].sum().reset_index()
-        monthly_meter_revenue.columns = ['Month', 'Meter_Revenue']
+        summary = analytics.summarize_compliance(compliance)
 
-        # Combine transaction revenue with the additional meter-based revenue
-        if not monthly_meter_revenue.empty:
-            monthly_revenue = monthly_revenue.merge(monthly_meter_revenue, on='Month', how='outer')
-            monthly_revenue['Revenue'] = monthly_revenue['Revenue'].fillna(0) + monthly_revenue['Meter_Revenue'].fillna(0)
-            monthly_revenue = monthly_revenue[['Month', 'Revenue']]
+        scheduled_days = summary['Scheduled Days'].sum()
+        if scheduled_days > 0:
+            compliance_display = f"{summary['On Schedule'].sum() / scheduled_days * 100:,.1f}%"
+        else:
+            compliance_display = "N/A"
 
-        # 2. Cost: Sum all costs (Fuel + Maintenance)
-        cost_by_month = local_df_cost_2025.copy()
-        if selected_months:
-            cost_by_month = cost_by_month[cost_by_month['Month'].isin(selected_months)]
-        if selected_generators:
-            cost_by_month = cost_by_month[cost_by_month['Generator'].isin(selected_generators)]
-
-        # Convert to numeric
-        cost_by_month['Amount (NGN)'] = pd.to_numeric(cost_by_month['Amount (NGN)'], errors='coerce').fillna(0)
-
-        monthly_cost = cost_by_month.groupby('Month')['Amount (NGN)'].sum().reset_index()
-        monthly_cost.columns = ['Month', 'Total_Cost']
-
-        # 3. Merge Revenue and Cost
-        margin_data = monthly_revenue.merge(monthly_cost, on='Month', how='outer').fillna(0)
-
-        # Calculate Gross Margin
-        margin_data['Profit'] = margin_data['Revenue'] - margin_data['Total_Cost']
-        margin_data['Margin_Percent'] = (margin_data['Profit'] / margin_data['Revenue'] * 100).fillna(0)
-        margin_data['Margin_Label'] = margin_data['Margin_Percent'].apply(lambda x: 'Gross Margin' if x >= 0 else 'Gross Margin')
-
-        # Sort by month order
-        margin_data['Month'] = pd.Categorical(margin_data['Month'], categories=constants.MONTH_ORDER, ordered=True)
-        margin_data = margin_data.sort_values('Month')
-
-        # === Revenue vs Cost Chart ===
-        fig_margin = make_subplots(specs=[[{"secondary_y": True}]])
-
-        # Add Revenue bars
-        fig_margin.add_trace(
-            go.Bar(
-                x=margin_data['Month'],
-                y=margin_data['Revenue'],
-                name='Revenue',
-                marker_color=constants.GRACEFIELD_GOLD,
-                text=margin_data['Revenue'],
-                texttemplate='₦%{text:,.0f}',
-                textposition='outside',
-                textfont=dict(size=10),
-                hovertemplate='<b>Revenue</b><br>₦%{y:,.0f}<extra></extra>'
-            ),
-            secondary_y=False)
-        # Add Cost bars
-        fig_margin.add_trace(
-            go.Bar(
-                x=margin_data['Month'],
-                y=margin_data['Total_Cost'],
-                name='Total Cost',
+        fig_compliance = go.Figure()
+        if not summary.empty:
+            custom = summary[['Over-run', 'Under-run', 'Scheduled Days']]
+            fig_compliance.add_trace(go.Bar(
+                x=summary['Generator'], y=summary['Expected'], name='Scheduled',
                 marker_color=constants.GRACEFIELD_DARK,
-                text=margin_data['Total_Cost'],
-                texttemplate='₦%{text:,.0f}',
-                textposition='outside',
-                textfont=dict(size=10),
-                hovertemplate='<b>Total Cost</b><br>₦%{y:,.0f}<extra></extra>'
-            ),
-            secondary_y=False
-        )
+                hovertemplate='<b>%{x}</b><br>Scheduled: %{y:,.0f}h<extra></extra>'
+            ))
+            fig_compliance.add_trace(go.Bar(
+                x=summary['Generator'], y=summary['Actual'], name='Actual',
+                marker_color=constants.GRACEFIELD_GOLD, customdata=custom,
+                hovertemplate=('<b>%{x}</b><br>Actual: %{y:,.0f}h<br>'
+                               'Over-run days: %{customdata[0]}<br>Under-run days: %{customdata[1]}'
+                               ' of %{customdata[2]} scheduled<extra></extra>')
+            ))
+        else:
+            fig_compliance.add_annotation(text="No runtime data available", showarrow=False)
 
-        # Add Profit Margin % line (secondary y-axis)
-        fig_margin.add_trace(
-            go.Scatter(
-                x=margin_data['Month'],
-                y=margin_data['Margin_Percent'],
-                name='Gross Margin %',
-                mode='lines+markers+text',
-                line=dict(color="red", width=3, dash='dash'),
-                marker=dict(size=10, symbol='diamond'),
-                text=margin_data['Margin_Percent'],
-                texttemplate='%{text:.1f}%',
-                textposition='top center',
-                textfont=dict(size=11, color='red'),
-                customdata=margin_data['Margin_Label'],
-                hovertemplate='<b>%{customdata}</b><br>%{y:.1f}%<extra></extra>'
-            ), secondary_y=True
-        )
-        # Update layout
-        fig_margin.update_layout(
-            title=dict(
-                text='💰 Revenue vs Cost with Gross Margin',
-                font=dict(size=14, color='#111827', family='Arial Black'),
-                x=0.5,
-                xanchor='center',
-                pad=dict(t=10, b=20)
-            ),
+        fig_compliance.update_layout(
+            title=dict(text='📅 Schedule Compliance (Scheduled vs Actual Hours)', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
             barmode='group',
-            hovermode='x unified',
+            yaxis_title="Hours",
             template="plotly_white",
-            margin=dict(t=60, b=60, l=60, r=120),
+            autosize=True,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            margin=dict(t=40, b=40, l=40, r=120),
             legend=dict(
                 orientation='v',
-                yanchor='top',
+                x=1.02,
+                xanchor='left',
                 y=1,
+                yanchor='top',
+                font=dict(size=10),
+                bgcolor='rgba(0,0,0,0)',
+                borderwidth=0
+            )
+        )
+
+        return fig_compliance, compliance_display
+
+    @app.callback(
+        Output('fuel_efficiency_chart', 'figure'),
+        [
+            Input('month_filter', 'value'),
+            Input('year_filter', 'value'),
+            Input('generator_type', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
+            Input('data-refresh-interval', 'n_intervals'),
+        ]
+    )
+    def update_fuel_efficiency(selected_months, selected_years, selected_generators, selected_site, selected_as_of, n_intervals):
+        # Joined monthly fact table built at refresh; no raw sheets are touched here
+        efficiency = data_loader.get_snapshot(selected_site, selected_as_of).df_fuel_efficiency
+
+        if selected_years:
+            efficiency = efficiency[efficiency['Year'].isin(selected_years)]
+        if selected_months:
+            efficiency = efficiency[efficiency['Month'].isin(selected_months)]
+        # The fuel sheet may not record generators, in which case rows are site-wide ('All')
+        if selected_generators and (efficiency['Generator'] != 'All').any():
+            efficiency = efficiency[efficiency['Generator'].isin(selected_generators)]
+
+        from plotly.subplots import make_subplots
+        fig_efficiency = make_subplots(specs=[[{"secondary_y": True}]])
+
+        if not efficiency.empty:
+            # Ratios are recomputed from the sums so several years/generators combine correctly
+            monthly = efficiency.groupby('Month', observed=True).agg(
+                used=('Total Fuel Used', 'sum'),
+                hours=('Hours Operated', 'sum'),
+                cost=('Fuel Cost', 'sum'),
+                anomaly=('Anomaly', 'any'),
+                reason=('Anomaly Reason', lambda r: '; '.join(sorted(set(r) - {''}))),
+            ).reset_index()
+            monthly['lph'] = (monthly['used'] / monthly['hours']).where(monthly['hours'] > 0)
+            monthly['cph'] = (monthly['cost'] / monthly['hours']).where(monthly['hours'] > 0)
+            colors = [constants.GRACEFIELD_ORANGE if a else constants.GRACEFIELD_GREEN for a in monthly['anomaly']]
+
+            fig_efficiency.add_trace(go.Bar(
+                x=monthly['Month'], y=monthly['lph'], name='Litres / Hour',
+                marker_color=colors, customdata=monthly[['reason']],
+                hovertemplate='<b>%{x}</b><br>%{y:,.1f} L/h<br>%{customdata[0]}<extra></extra>'
+            ), secondary_y=False)
+            fig_efficiency.add_trace(go.Scatter(
+                x=monthly['Month'], y=monthly['cph'], name='Fuel Cost / Hour',
+                mode='lines+markers', line=dict(color=constants.GRACEFIELD_DARK, width=2),
+                hovertemplate='₦%{y:,.0f}/h<extra></extra>'
+            ), secondary_y=True)
+        else:
+            fig_efficiency.add_annotation(text="No fuel data available", showarrow=False)
+
+        fig_efficiency.update_layout(
+            title=dict(text='⛽ Fuel Efficiency (anomalous months in orange)', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+            template="plotly_white",
+            autosize=True,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            margin=dict(t=40, b=40, l=40, r=120),
+            legend=dict(
+                orientation='v',
+                x=1.08,
                 xanchor='left',
-                x=1.02,
+                y=1,
+                yanchor='top',
+                font=dict(size=10),
                 bgcolor='rgba(0,0,0,0)',
                 borderwidth=0
             )
         )
+        fig_efficiency.update_yaxes(title_text="Litres / Hour", secondary_y=False)
+        fig_efficiency.update_yaxes(title_text="₦ / Hour", secondary_y=True)
+
+        return fig_efficiency
+
+    @app.callback(
+        [
+            Output('stock_alerts_container', 'children'),
+            Output('stock_alerts_tab', 'label'),
+        ],
+        [
+            Input('generator_type', 'value'),
+            Input('filter_type', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
+            Input('data-refresh-interval', 'n_intervals'),
+        ]
+    )
+    def update_stock_alerts(selected_generators, selected_filter, selected_site, selected_as_of, n_intervals):
+        # Use rates and depletion dates are projected at refresh, indexed by generator and filter type
+        alerts = queries.stock_alerts(data_loader.get_snapshot(selected_site, selected_as_of), selected_generators, selected_filter)
+        if alerts.empty:
+            return html.Div("No stock levels to project", style={'padding': '20px', 'textAlign': 'center'}), 'Reorder Alerts'
+
+        flagged = int((alerts['Status'] != 'OK').sum())
+        rows = pd.DataFrame({
+            'Generator': alerts['Generator_Size'],
+            'Filter Type': alerts['Filter_Type'],
+            'Stock': alerts['Stock'],
+            'Use / Month': alerts['Monthly Use'].round(1),
+            'Months Left': alerts['Months Left'].round(1),
+            'Runs Out': alerts['Depletion Date'].dt.strftime('%d %b %Y').fillna('-'),
+            'Reorder At': alerts['Reorder Point'].round(1),
+            'Order Qty': alerts['Reorder Qty'],
+            'Status': alerts['Status'].astype(str),
+            'As Of': alerts['As Of'].dt.strftime('%b %Y'),
+        })
+        table = dash_table.DataTable(
+            data=rows.to_dict('records'),
+            columns=[{'name': c, 'id': c} for c in rows.columns],
+            style_table={'height': '300px', 'overflowY': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'fontSize': '12px'},
+            style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
+            style_data_conditional=[
+                {'if': {'filter_query': '{Status} = "Out of stock"'}, 'backgroundColor': '#fde2e1', 'color': '#9b1c1c'},
+                {'if': {'filter_query': '{Status} = "Reorder"'}, 'backgroundColor': '#fdf0dd', 'color': '#8a4b08'},
+            ],
+            page_size=10
+        )
+        return table, f"Reorder Alerts ({flagged})" if flagged else 'Reorder Alerts'
+
+    @app.callback(
+        [
+            Output('meter_alerts_container', 'children'),
+            Output('meter_alerts_tab', 'label'),
+        ],
+        [
+            Input('location_filter', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
+            Input('data-refresh-interval', 'n_intervals'),
+        ]
+    )
+    def update_meter_alerts(selected_locations, selected_site, selected_as_of, n_intervals):
+        # Scored per meter at refresh, so this only filters and formats the table
+        anomalies = queries.meter_anomalies(data_loader.get_snapshot(selected_site, selected_as_of), selected_locations)
+        if anomalies.empty:
+            return html.Div("No meter transactions to check", style={'padding': '20px', 'textAlign': 'center'}), 'Meter Alerts'
+
+        flagged = int(anomalies['Anomaly'].sum())
+        rows = pd.DataFrame({
+            'Meter': anomalies['Meter Number'],
+            'Subscriber': anomalies['Subscriber'],
+            'Flags': anomalies['Flags'].replace('', '-'),
+            anomalies['Month'].iloc[0]: anomalies['Month Revenue'].map('{:,.0f}'.format),
+            'Monthly Avg': anomalies['Baseline'].map('{:,.0f}'.format, na_action='ignore').fillna('-'),
+            'Z-Score': anomalies['Z-Score'].round(1),
+            'Drop %': anomalies['Drop %'].round(0),
+            'Last Top-up': anomalies['Last Top-up'].dt.strftime('%d %b %Y'),
+            'Days Since': anomalies['Days Since Top-up'],
+            'Duplicates': anomalies['Duplicates'],
+        })
+        table = dash_table.DataTable(
+            data=rows.to_dict('records'),
+            columns=[{'name': c, 'id': c} for c in rows.columns],
+            style_table={'height': '300px', 'overflowY': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'fontSize': '12px'},
+            style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
+            style_data_conditional=[
+                {'if': {'filter_query': '{Flags} != "-"'}, 'backgroundColor': '#fde2e1', 'color': '#9b1c1c'},
+            ],
+            page_size=10
+        )
+        return table, f"Meter Alerts ({flagged})" if flagged else 'Meter Alerts'
+
+    @app.callback(
+        [
+            Output('downtime_drilldown_title', 'children'),
+            Output('downtime_drilldown', 'children'),
+            Output('unplanned_outage_card', 'title'),
+        ],
+        [
+            Input('downtime_chart', 'clickData'),
+            Input('unplanned_outage_card', 'n_clicks'),
+            Input('month_filter', 'value'),
+            Input('year_filter', 'value'),
+            Input('generator_type', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
+            Input('data-refresh-interval', 'n_intervals'),
+        ]
+    )
+    def update_downtime_drilldown(click_data, kpi_clicks, selected_months, selected_years, selected_generators, selected_site, selected_as_of, n_intervals):
+        # Event store and partition rollup are kept at refresh, so drill-down never refetches
+        snap = data_loader.get_snapshot(selected_site, selected_as_of)
+        partitions = snap.df_downtime_partitions
+        events = snap.df_downtime_events
+
+        if selected_years:
+            partitions = partitions[partitions['Year'].isin(selected_years)]
+            events = events[events['Year'].isin(selected_years)]
+        if selected_months:
+            partitions = partitions[partitions['Month'].isin(selected_months)]
+            events = events[events['Month'].isin(selected_months)]
+        if selected_generators:
+            partitions = partitions[partitions['Generator'].isin(selected_generators)]
+            events = events[events['Generator'].isin(selected_generators)]
+
+        observed = analytics.observed_hours(snap.run_time, snap.df_downtime_events, selected_years, selected_months)
+        metrics = analytics.reliability_metrics(partitions, observed)
+        if metrics.empty:
+            kpi_title = "No outages recorded for this selection"
+        else:
+            outages = metrics['Outages'].sum()
+            kpi_title = (f"{outages:,} outages, MTTR {metrics['Downtime Hours'].sum() / outages:,.1f}h, "
+                         f"longest {metrics['Longest Outage'].max():,.1f}h. Click for reliability by generator.")
+
+        table_style = dict(
+            style_table={'height': '300px', 'overflowY': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'minWidth': '80px', 'fontSize': '12px'},
+            style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
+            page_size=10
+        )
+
+        triggered = callback_context.triggered[0]['prop_id'] if callback_context.triggered else ''
+        if triggered.startswith('downtime_chart') and click_data:
+            point = click_data['points'][0]
+            month, generator = point['x'], point['customdata'][0]
+            selected = events[(events['Month'] == month) & (events['Generator'] == generator)]
+            if selected.empty:
+                return f"🛠️ {generator} outages in {month}", html.Div("No individual events recorded", style={'padding': '20px', 'textAlign': 'center'}), kpi_title
+
+            listing = selected.reset_index()
+            listing = pd.DataFrame({
+                'Start': listing['Start'].dt.strftime('%d %b %Y'),
+                'Year': listing['Year'].astype(str),
+                'Generator': listing['Generator'].astype(str),
+                'Duration (h)': listing['Duration_Hours'].astype(float).round(1),
+            })
+            return (
+                f"🛠️ {generator} outages in {month} ({len(listing)} events)",
+                dash_table.DataTable(data=listing.to_dict('records'), columns=[{'name': c, 'id': c} for c in listing.columns], **table_style),
+                kpi_title
+            )
+
+        if metrics.empty:
+            return "🛠️ Generator Reliability", html.Div("No downtime data available", style={'padding': '20px', 'textAlign': 'center'}), kpi_title
+
+        metrics = metrics.astype({'Downtime Hours': float, 'Longest Outage': float}).round({'Downtime Hours': 1, 'MTTR': 1, 'MTBF': 1, 'Longest Outage': 1}).rename(columns={
+            'Downtime Hours': 'Downtime (h)', 'MTTR': 'MTTR (h)', 'MTBF': 'MTBF (h)', 'Longest Outage': 'Longest (h)'
+        })
+        return (
+            "🛠️ Generator Reliability (click a downtime bar for its events)",
+            dash_table.DataTable(data=metrics.to_dict('records'), columns=[{'name': c, 'id': c} for c in metrics.columns], **table_style),
+            kpi_title
+        )
+
+    # Width of the trend plots in pixels, so the server knows how many points are worth sending
+    app.clientside_callback(
+        """
+        function(granularity) {
+            var widths = ['trans_chart', 'runtime_chart'].map(function(id) {
+                var el = document.getElementById(id);
+                return el ? el.offsetWidth : 0;
+            });
+            var width = Math.max.apply(null, widths);
+            return width > 0 ? width : null;
+        }
+        """,
+        Output('plot_width', 'data'),
+        Input('granularity', 'value'),
+    )
+
+    def zoom_trend(graph_id, key_filter_id):
+        """Re-slice a downsampled trend chart at full resolution for the zoomed x range.
+
+        The full series comes from trend_series() on the server; the figure
+        isn't sent back, and only the traces' points are patched.
+        """
+        _, key_col, value_col = TRENDS[graph_id]
+
+        @app.callback(
+            Output(graph_id, 'figure', allow_duplicate=True),
+            Input(graph_id, 'relayoutData'),
+            [
+                State('granularity', 'value'),
+                State('year_filter', 'value'),
+                State('month_filter', 'value'),
+                State(key_filter_id, 'value'),
+                State('site_filter', 'value'),
+                State('asof_filter', 'value'),
+                State('plot_width', 'data'),
+            ],
+            prevent_initial_call=True
+        )
+        def _zoom(relayout, granularity, selected_years, selected_months, selected_keys, selected_site, selected_as_of, plot_width):
+            if not relayout or not granularity or granularity == 'month':
+                return no_update
+
+            if 'xaxis.range[0]' in relayout:
+                x_range = [relayout['xaxis.range[0]'], relayout['xaxis.range[1]']]
+            elif 'xaxis.range' in relayout:
+                x_range = relayout['xaxis.range']
+            elif relayout.get('xaxis.autorange'):
+                x_range = None
+            else:
+                return no_update
+
+            snap = data_loader.get_snapshot(selected_site, selected_as_of)
+            series = trend_series(graph_id, snap, granularity, selected_years, selected_months, selected_keys)
+            if series.empty:
+                return no_update
+            names = series[key_col].unique()   # trace order of the plotted figure
+            if x_range is not None:
+                lo, hi = pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])
+                series = series[(series['Period'] >= lo) & (series['Period'] <= hi)]
+
+            max_points = downsample.points_for_width(plot_width)
+            patch = Patch()
+            for i, name in enumerate(names):
+                points = downsample.downsample_frame(series[series[key_col] == name], 'Period', value_col, max_points=max_points)
+                patch['data'][i]['x'] = points['Period'].dt.strftime('%Y-%m-%d').tolist()
+                patch['data'][i]['y'] = points[value_col].tolist()
+
+            # Keep the user's view; the data has only been refined inside it
+            if x_range is not None:
+                patch['layout']['xaxis']['range'] = x_range
+                patch['layout']['xaxis']['autorange'] = False
+            else:
+                patch['layout']['xaxis']['autorange'] = True
+            return patch
+
+    zoom_trend('trans_chart', 'location_filter')
+    zoom_trend('runtime_chart', 'generator_type')
+
+    @app.callback(
+        Output('export_links', 'children'),
+        Input('location_filter', 'value'),
+        Input('month_filter', 'value'),
+        Input('year_filter', 'value'),
+        Input('generator_type', 'value'),
+        Input('filter_type', 'value'),
+        Input('site_filter', 'value'),
+        Input('asof_filter', 'value'),
+    )
+    def update_export_links(locations, months, years, generators, filter_types, site, as_of):
+        # Links carry the current filters, so a download matches what's on screen
+        selected = {'location': locations, 'month': months, 'year': years, 'generator': generators, 'filter': filter_types}
+        rows = [html.Div("Export", style={'fontWeight': 'bold', 'marginBottom': '4px'})]
+        for view, (title, _, accepted) in export.VIEWS.items():
+            args = {name: ','.join(map(str, selected[name])) for name in accepted if selected[name]}
+            if site:
+                args['site'] = site
+            if as_of and as_of != 'live':
+                args['as_of'] = as_of
+            links = [
+                html.A(fmt.upper(), href=app.get_relative_path(f"/api/v1/export/{view}?{urlencode({**args, 'format': fmt})}"))
+                for fmt in export.formats()
+            ]
+            rows.append(html.Div([html.Span(f"{title}: ")] + links))
+        return rows
+
+    @app.callback(
+        [
+            Output('revenue_cost_chart', 'figure'),
+            Output('trans_chart', 'figure'),
+            Output('total_revenue', 'children'),
+            Output('operated_hours', 'children'),
+            Output('unplanned_outage', 'children'),
+            Output('total_cost_kpi', 'children'),
+            Output('revenue_change_kpi', 'children'),
+            Output('cost_chart', 'figure'),
+            Output('fuel_chart', 'figure'),
+            Output('fuel_change_kpi', 'children'),
+            Output('downtime_chart', 'figure'),
+            Output('stock_table_container', 'children'),
+            Output('runtime_chart', 'figure'),
+            Output('electrical_table_container', 'children'),
+        ],
+        [
+            Input('location_filter', 'value'),
+            Input('month_filter', 'value'),
+            Input('year_filter', 'value'),
+            Input('generator_type', 'value'),
+            Input('filter_type', 'value'),
+            Input('granularity', 'value'),
+            Input('site_filter', 'value'),
+            Input('asof_filter', 'value'),
+            Input('data-refresh-interval', 'n_intervals'),
+        ],
+        State('plot_width', 'data'),
+        running=[(Output('chart_job', 'style'), {'display': 'flex'}, {'display': 'none'})],
+        # The interval tick only matters when the data changed, which the cache key already covers
+        **background.callback_options(
+            progress=[Output('chart_progress', 'value'), Output('chart_progress', 'max')],
+            cancel=[Input('cancel_chart_job', 'n_clicks')],
+            ignore=[8],
+        ),
+    )
+    def update_chart(*args):
+        set_progress, args = background.split_progress(args)
+        selected_locations, selected_months, selected_years, selected_generators, selected_filter, granularity, selected_site, selected_as_of, n_intervals, plot_width = args
+        snap = data_loader.get_snapshot(selected_site, selected_as_of)
+        filters = warmup.chart_filters(selected_locations, selected_months, selected_years, selected_generators,
+                                       selected_filter, granularity, plot_width)
+        return warmup.chart(snap, filters, set_progress)
+
+    warmup.register(chart_outputs)
+
+
+def trend_series(graph_id, snap, granularity, years=None, months=None, keys=None):
+    """A day/week/quarter trend chart's series at full resolution, before downsampling.
+
+    Cached per graph, snapshot and filters. Traces appear in the order of
+    their first point, as px.line draws them.
+    """
+    series_name, key_col, value_col = TRENDS[graph_id]
+    cache_key = (graph_id, snap.site_id, snap.generation, snap.as_of, granularity,
+                 tuple(sorted(years or ())), tuple(sorted(months or ())), tuple(sorted(keys or ())))
+    series = _trends.get(cache_key)
+    if series is None:
+        series = analytics.select_series(snap.time_series[series_name], granularity, years, months, keys, key_col)
+        if graph_id == 'trans_chart':
+            top_5 = series.groupby(key_col)[value_col].sum().nlargest(5).index
+            series = series[series[key_col].isin(top_5)]
+        _trends.put(cache_key, series)
+    return series
+
+
+def _forecast_trace(forecast, name, color, value_format):
+    """A dotted line for forecast totals (from queries.forecast_by_month), with the 80% range on hover."""
+    low, high = (value_format.replace('%{y', f'%{{customdata[{i}]') for i in (0, 1))
+    return go.Scatter(
+        x=forecast['Label'],
+        y=forecast['Forecast'],
+        name=name,
+        mode='lines+markers',
+        line=dict(color=color, width=2, dash='dot'),
+        marker=dict(size=8, symbol='circle-open'),
+        customdata=forecast[['Lower', 'Upper']],
+        hovertemplate=f'<b>{name}</b><br>{value_format}<br>80% range {low} – {high}<extra></extra>'
+    )
 
-        # Set y-axes titles
-        fig_margin.update_yaxes(title_text="Amount (₦)", secondary_y=False)
-        fig_margin.update_yaxes(title_text="Gross Margin (%)", secondary_y=True)
 
-        # Rotate x-axis labels
-        fig_margin.update_xaxes(tickangle=-45)
+def chart_outputs(snap, selected_locations, selected_months, selected_years, selected_generators, selected_filter,
+                  granularity, plot_width, set_progress=lambda value: None):
+    """Everything update_chart returns, for one snapshot and the sidebar filters."""
+    # Imported on first use so they stay off the startup path (plotly.express loads most of plotly)
+    import plotly.express as px
+    from plotly.subplots import make_subplots
+
+    steps = 6
+    set_progress((0, steps))
+
+    # The site's published snapshot is never modified; copy what this callback mutates
+    local_df_meter = snap.df_meter.copy()
+    local_df_cost_2025 = snap.df_cost_2025.copy()
+    local_power_df = snap.power_df.copy()
+    local_df_supplied = snap.df_supplied.copy()
+    local_df_downTime = snap.df_downTime.copy()
+    local_df_agg = snap.df_agg.copy()
+    local_df_cost = snap.df_cost.copy()
+    local_run_time = snap.run_time.copy()
+    local_df_electrical = snap.df_electrical.copy() if snap.df_electrical is not None else pd.DataFrame()
+    granularity = granularity or 'month'
+    max_points = downsample.points_for_width(plot_width)
+    
+    # === Apply Year Filter ===
+    if selected_years:
+        # Filter all dataframes by selected years
+        if 'Year' in local_df_cost_2025.columns:
+            local_df_cost_2025 = local_df_cost_2025[local_df_cost_2025['Year'].isin(selected_years)]
+        if 'Year' in local_power_df.columns:
+            local_power_df = local_power_df[local_power_df['Year'].isin(selected_years)]
+        if 'Year' in local_df_supplied.columns:
+            local_df_supplied = local_df_supplied[local_df_supplied['Year'].isin(selected_years)]
+        if 'Year' in local_df_downTime.columns:
+            local_df_downTime = local_df_downTime[local_df_downTime['Year'].isin(selected_years)]
+        if 'Year' in local_df_agg.columns:
+            local_df_agg = local_df_agg[local_df_agg['Year'].isin(selected_years)]
+        if 'Year' in local_df_meter.columns:
+            local_df_meter = local_df_meter[local_df_meter['Year'].isin(selected_years)]
+
+    filtered_meter = local_df_meter.copy()
+
+    if selected_locations:
+        filtered_meter = filtered_meter[filtered_meter["Location"].isin(selected_locations)]
+
+    if selected_months:
+        filtered_meter = filtered_meter[filtered_meter["Month"].isin(selected_months)]
+
+    filtered_meter['Total Revenue'] = pd.to_numeric(filtered_meter['Total Revenue'], errors='coerce').fillna(0)
+
+    gravitas_partner = round(filtered_meter.loc[
+        filtered_meter['Location'].isin(['9mobile', 'Providus', 'Western Lodge']), "Total Revenue"
+    ].sum(), 2)
+
+    gravitas_subscriber = round(filtered_meter.loc[
+        filtered_meter['Location'] == 'Canteen', "Total Revenue"
+    ].sum(), 2)
+
+    # === Revenue & Cost Calculation ===
+    # Same query the /api/v1/margin endpoint serves
+    margin_data = queries.margin_by_month(snap, selected_years, selected_months, selected_generators)
+    margin_data['Margin_Label'] = 'Gross Margin'
+
+    set_progress((1, steps))
+
+    # === Revenue vs Cost Chart ===
+    fig_margin = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Add Revenue bars
+    fig_margin.add_trace(
+        go.Bar(
+            x=margin_data['Month'],
+            y=margin_data['Revenue'],
+            name='Revenue',
+            marker_color=constants.GRACEFIELD_GOLD,
+            text=margin_data['Revenue'],
+            texttemplate='₦%{text:,.0f}',
+            textposition='outside',
+            textfont=dict(size=10),
+            hovertemplate='<b>Revenue</b><br>₦%{y:,.0f}<extra></extra>'
+        ),
+        secondary_y=False)
+    # Add Cost bars
+    fig_margin.add_trace(
+        go.Bar(
+            x=margin_data['Month'],
+            y=margin_data['Total_Cost'],
+            name='Total Cost',
+            marker_color=constants.GRACEFIELD_DARK,
+            text=margin_data['Total_Cost'],
+            texttemplate='₦%{text:,.0f}',
+            textposition='outside',
+            textfont=dict(size=10),
+            hovertemplate='<b>Total Cost</b><br>₦%{y:,.0f}<extra></extra>'
+        ),
+        secondary_y=False
+    )
+
+    # Add Profit Margin % line (secondary y-axis)
+    fig_margin.add_trace(
+        go.Scatter(
+            x=margin_data['Month'],
+            y=margin_data['Margin_Percent'],
+            name='Gross Margin %',
+            mode='lines+markers+text',
+            line=dict(color="red", width=3, dash='dash'),
+            marker=dict(size=10, symbol='diamond'),
+            text=margin_data['Margin_Percent'],
+            texttemplate='%{text:.1f}%',
+            textposition='top center',
+            textfont=dict(size=11, color='red'),
+            customdata=margin_data['Margin_Label'],
+            hovertemplate='<b>%{customdata}</b><br>%{y:.1f}%<extra></extra>'
+        ), secondary_y=True
+    )
+    # Forecast for the months after the data (fitted once per refresh)
+    margin_forecasts = [
+        ('Revenue forecast', constants.GRACEFIELD_GOLD, queries.forecast_by_month(snap, 'Revenue', selected_years, selected_months)),
+        ('Cost forecast', constants.GRACEFIELD_DARK, queries.forecast_by_month(snap, 'Cost', selected_years, selected_months, selected_generators)),
+    ]
+    for name, color, forecast in margin_forecasts:
+        if not forecast.empty:
+            fig_margin.add_trace(_forecast_trace(forecast, name, color, '₦%{y:,.0f}'), secondary_y=False)
+
+    # Update layout
+    fig_margin.update_layout(
+        title=dict(
+            text='💰 Revenue vs Cost with Gross Margin',
+            font=dict(size=14, color='#111827', family='Arial Black'),
+            x=0.5,
+            xanchor='center',
+            pad=dict(t=10, b=20)
+        ),
+        barmode='group',
+        hovermode='x unified',
+        template="plotly_white",
+        margin=dict(t=60, b=60, l=60, r=120),
+        legend=dict(
+            orientation='v',
+            yanchor='top',
+            y=1,
+            xanchor='left',
+            x=1.02,
+            bgcolor='rgba(0,0,0,0)',
+            borderwidth=0
+        )
+    )
 
-        # --- Transactions Trend Chart ---
+    # Set y-axes titles
+    fig_margin.update_yaxes(title_text="Amount (₦)", secondary_y=False)
+    fig_margin.update_yaxes(title_text="Gross Margin (%)", secondary_y=True)
+
+    # Rotate x-axis labels
+    fig_margin.update_xaxes(tickangle=-45)
+
+    # --- Transactions Trend Chart ---
+    if granularity != 'month':
+        # Day/week/quarter series are resampled once per refresh and only sliced here,
+        # except weeks and quarters under a year/month filter (see select_series)
+        address_monthly = trend_series('trans_chart', snap, granularity, selected_years, selected_months, selected_locations)
+        # Cap points per trace to what the plot can show; zooming restores detail (see zoom_trend)
+        trend_order = {'Resident Address': list(address_monthly['Resident Address'].unique())}   # as zoom_trend patches them
+        address_monthly = downsample.downsample_frame(address_monthly, 'Period', 'Amount', 'Resident Address', max_points)
+        trend_x = 'Period'
+    else:
         chart_df = local_power_df.copy()
 
         if selected_months:
             months_selected = selected_months if isinstance(selected_months, list) else [selected_months]
             chart_df = chart_df[chart_df['Month'].isin(months_selected)]
 
-        # Clean addresses
-        meter_to_name_str = {str(k): v for k, v in constants.METER_TO_NAME.items()}
-        chart_df['Meter Number Str'] = chart_df['Meter Number'].astype(str).str.replace(r'\.0$', '', regex=True)
-        chart_df['Resident Address'] = chart_df['Meter Number Str'].map(meter_to_name_str).fillna(chart_df['Resident Address'])
-
-        # Exclude non-subscriber locations for trend analysis
-        exclude_locations = ['Engineering Yard', 'Head Office', 'Gravitas New Meter', 'Providus', '9mobile', '9 mobile', 'Western Lodge']
-        chart_df = chart_df[~chart_df['Resident Address'].isin(exclude_locations)]
+        # Map meters to subscribers, drop non-subscriber locations, combine NBIC 1 and NBIC 2
+        chart_df = analytics.subscriber_transactions(chart_df, snap.meter_to_name, snap.aliases)
 
         # Filter by selected location/address
         if selected_locations:
             locations_selected = selected_locations if isinstance(selected_locations, list) else [selected_locations]
             chart_df = chart_df[chart_df['Resident Address'].isin(locations_selected)]
 
-        # Combine NBIC 1 and NBIC 2
-        chart_df['Resident Address'] = chart_df['Resident Address'].astype(str).str.replace(r'(?i)NBIC\s*[12]', 'NBIC', regex=True).str.strip()
-
+        address_monthly = pd.DataFrame()
         # Group by Month and Address
         if not chart_df.empty:
             # Identify top 5 locations by revenue
@@ -287,280 +813,50 @@ def register_callbacks(app):
             top_locations_df = chart_df[chart_df['Resident Address'].isin(top_5_locations)]
 
             address_monthly = top_locations_df.groupby(['Month', 'Resident Address'], as_index=False)['Amount'].sum()
-           
+
             # Ensure months are in correct order for plotting
             address_monthly['Month'] = pd.Categorical(address_monthly['Month'], categories=constants.MONTH_ORDER, ordered=True)
             address_monthly = address_monthly.sort_values('Month')
-           
+
             # Create a complete DataFrame with all months for each top location
             all_months_df = pd.DataFrame({
                 'Month': constants.MONTH_ORDER,
                 'key': 1
             })
             all_locations_df = pd.DataFrame({'Resident Address': top_5_locations, 'key': 1})
-           
+
             # Merge to get all combinations of month and top locations
             full_trend_df = pd.merge(all_months_df, all_locations_df, on='key').drop('key', axis=1)
             address_monthly = pd.merge(full_trend_df, address_monthly, on=['Month', 'Resident Address'], how='left').fillna(0)
-
-            # Create line chart
-            fig_trans = px.line(
-                address_monthly,
-                x='Month',
-                y='Amount',
-                color='Resident Address',
-                markers=True,
-                labels={'Amount': 'Revenue (₦)', 'Resident Address': 'Subscriber', 'Month': 'Month'},
-                color_discrete_sequence=constants.BRAND_COLORS
-            )
-           
-            # Style the line traces
-            fig_trans.update_traces(line=dict(width=2.5), marker=dict(size=8))
-           
-            fig_trans.update_layout(
-                title=dict(text='💰 Top 5 Subscribers - Revenue Trend', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
-                autosize=True,
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(t=28, b=8, l=20, r=120),
-                xaxis_title='',
-                yaxis_title='Revenue (₦)',
-                template="plotly_white",
-                legend=dict(
-                    orientation='v',
-                    x=1.02,
-                    xanchor='left',
-                    y=1,
-                    yanchor='top',
-                    font=dict(size=10),
-                    bgcolor='rgba(0,0,0,0)',
-                    borderwidth=0,
-                    title=dict(text='Subscriber')
-                )
-            )
-           
-            fig_trans.update_xaxes(tickangle=-45)
-        else:
-            # Empty chart if no data
-            fig_trans = px.line(title="No transaction data available")
-            fig_trans.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(t=28, b=8, l=20, r=20)
-            )
-
-        # --- Total Revenue KPI ---
-        # Calculate total revenue from meter readings and transaction data
-        meter_rev_df = data_loader.df_meter.copy()
-        meter_rev_df['Total Revenue'] = pd.to_numeric(meter_rev_df['Total Revenue'], errors='coerce').fillna(0)
-       
-        if selected_years:
-            meter_rev_df = meter_rev_df[meter_rev_df['Year'].isin(selected_years)]
-        if selected_months:
-            meter_rev_df = meter_rev_df[meter_rev_df['Month'].isin(selected_months)]
-           
-        total_meter_revenue = meter_rev_df['Total Revenue'].sum()
-
-        # Calculate transaction revenue
-        power_rev_df = data_loader.power_df.copy()
-        power_rev_df['Amount'] = pd.to_numeric(power_rev_df['Amount'], errors='coerce').fillna(0)
-       
-        if selected_years:
-            power_rev_df = power_rev_df[power_rev_df['Year'].isin(selected_years)]
-       
-        if selected_months:
-            power_rev_df = power_rev_df[power_rev_df['Month'].isin(selected_months)]
-       
-        total_power_revenue = power_rev_df['Amount'].sum()
-        total_revenue_value = total_meter_revenue + total_power_revenue
-        totalRevenue = f"₦{total_revenue_value:,.0f}"
-
-        # Prepare filtered data for detailed table calculations (for pivot table and cost breakdown)
-        table_df = local_power_df.copy()
-        table_df['Resident Address'] = table_df['Meter Number'].map(constants.METER_TO_NAME).fillna(table_df['Resident Address'])
-        table_df['Amount'] = pd.to_numeric(table_df['Amount'], errors='coerce').fillna(0)
-       
-        # Apply filters only to the table/pivot data
-        if selected_months:
-            table_df = table_df[table_df['Month'].isin(selected_months)]
-        if selected_locations:
-            table_df = table_df[table_df['Resident Address'].isin(selected_locations)]
-       
-        table_df['Meter Name'] = table_df['Meter Number'].map(constants.METER_TO_NAME)
-        if not table_df.empty:
-            pivot_list = []
-            for col in table_df['Resident Address'].unique():
-                temp = pd.pivot_table(
-                    table_df[table_df["Resident Address"] == col],
-                    values="Amount",
-                    index="Meter Number",
-                    columns="Resident Address",
-                    aggfunc="sum"
-                )
-                pivot_list.append(temp)
-           
-            pivot = pd.concat(pivot_list, axis=0).fillna('-').reset_index()
-        else:
-            pivot = pd.DataFrame(columns=['Meter Number'])
-
-         # === Cost Breakdown Chart ===
-        filtered_cost = local_df_cost_2025.copy()
-        # Format pivot table values to 2 decimal places
-        cols_to_format = [col for col in pivot.columns if col != "Meter Number"]
-        pivot[cols_to_format] = pivot[cols_to_format].map(
-            lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x
-        )
-
-        if selected_generators:
-            filtered_cost = filtered_cost[filtered_cost["Generator"].isin(selected_generators)]
-        if selected_months:
-            filtered_cost = filtered_cost[filtered_cost["Month"].isin(selected_months)]
-        df_table = pd.DataFrame(pivot.to_dict('records'))
-
-        # Calculate Maintenance Costs
-        filtered_cost['Amount (NGN)'] = pd.to_numeric(filtered_cost['Amount (NGN)'], errors='coerce').fillna(0)
-        maintenance = filtered_cost[filtered_cost['Type of Activity'].str.contains('maintenance', case=False, na=False)]
-       
-        routine_cost = maintenance[
-            maintenance['Type of Activity'].str.contains('Routine', case=False, na=False)
-        ]['Amount (NGN)'].sum()
-
-        def safe_sum(col):
-            """Sum numeric values in a dataframe column, treating '-' as 0"""
-            if col in df_table.columns:
-                return pd.to_numeric(df_table[col].replace('-', 0), errors='coerce').sum()
-            return 0
-
-        corrective_cost = maintenance[
-            maintenance['Type of Activity'].str.contains('Corrective', case=False, na=False)
-        ]['Amount (NGN)'].sum()
-        gho = safe_sum("Head Office")
-        gey = safe_sum("Engineering Yard")
-
-        # Total Gravitas Revenue
-        maintenance = filtered_cost[filtered_cost['Type of Activity'].str.contains('maintenance', case=False, na=False)]
-        total_gravitas = gho + gey + gravitas_partner
-        gravitas_revenue = f"₦{total_gravitas:,.0f}"
-
-        # Fuel Costs
-        fuel_rows = filtered_cost[filtered_cost['Type of Activity'].str.contains('Fuel', case=False, na=False)]
-        fuel_cost = fuel_rows['Amount (NGN)'].sum()
-
-        df_table.columns = df_table.columns.astype(str).str.strip().str.replace('\u00A0', '', regex=True)
-
-        # Build cost breakdown data
-        cost_data = pd.DataFrame({
-            'Category': ['Fuel', 'Routine Maintenance', 'Corrective Maintenance'],
-            'Cost': [fuel_cost, routine_cost, corrective_cost],
-            'Type': ['Fuel', 'Routine', 'Corrective']
-        })
-        columns_to_sum = ['Cedar A', 'DIC', 'NBIC 1', 'NBIC 2', 'HELIUM',
-                        'Rosewood A', 'Rosewood B', 'Tuck-shop', 'Cedar B']
-
-        # Sort by cost descending
-        cost_data = cost_data.sort_values('Cost', ascending=False)
-        existing_cols = [c for c in columns_to_sum if c in df_table.columns]
-
-        # Create horizontal bar chart
-        fig_cost_bar = px.bar(
-            cost_data,
-            x='Cost',
-            y='Category',
-            color='Type',
-            orientation='h',
-            text='Cost',
-            color_discrete_map={
-                'Fuel': '#2C3E50',
-                'Routine': '#4A90E2',
-                'Corrective': '#E67E22'
-            },
-            labels={'Cost': 'Amount (₦)'})
-       
-        fig_cost_bar.update_layout(
-        bargap=0.15,        # space between bars (0 = no space)
-        bargroupgap=0.05    # space between grouped bars
-        )
-
-        subs_sum = (
-            df_table[existing_cols]
-                .replace('-', 0)
-                .apply(pd.to_numeric, errors='coerce')
-                .fillna(0)
-                .to_numpy()
-                .sum()
-        )
-
-        fig_cost_bar.update_traces(
-            texttemplate='₦%{text:,.0f}',
-            textposition='inside',
-            textfont=dict(color='white', size=14, family='Arial Black')
-        )
-        total_subs = subs_sum + gravitas_subscriber
-        gravitas_subs_revenue = f"₦{total_subs:,.0f}"    
-
-        fig_cost_bar.update_layout(
-            title=dict(text='Cost Breakdown (Fuel + Maintenance)', font=dict(size=14, color='#C7A64F'), x=0.5, pad=dict(t=10, b=20)),
-            xaxis=dict(showgrid=False, zeroline=False, visible=False),
-            yaxis=dict(showgrid=False, categoryorder='total ascending'),
-            showlegend=False,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(t=30, b=40, l=130, r=120),
-            height=350,)
-
-        # Apply a logarithmic scale to the x-axis to prevent large values from overshadowing smaller ones
-        fig_cost_bar.update_xaxes(type="log")
-
-        # --- Total Cost KPI ---
-        total_cost_all = filtered_cost['Amount (NGN)'].sum()
-        total_cost_display = f"₦{total_cost_all:,.0f}"
-
-        # Add total cost annotation
-        fig_cost_bar.add_annotation(
-            x=total_cost_all * 1.02,
-            y=0,
-            text=f"Total Cost: ₦{total_cost_all:,.0f}",
-            showarrow=False,
-            font=dict(size=15, color="#C7A64F", family="Arial Black"),
-            xanchor="left"
+        trend_x = 'Month'
+        trend_order = None
+
+    if not address_monthly.empty:
+        # Create line chart; daily series over long ranges are drawn with WebGL
+        fig_trans = px.line(
+            address_monthly,
+            x=trend_x,
+            y='Amount',
+            color='Resident Address',
+            category_orders=trend_order,
+            markers=granularity in ('month', 'quarter'),
+            render_mode='webgl' if granularity == 'day' else 'auto',
+            labels={'Amount': 'Revenue (₦)', 'Resident Address': 'Subscriber', 'Month': 'Month', 'Period': granularity.title()},
+            color_discrete_sequence=constants.BRAND_COLORS
         )
 
-        # --- Fuel Chart ---
-        filtered_fuel = local_df_supplied.copy()
-        if selected_months:
-            filtered_fuel = filtered_fuel[filtered_fuel['Month'].isin(selected_months)]
-       
-        # Convert to numeric safely
-        for col in ['Fuel Purchased', 'Total Fuel Used']:
-            filtered_fuel[col] = pd.to_numeric(filtered_fuel[col], errors='coerce')
-       
-        filtered_fuel = filtered_fuel.dropna(subset=['Fuel Purchased','Total Fuel Used'])
-
-        if not filtered_fuel.empty:
-            fig_fuel = px.bar(
-                filtered_fuel,
-                x='Month',
-                y=['Fuel Purchased', 'Total Fuel Used'],
-                barmode='group',
-                labels={'value': 'Litres', 'variable': 'Fuel Metric'},
-                color_discrete_sequence=constants.BRAND_COLORS[:3]
-            )
-           
-            # Add values inside bars
-            fig_fuel.update_traces(
-                texttemplate='%{y:.0f}',
-                textposition='inside',
-                textfont=dict(color='white', size=11)
-            )
-        else:
-            fig_fuel = px.bar(title="No fuel data available")
+        # Style the line traces
+        fig_trans.update_traces(line=dict(width=2.5 if granularity in ('month', 'quarter') else 1.5), marker=dict(size=8))
 
-        fig_fuel.update_layout(
-            title=dict(text='Fuel Management', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+        fig_trans.update_layout(
+            title=dict(text='💰 Top 5 Subscribers - Revenue Trend' if granularity == 'month' else f'💰 Top 5 Subscribers - {constants.GRANULARITY_LABELS[granularity]} Revenue', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
             autosize=True,
             paper_bgcolor='rgba(0,0,0,0)',
             plot_bgcolor='rgba(0,0,0,0)',
             margin=dict(t=28, b=8, l=20, r=120),
+            xaxis_title='',
+            yaxis_title='Revenue (₦)',
+            template="plotly_white",
             legend=dict(
                 orientation='v',
                 x=1.02,
@@ -569,208 +865,400 @@ def register_callbacks(app):
                 yanchor='top',
                 font=dict(size=10),
                 bgcolor='rgba(0,0,0,0)',
-                borderwidth=0
+                borderwidth=0,
+                title=dict(text='Subscriber')
             )
         )
 
-        # --- Downtime Chart ---
-        filtered_downtime = local_df_downTime.copy()
-
-        if selected_months:
-            filtered_downtime = filtered_downtime[filtered_downtime['Month'].isin(selected_months)]
-
-        if selected_generators:
-            filtered_downtime = filtered_downtime[filtered_downtime['Generator'].isin(selected_generators)]
+        fig_trans.update_xaxes(tickangle=-45)
+    else:
+        # Empty chart if no data
+        fig_trans = px.line(title="No transaction data available")
+        fig_trans.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            margin=dict(t=28, b=8, l=20, r=20)
+        )
 
-        unplanned_outage_hours = filtered_downtime['Duration_Hours'].sum()
-        unplanned_outage_display = f"{unplanned_outage_hours:,.1f}h"
+    # --- Total Revenue KPI ---
+    # Calculate total revenue from meter readings and transaction data
+    meter_rev_df = snap.df_meter.copy()
+    meter_rev_df['Total Revenue'] = pd.to_numeric(meter_rev_df['Total Revenue'], errors='coerce').fillna(0)
+   
+    if selected_years:
+        meter_rev_df = meter_rev_df[meter_rev_df['Year'].isin(selected_years)]
+    if selected_months:
+        meter_rev_df = meter_rev_df[meter_rev_df['Month'].isin(selected_months)]
        
-        fig_down = px.bar(
-            filtered_downtime,
-            x="Month",
-            y="Duration_Hours",
-            color="Generator",
-            text_auto=True,
-            barmode="group",
-            color_discrete_sequence=constants.BRAND_COLORS,
-        )
+    total_meter_revenue = meter_rev_df['Total Revenue'].sum()
+
+    # Calculate transaction revenue
+    power_rev_df = snap.power_df.copy()
+    power_rev_df['Amount'] = pd.to_numeric(power_rev_df['Amount'], errors='coerce').fillna(0)
+   
+    if selected_years:
+        power_rev_df = power_rev_df[power_rev_df['Year'].isin(selected_years)]
+   
+    if selected_months:
+        power_rev_df = power_rev_df[power_rev_df['Month'].isin(selected_months)]
+   
+    total_power_revenue = power_rev_df['Amount'].sum()
+    total_revenue_value = total_meter_revenue + total_power_revenue
+    totalRevenue = f"₦{total_revenue_value:,.0f}"
+
+    # Meter pivot (per-address revenue) for the Gravitas revenue split below
+    pivot = queries.meter_pivot(snap, selected_years, selected_months, selected_locations).fillna('-')
+
+    set_progress((2, steps))
+
+     # === Cost Breakdown Chart ===
+    filtered_cost = local_df_cost_2025.copy()
+    # Format pivot table values to 2 decimal places
+    cols_to_format = [col for col in pivot.columns if col != "Meter Number"]
+    pivot[cols_to_format] = pivot[cols_to_format].map(
+        lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x
+    )
 
-        # Use logarithmic scale to better visualize varying downtime durations
-        fig_down.update_yaxes(type="log")
+    if selected_generators:
+        filtered_cost = filtered_cost[filtered_cost["Generator"].isin(selected_generators)]
+    if selected_months:
+        filtered_cost = filtered_cost[filtered_cost["Month"].isin(selected_months)]
+    df_table = pd.DataFrame(pivot.to_dict('records'))
+
+    filtered_cost['Amount (NGN)'] = pd.to_numeric(filtered_cost['Amount (NGN)'], errors='coerce').fillna(0)
+
+    def safe_sum(col):
+        """Sum numeric values in a dataframe column, treating '-' as 0"""
+        if col in df_table.columns:
+            return pd.to_numeric(df_table[col].replace('-', 0), errors='coerce').sum()
+        return 0
+
+    gho = safe_sum("Head Office")
+    gey = safe_sum("Engineering Yard")
+
+    # Total Gravitas Revenue
+    total_gravitas = gho + gey + gravitas_partner
+    gravitas_revenue = f"₦{total_gravitas:,.0f}"
+
+    df_table.columns = df_table.columns.astype(str).str.strip().str.replace('\u00A0', '', regex=True)
+
+    # Build cost breakdown data
+    cost_data = queries.cost_breakdown(snap, selected_years, selected_months, selected_generators)
+    columns_to_sum = ['Cedar A', 'DIC', 'NBIC 1', 'NBIC 2', 'HELIUM',
+                    'Rosewood A', 'Rosewood B', 'Tuck-shop', 'Cedar B']
+
+    existing_cols = [c for c in columns_to_sum if c in df_table.columns]
+
+    # Create horizontal bar chart
+    fig_cost_bar = px.bar(
+        cost_data,
+        x='Cost',
+        y='Category',
+        color='Type',
+        orientation='h',
+        text='Cost',
+        color_discrete_map={
+            'Fuel': '#2C3E50',
+            'Routine': '#4A90E2',
+            'Corrective': '#E67E22'
+        },
+        labels={'Cost': 'Amount (₦)'})
+   
+    fig_cost_bar.update_layout(
+    bargap=0.15,        # space between bars (0 = no space)
+    bargroupgap=0.05    # space between grouped bars
+    )
 
-        fig_down.update_layout(
-            title=dict(text='🛠️ Generator Downtime', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
-            xaxis_title="Month",
-            template="plotly_white",
-            autosize=True,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(t=28, b=40, l=40, r=160),
-            legend=dict(
-                orientation='v',
-                x=1.03,
-                xanchor='left',
-                y=1,
-                yanchor='top',
-                font=dict(size=10),
-                bgcolor='rgba(0,0,0,0)',
-                borderwidth=0
-            )
-        )
+    subs_sum = (
+        df_table[existing_cols]
+            .replace('-', 0)
+            .apply(pd.to_numeric, errors='coerce')
+            .fillna(0)
+            .to_numpy()
+            .sum()
+    )
 
-        # --- Stock Chart ---
-        filtered_stock = local_df_rc_melt.copy()
+    fig_cost_bar.update_traces(
+        texttemplate='₦%{text:,.0f}',
+        textposition='inside',
+        textfont=dict(color='white', size=14, family='Arial Black')
+    )
+    total_subs = subs_sum + gravitas_subscriber
+    gravitas_subs_revenue = f"₦{total_subs:,.0f}"    
+
+    fig_cost_bar.update_layout(
+        title=dict(text='Cost Breakdown (Fuel + Maintenance)', font=dict(size=14, color='#C7A64F'), x=0.5, pad=dict(t=10, b=20)),
+        xaxis=dict(showgrid=False, zeroline=False, visible=False),
+        yaxis=dict(showgrid=False, categoryorder='total ascending'),
+        showlegend=False,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=30, b=40, l=130, r=120),
+        height=350,)
+
+    # Apply a logarithmic scale to the x-axis to prevent large values from overshadowing smaller ones
+    fig_cost_bar.update_xaxes(type="log")
+
+    # --- Total Cost KPI ---
+    total_cost_all = filtered_cost['Amount (NGN)'].sum()
+    total_cost_display = f"₦{total_cost_all:,.0f}"
+
+    # Add total cost annotation
+    fig_cost_bar.add_annotation(
+        x=total_cost_all * 1.02,
+        y=0,
+        text=f"Total Cost: ₦{total_cost_all:,.0f}",
+        showarrow=False,
+        font=dict(size=15, color="#C7A64F", family="Arial Black"),
+        xanchor="left"
+    )
 
-        if selected_months:
-            filtered_stock = filtered_stock[filtered_stock['Month'].isin(selected_months)]
+    set_progress((3, steps))
+
+    # --- Fuel Chart ---
+    filtered_fuel = local_df_supplied.copy()
+    if selected_months:
+        filtered_fuel = filtered_fuel[filtered_fuel['Month'].isin(selected_months)]
+   
+    # Convert to numeric safely
+    for col in ['Fuel Purchased', 'Total Fuel Used']:
+        filtered_fuel[col] = pd.to_numeric(filtered_fuel[col], errors='coerce')
+   
+    filtered_fuel = filtered_fuel.dropna(subset=['Fuel Purchased','Total Fuel Used'])
+
+    if not filtered_fuel.empty:
+        fig_fuel = px.bar(
+            filtered_fuel,
+            x='Month',
+            y=['Fuel Purchased', 'Total Fuel Used'],
+            barmode='group',
+            labels={'value': 'Litres', 'variable': 'Fuel Metric'},
+            color_discrete_sequence=constants.BRAND_COLORS[:3]
+        )
+       
+        # Add values inside bars
+        fig_fuel.update_traces(
+            texttemplate='%{y:.0f}',
+            textposition='inside',
+            textfont=dict(color='white', size=11)
+        )
 
-        if selected_generators:
-            filtered_stock = filtered_stock[filtered_stock['Generator_Size'].isin(selected_generators)]
-
-        if selected_filter:
-            filtered_stock = filtered_stock[filtered_stock['Filter_Type'].isin(selected_filter)]
-
-        # --- Stock Table ---
-        if not filtered_stock.empty:
-            stock_table = dash_table.DataTable(
-                data=filtered_stock.to_dict('records'),
-                columns=[{'name': str(i), 'id': str(i)} for i in filtered_stock.columns if i not in ['Month', 'Year', 'Month 2']],
-                style_table={'height': '300px', 'overflowY': 'auto'},
-                style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'minWidth': '80px', 'fontSize': '12px'},
-                style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
-                page_size=10
-            )
-        else:
-            stock_table = html.Div("No stock data available", style={'padding': '20px', 'textAlign': 'center'})
+        fuel_forecast = queries.forecast_by_month(snap, 'Fuel Used', selected_years, selected_months)
+        if not fuel_forecast.empty:
+            fig_fuel.add_trace(_forecast_trace(fuel_forecast, 'Fuel used forecast', constants.BRAND_COLORS[1], '%{y:,.0f} L'))
+    else:
+        fig_fuel = px.bar(title="No fuel data available")
+
+    fig_fuel.update_layout(
+        title=dict(text='Fuel Management', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+        autosize=True,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=28, b=8, l=20, r=120),
+        legend=dict(
+            orientation='v',
+            x=1.02,
+            xanchor='left',
+            y=1,
+            yanchor='top',
+            font=dict(size=10),
+            bgcolor='rgba(0,0,0,0)',
+            borderwidth=0
+        )
+    )
 
-        # --- Runtime Chart ---
-        filtered_runtime = local_df_agg.copy()
+    # --- Downtime Chart ---
+    filtered_downtime = local_df_downTime.copy()
+
+    if selected_months:
+        filtered_downtime = filtered_downtime[filtered_downtime['Month'].isin(selected_months)]
+
+    if selected_generators:
+        filtered_downtime = filtered_downtime[filtered_downtime['Generator'].isin(selected_generators)]
+
+    unplanned_outage_hours = filtered_downtime['Duration_Hours'].sum()
+    unplanned_outage_display = f"{unplanned_outage_hours:,.1f}h"
+   
+    fig_down = px.bar(
+        filtered_downtime,
+        x="Month",
+        y="Duration_Hours",
+        color="Generator",
+        text_auto=True,
+        barmode="group",
+        color_discrete_sequence=constants.BRAND_COLORS,
+        custom_data=["Generator"],
+    )
 
-        if selected_months:
-            filtered_runtime = filtered_runtime[filtered_runtime['Month'].isin(selected_months)]
+    # Use logarithmic scale to better visualize varying downtime durations
+    fig_down.update_yaxes(type="log")
+
+    fig_down.update_layout(
+        title=dict(text='🛠️ Generator Downtime', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+        xaxis_title="Month",
+        template="plotly_white",
+        autosize=True,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=28, b=40, l=40, r=160),
+        legend=dict(
+            orientation='v',
+            x=1.03,
+            xanchor='left',
+            y=1,
+            yanchor='top',
+            font=dict(size=10),
+            bgcolor='rgba(0,0,0,0)',
+            borderwidth=0
+        )
+    )
 
-        if selected_generators:
-            filtered_runtime = filtered_runtime[filtered_runtime['Generator'].isin(selected_generators)]
+    set_progress((4, steps))
 
-        if not filtered_runtime.empty:
-            # Sum hours operated by generator
-            gen_hours = filtered_runtime.groupby('Generator')['Hours Operated'].sum().reset_index()
-           
-            total_hours_all_gens = gen_hours['Hours Operated'].sum()
-            if total_hours_all_gens > 0:
-                gen_hours['Percentage'] = (gen_hours['Hours Operated'] / total_hours_all_gens) * 100
-            else:
-                gen_hours['Percentage'] = 0
+    # --- Stock Chart ---
+    filtered_stock = queries.stock_inventory(snap, selected_years, selected_months, selected_generators, selected_filter)
 
-            # Sort from most-used to least-used
-            gen_hours = gen_hours.sort_values('Hours Operated', ascending=False)
+    # --- Stock Table ---
+    if not filtered_stock.empty:
+        stock_table = dash_table.DataTable(
+            data=filtered_stock.to_dict('records'),
+            columns=[{'name': str(i), 'id': str(i)} for i in filtered_stock.columns if i not in ['Month', 'Year', 'Month 2']],
+            style_table={'height': '300px', 'overflowY': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'minWidth': '80px', 'fontSize': '12px'},
+            style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
+            page_size=10
+        )
+    else:
+        stock_table = html.Div("No stock data available", style={'padding': '20px', 'textAlign': 'center'})
+
+    # --- Runtime Chart ---
+    filtered_runtime = local_df_agg.copy()
+
+    if selected_months:
+        filtered_runtime = filtered_runtime[filtered_runtime['Month'].isin(selected_months)]
+
+    if selected_generators:
+        filtered_runtime = filtered_runtime[filtered_runtime['Generator'].isin(selected_generators)]
+
+    if not filtered_runtime.empty:
+        # Hours and share per generator, most-used first
+        gen_hours = queries.runtime_share(snap, selected_years, selected_months, selected_generators)
+
+        fig_runtime = px.bar(
+            gen_hours,
+            x='Generator',
+            y='Hours Operated',
+            text='Percentage',
+            custom_data=['Percentage'],
+            labels={'Hours Operated': 'Total Hours Operated', 'Generator': 'Generator'},
+            color='Generator',
+            color_discrete_sequence=constants.BRAND_COLORS
+        )
+        # Format text as percentage and customize hover info
+        fig_runtime.update_traces(
+            texttemplate='%{text:.1f}%',
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Hours: %{y:,.0f}h<br>Usage: %{customdata[0]:.1f}%<extra></extra>'
+        )
+        fig_runtime.update_layout(showlegend=False)
+       
+        # Add padding to y-axis to prevent text from being cut off
+        fig_runtime.update_yaxes(range=[0, gen_hours['Hours Operated'].max() * 1.15])
+    else:
+        # Create empty bar chart if no data
+        fig_runtime = go.Figure()
+        fig_runtime.add_annotation(text="No runtime data available", showarrow=False)
+
+    fig_runtime.update_layout(
+        title=dict(text='⏱️ Generator Usage (% of Total Runtime)', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+        xaxis_title=None,
+        yaxis_title="Hours Operated",
+        autosize=True,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=40, b=40, l=40, r=40)
+    )
 
-            fig_runtime = px.bar(
-                gen_hours,
-                x='Generator',
+    # Finer or coarser than monthly: hours per generator over time from the cached series
+    if granularity != 'month':
+        runtime_series = trend_series('runtime_chart', snap, granularity, selected_years, selected_months, selected_generators)
+        runtime_order = {'Generator': list(runtime_series['Generator'].unique())}   # as zoom_trend patches them
+        runtime_series = downsample.downsample_frame(runtime_series, 'Period', 'Hours Operated', 'Generator', max_points)
+        if not runtime_series.empty:
+            fig_runtime = px.line(
+                runtime_series,
+                x='Period',
                 y='Hours Operated',
-                text='Percentage',
-                custom_data=['Percentage'],
-                labels={'Hours Operated': 'Total Hours Operated', 'Generator': 'Generator'},
                 color='Generator',
+                category_orders=runtime_order,
+                markers=granularity == 'quarter',
+                render_mode='webgl' if granularity == 'day' else 'auto',
+                labels={'Period': granularity.title()},
                 color_discrete_sequence=constants.BRAND_COLORS
             )
-            # Format text as percentage and customize hover info
-            fig_runtime.update_traces(
-                texttemplate='%{text:.1f}%',
-                textposition='outside',
-                hovertemplate='<b>%{x}</b><br>Hours: %{y:,.0f}h<br>Usage: %{customdata[0]:.1f}%<extra></extra>'
+            fig_runtime.update_layout(
+                title=dict(text=f'⏱️ {constants.GRANULARITY_LABELS[granularity]} Generator Runtime', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
+                xaxis_title=None,
+                yaxis_title="Hours Operated",
+                template="plotly_white",
+                autosize=True,
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                margin=dict(t=40, b=40, l=40, r=40)
             )
-            fig_runtime.update_layout(showlegend=False)
-           
-            # Add padding to y-axis to prevent text from being cut off
-            fig_runtime.update_yaxes(range=[0, gen_hours['Hours Operated'].max() * 1.15])
-        else:
-            # Create empty bar chart if no data
-            fig_runtime = go.Figure()
-            fig_runtime.add_annotation(text="No runtime data available", showarrow=False)
-
-        fig_runtime.update_layout(
-            title=dict(text='⏱️ Generator Usage (% of Total Runtime)', font=dict(size=12, color='#111827'), x=0.5, xanchor='center'),
-            xaxis_title=None,
-            yaxis_title="Hours Operated",
-            autosize=True,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(t=40, b=40, l=40, r=40)
-        )
-
-        # --- Percent Change KPIs ---
-        revenue_change_display = "N/A"
-        fuel_change_display = "N/A"
 
-        # Calculate current fuel usage
-        filtered_fuel_kpi = local_df_supplied.copy()
-        if selected_months:
-            filtered_fuel_kpi = filtered_fuel_kpi[filtered_fuel_kpi['Month'].isin(selected_months)]
-        total_fuel_used = pd.to_numeric(filtered_fuel_kpi['Total Fuel Used'], errors='coerce').sum()
+    set_progress((5, steps))
+
+    # --- Percent Change KPIs ---
+    revenue_change_display = "N/A"
+    fuel_change_display = "N/A"
+
+    # Calculate current fuel usage
+    filtered_fuel_kpi = local_df_supplied.copy()
+    if selected_months:
+        filtered_fuel_kpi = filtered_fuel_kpi[filtered_fuel_kpi['Month'].isin(selected_months)]
+    total_fuel_used = pd.to_numeric(filtered_fuel_kpi['Total Fuel Used'], errors='coerce').sum()
+   
+    if selected_months:
+        # Current Revenue
+        current_total_revenue = total_revenue_value
+
+        # Determine the previous period
+        month_order = list(calendar.month_name)[1:]
+        selected_indices = sorted([month_order.index(m) for m in selected_months])
+        min_index = selected_indices[0]
+        num_months = len(selected_months)
        
-        if selected_months:
-            # Current Revenue
-            current_total_revenue = total_revenue_value
-
-            # Determine the previous period
-            month_order = list(calendar.month_name)[1:]
-            selected_indices = sorted([month_order.index(m) for m in selected_months])
-            min_index = selected_indices[0]
-            num_months = len(selected_months)
+        # Ensure the selected months are a continuous block (e.g., Feb-Mar, not Feb-Apr)
+        is_contiguous = all(selected_indices[i] == selected_indices[0] + i for i in range(num_months))
+        prev_start_index = min_index - num_months
+
+        if prev_start_index >= 0 and is_contiguous:
+            # Previous period exists and the selection is contiguous
+            prev_indices = range(prev_start_index, min_index)
+            previous_months = [month_order[i] for i in prev_indices]
+
+            # Previous Revenue
+            prev_power_df = local_power_df[local_power_df['Month'].isin(previous_months)].copy()
+            prev_power_df['Resident Address'] = prev_power_df['Meter Number'].map(snap.meter_to_name).fillna(prev_power_df['Resident Address'])
            
-            # Ensure the selected months are a continuous block (e.g., Feb-Mar, not Feb-Apr)
-            is_contiguous = all(selected_indices[i] == selected_indices[0] + i for i in range(num_months))
-            prev_start_index = min_index - num_months
-
-            if prev_start_index >= 0 and is_contiguous:
-                # Previous period exists and the selection is contiguous
-                prev_indices = range(prev_start_index, min_index)
-                previous_months = [month_order[i] for i in prev_indices]
-
-                # Previous Revenue
-                prev_power_df = local_power_df[local_power_df['Month'].isin(previous_months)].copy()
-                prev_power_df['Resident Address'] = prev_power_df['Meter Number'].map(constants.METER_TO_NAME).fillna(prev_power_df['Resident Address'])
-               
-                prev_meter_df = local_df_meter[local_df_meter["Month"].isin(previous_months)].copy()
-                prev_meter_df['Total Revenue'] = pd.to_numeric(prev_meter_df['Total Revenue'], errors='coerce').fillna(0)
-
-                if selected_locations:
-                    prev_power_df = prev_power_df[prev_power_df['Resident Address'].isin(selected_locations)]
-                    prev_meter_df = prev_meter_df[prev_meter_df['Location'].isin(selected_locations)]
-
-                previous_total_revenue = prev_power_df['Amount'].sum() + prev_meter_df['Total Revenue'].sum()
-
-                # Revenue % Change
-                if previous_total_revenue > 0:
-                    percent_change = ((current_total_revenue - previous_total_revenue) / previous_total_revenue) * 100
-                    arrow, color = ("▲", "green") if percent_change > 0 else (("▼", "red") if percent_change < 0 else ("", "grey"))
-                    revenue_change_display = html.Span([f"{percent_change:,.2f}% ", html.Span(arrow, style={'color': color, 'fontSize': '1.2em'})])
-
-                # Fuel % Change
-                prev_fuel_df = local_df_supplied[local_df_supplied['Month'].isin(previous_months)]
-                previous_total_fuel_used = pd.to_numeric(prev_fuel_df['Total Fuel Used'], errors='coerce').sum()
-
-                if previous_total_fuel_used > 0:
-                    percent_change = ((total_fuel_used - previous_total_fuel_used) / previous_total_fuel_used) * 100
-                    # For fuel, an increase is bad (red), a decrease is good (green)
-                    arrow, color = ("▲", "red") if percent_change > 0 else ("▼", "green")
-                    fuel_change_display = html.Span([f"💧 {percent_change:,.2f}% ", html.Span(arrow, style={'color': color, 'fontSize': '1.2em'})])
-
-        # === Operated Hours & Outage Calculation ===
-        filtered_runtime = local_df_agg.copy()
-        if selected_months:
-            filtered_runtime = filtered_runtime[filtered_runtime['Month'].isin(selected_months)]
-        if selected_generators:
-            filtered_runtime = filtered_runtime[filtered_runtime['Generator'].isin(selected_generators)]
+            prev_meter_df = local_df_meter[local_df_meter["Month"].isin(previous_months)].copy()
+            prev_meter_df['Total Revenue'] = pd.to_numeric(prev_meter_df['Total Revenue'], errors='coerce').fillna(0)
+
+            if selected_locations:
+                prev_power_df = prev_power_df[prev_power_df['Resident Address'].isin(selected_locations)]
+                prev_meter_df = prev_meter_df[prev_meter_df['Location'].isin(selected_locations)]
 
-        actual_operated_hours = filtered_runtime['Hours Operated'].sum()
+            previous_total_revenue = prev_power_df['Amount'].sum() + prev_meter_df['Total Revenue'].sum()
 
-        operated_hours_display = f"{actual_operated_hours:,.1f}h"
+            # Revenue % Change
+            if previous_total_revenue > 0:
+                percent_change = ((current_total_revenue - previous_total_revenue) / previous_total_revenue) * 100
+                arrow, color = ("▲", "green") if percent_change > 0 else (("▼", "red") if percent_change < 0 else ("", "grey"))
+                revenue_change_display = html.Span([f"{percent_change:,.2f}% ", html.Span(arrow, style={'color': color, 'fontSize': '1.2em'})])
 
-        # --- Final Fuel Change Check ---
-        if selected_months and 'prev_start_index' in locals() and prev_start_index >= 0 and is_contiguous:
+            # Fuel % Change
+            prev_fuel_df = local_df_supplied[local_df_supplied['Month'].isin(previous_months)]
             previous_total_fuel_used = pd.to_numeric(prev_fuel_df['Total Fuel Used'], errors='coerce').sum()
 
             if previous_total_fuel_used > 0:
@@ -779,32 +1267,53 @@ def register_callbacks(app):
                 arrow, color = ("▲", "red") if percent_change > 0 else ("▼", "green")
                 fuel_change_display = html.Span([f"💧 {percent_change:,.2f}% ", html.Span(arrow, style={'color': color, 'fontSize': '1.2em'})])
 
-        # --- Electrical Inventory Table ---
-        if not local_df_electrical.empty:
-            electrical_table = dash_table.DataTable(
-                data=local_df_electrical.to_dict('records'),
-                columns=[{'name': str(i), 'id': str(i)} for i in local_df_electrical.columns],
-                style_table={'height': '300px', 'overflowY': 'auto'},
-                style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'minWidth': '80px', 'fontSize': '12px'},
-                style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
-                page_size=10
-            )
-        else:
-            electrical_table = html.Div("No electrical inventory data available", style={'padding': '20px', 'textAlign': 'center'})
-
-        return (
-            fig_margin,
-            fig_trans,
-            totalRevenue,
-            operated_hours_display,
-            unplanned_outage_display,
-            total_cost_display,
-            revenue_change_display,
-            fig_cost_bar,
-            fig_fuel,
-            fuel_change_display,
-            fig_down,
-            stock_table,
-            fig_runtime,
-            electrical_table,
+    # === Operated Hours & Outage Calculation ===
+    filtered_runtime = local_df_agg.copy()
+    if selected_months:
+        filtered_runtime = filtered_runtime[filtered_runtime['Month'].isin(selected_months)]
+    if selected_generators:
+        filtered_runtime = filtered_runtime[filtered_runtime['Generator'].isin(selected_generators)]
+
+    actual_operated_hours = filtered_runtime['Hours Operated'].sum()
+
+    operated_hours_display = f"{actual_operated_hours:,.1f}h"
+
+    # --- Final Fuel Change Check ---
+    if selected_months and 'prev_start_index' in locals() and prev_start_index >= 0 and is_contiguous:
+        previous_total_fuel_used = pd.to_numeric(prev_fuel_df['Total Fuel Used'], errors='coerce').sum()
+
+        if previous_total_fuel_used > 0:
+            percent_change = ((total_fuel_used - previous_total_fuel_used) / previous_total_fuel_used) * 100
+            # For fuel, an increase is bad (red), a decrease is good (green)
+            arrow, color = ("▲", "red") if percent_change > 0 else ("▼", "green")
+            fuel_change_display = html.Span([f"💧 {percent_change:,.2f}% ", html.Span(arrow, style={'color': color, 'fontSize': '1.2em'})])
+
+    # --- Electrical Inventory Table ---
+    if not local_df_electrical.empty:
+        electrical_table = dash_table.DataTable(
+            data=local_df_electrical.to_dict('records'),
+            columns=[{'name': str(i), 'id': str(i)} for i in local_df_electrical.columns],
+            style_table={'height': '300px', 'overflowY': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '5px', 'fontFamily': 'Arial', 'minWidth': '80px', 'fontSize': '12px'},
+            style_header={'backgroundColor': '#f1f1f1', 'fontWeight': 'bold', 'color': '#2C3E50', 'padding': '5px', 'fontSize': '12px'},
+            page_size=10
         )
+    else:
+        electrical_table = html.Div("No electrical inventory data available", style={'padding': '20px', 'textAlign': 'center'})
+
+    return (
+        fig_margin,
+        fig_trans,
+        totalRevenue,
+        operated_hours_display,
+        unplanned_outage_display,
+        total_cost_display,
+        revenue_change_display,
+        fig_cost_bar,
+        fig_fuel,
+        fuel_change_display,
+        fig_down,
+        stock_table,
+        fig_runtime,
+        electrical_table,
+    )
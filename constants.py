@@ -20,6 +20,32 @@ GRAVITAS_REVENUE_SOURCES = [
     'Gravitas New Meter', 'Engineering Yard', 'Providus', '9mobile'
 ]
 
+# --- Name Normalization (defaults; see normalization.py for the config file) ---
+# Canonical generator names; rows with a spelling that doesn't map to one are kept, and the refresh warns about it
+GENERATORS = ['20kva', '55kva', '80kva', '200kva']
+
+# Spellings found in the sheets -> canonical name (matched ignoring case and surrounding spaces)
+GENERATOR_ALIASES = {
+    'new 80kva': '80kva', 'old 80kva': '80kva', 'both 80kva': '80kva', '88kva': '80kva',
+    'new 200kva': '200kva',
+}
+LOCATION_ALIASES = {'9 mobile': '9mobile'}
+
+# Locations shown as one line in the subscriber revenue trend
+TREND_LOCATION_GROUPS = {'NBIC 1': 'NBIC', 'NBIC 2': 'NBIC'}
+
+# Non-subscriber meters left out of the subscriber revenue trend
+TREND_EXCLUDED_LOCATIONS = ['Engineering Yard', 'Head Office', 'Gravitas New Meter', 'Providus', '9mobile', 'Western Lodge']
+
+# Time-series granularity: dropdown label -> pandas resample rule
+GRANULARITIES = {
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS',
+    'quarter': 'QS',
+}
+GRANULARITY_LABELS = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly', 'quarter': 'Quarterly'}
+
 METER_TO_NAME = {
     23220035721: "Rosewood A",
     23220035788: "Rosewood B",
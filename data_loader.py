@@ -1,17 +1,72 @@
 import pandas as pd
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import warnings
 import constants
+import analytics
+import fetcher
+import forecasting
+import memory
+import normalization
+import snapshot_store
+import xlsx_reader
 
 warnings.filterwarnings('ignore')
 
 # --- Global Variables ---
-data_lock = threading.Lock()
-last_refresh_time = None
+data_lock = threading.Lock()      # guards publishing a site's snapshot
+last_refresh_time = None          # when the default site's data was fetched ("data as of")
+last_attempt_time = None
+last_error = None
+data_generation = 0               # incremented every time any site's data changes and is swapped in
 REFRESH_INTERVAL = 300  # 5 minutes in seconds
-
-# Dataframes
+FAILURE_RETRY_INTERVAL = 60  # wait this long before retrying after a failed refresh
+STALE_AFTER = 3 * REFRESH_INTERVAL  # data older than this is flagged stale even without a recorded error
+AUTO_REFRESH = True  # False in gunicorn workers, where the master refreshes and reloads them
+publish_hooks = []  # called with the site after each new snapshot is published (e.g. cache warming)
+
+# 'streaming' reads sheets row by row (low peak memory), 'pandas' uses pd.ExcelFile
+XLSX_READER = os.environ.get("GRAVITAS_XLSX_READER", "streaming")
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # downloads larger than this are spooled to disk
+
+SHEET_ID = os.environ.get("GRAVITAS_SHEET_ID", "1LfdWF1pzfC8PGwD-pMgzHw8JIZtll74W8-39vNsKgGA")
+SOURCE_URL = os.environ.get(
+    "GRAVITAS_SOURCE_URL",
+    f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=xlsx"
+)
+
+# Sheet tabs (gids) to fetch as separate CSV exports instead of the whole workbook, as
+# {"df_meter": 0, "df_cost": 1806525383, ...} or a list in workbook order; see _sheet_gids()
+SHEET_GIDS = os.environ.get("GRAVITAS_SHEET_GIDS")
+
+fetcher.CONNECT_TIMEOUT = float(os.environ.get("GRAVITAS_CONNECT_TIMEOUT", fetcher.CONNECT_TIMEOUT))
+fetcher.READ_TIMEOUT = float(os.environ.get("GRAVITAS_READ_TIMEOUT", fetcher.READ_TIMEOUT))
+fetcher.MAX_RETRIES = int(os.environ.get("GRAVITAS_FETCH_RETRIES", fetcher.MAX_RETRIES))
+
+# --- Sites ---
+# GRAVITAS_SITES_FILE points at a JSON list of estates served by one process:
+#   [{"id": "gravitas", "name": "Gravitas", "source_url": "https://...",
+#     "meters": {"4293684496": "Cedar A"}, "locations": ["Cedar A"],
+#     "schedule": {"0": {"80kva": 11}}, "sheet_gids": [0, 1806525383, ...]}, ...]
+# "sheet_id" may be given instead of "source_url"; meters, locations and
+# schedule default to the ones in constants. With "sheet_gids" each sheet is
+# fetched as its own CSV export (see GRAVITAS_SHEET_GIDS). Without the file, the single
+# site configured above is served. The first site is the default.
+SITES_FILE = os.environ.get("GRAVITAS_SITES_FILE")
+REFRESH_WORKERS = int(os.environ.get("GRAVITAS_REFRESH_WORKERS", 4))  # sites refreshed at the same time
+
+_refresh_executor = None
+
+HISTORY_CACHE_SIZE = 4  # past snapshots kept loaded for the "as of" selector
+
+# The default site's dataframes, mirrored here for code that reads data_loader.<name>
 df_meter = None
 df_cost = None
 df_cost_2025 = None
@@ -25,220 +80,857 @@ df_rc_melt = None
 power_df = None
 df_electrical = None
 
-def load_all_data():
-    """Load and process data from Google Sheets with thread safety."""
-    global df_meter, df_cost, df_cost_2025, df_downTime, run_time, df_agg
-    global df_supplied, df_stock, df_rc, df_rc_melt, power_df, last_refresh_time, df_electrical
-   
+# Tables derived from the sheets once per refresh
+df_compliance = None  # expected vs actual generator hours per day (DAILY_SCHEDULE)
+df_fuel_efficiency = None  # monthly fuel used / hours operated / fuel spend with anomaly flags
+df_downtime_events = None  # individual outages, indexed by start time
+df_downtime_partitions = None  # outage aggregates per Year/Month/Generator, updated incrementally
+time_series = None  # {'revenue'|'runtime': {granularity: resampled series}}
+df_quarantine = None  # rows that failed VALIDATION_RULES, with the reasons
+df_stock_alerts = None  # stock use rate, depletion date and reorder status per generator/filter type
+df_meter_anomalies = None  # latest month's revenue checks per meter, indexed by meter number
+df_forecast = None  # next months' revenue, fuel used and cost per location/generator (forecasting.py)
+
+
+class SchemaError(Exception):
+    """Raised when a sheet no longer has the columns the dashboard needs."""
+
+
+# --- Sheet Schemas ---
+# Which columns the dashboard reads from each sheet, keyed by the global they are loaded into.
+#   index:    position of the sheet in the workbook
+#   required: columns that must be present; a tuple means "at least one of these"
+#   optional: columns loaded when present
+#   dtypes:   numeric columns coerced right after reading
+#   all_columns: keep every column (sheets displayed as tables); required still validated
+SHEET_SCHEMAS = {
+    'df_meter': {
+        'index': 0,
+        'required': ['Location', 'Total Revenue', 'Month', ('Year', 'Date')],
+        'optional': ['Year', 'Date'],
+    },
+    'df_cost': {
+        'index': 1,
+        'required': ['Generator', 'Type of Activity', 'Amount (NGN)', ('Year', 'Date'), ('Month', 'Date')],
+        'optional': ['Year', 'Month', 'Date'],
+    },
+    'df_downTime': {
+        'index': 2,
+        'required': ['Generator', 'Duration_Hours', ('Year', 'Date'), ('Month', 'Date')],
+        'optional': ['Year', 'Month', 'Date'],
+        'dtypes': {'Duration_Hours': 'float64'},
+    },
+    'df_supplied': {
+        'index': 3,
+        'required': ['Fuel Purchased', 'Total Fuel Used', ('Year', 'Date'), ('Month', 'Date')],
+        'optional': ['Year', 'Month', 'Date', 'Generator'],
+        'dtypes': {'Fuel Purchased': 'float64', 'Total Fuel Used': 'float64'},
+    },
+    'run_time': {
+        'index': 4,
+        'required': ['Generator', 'Hours Operated', ('Year', 'Date'), ('Month', 'Date'), ('Day', 'Date')],
+        'optional': ['Year', 'Month', 'Day', 'Date'],
+        'dtypes': {'Hours Operated': 'float64'},
+    },
+    'df_stock': {
+        'index': 5,
+        'required': ['Month', 'Generator_Size', 'Filter_Type'],
+        'optional': ['Year'],
+        'all_columns': True,
+    },
+    'power_df': {
+        'index': 6,
+        'required': ['Amount', 'Meter Number', 'Resident Address', ('Month', 'Transaction Date'), ('Year', 'Transaction Date')],
+        'optional': ['Year', 'Month', 'Transaction Date'] + analytics.TRANSACTION_ID_COLUMNS,
+    },
+    'df_electrical': {
+        'index': 7,
+        'required': [],
+        'all_columns': True,
+    },
+}
+
+
+# --- Validation Rules ---
+# Row checks run on each sheet once it's cleaned, in one vectorized pass.
+# Rows failing any check are set aside in df_quarantine (with the reasons)
+# instead of being served, and counted in the site's status.
+#   required:  columns that must hold a number (blank or unparseable cells fail)
+#   month:     column that must be a full month name
+#   year:      column that must be a four-digit year
+#   generator: column whose generator names are checked against the alias table
+#              (see normalization.py); unknown ones are reported, but the rows are kept
+VALIDATION_RULES = {
+    'df_meter': {'required': ['Total Revenue'], 'month': 'Month', 'year': 'Year'},
+    'df_cost': {'required': ['Amount (NGN)'], 'month': 'Month', 'year': 'Year', 'generator': 'Generator'},
+    'df_downTime': {'required': ['Duration_Hours'], 'month': 'Month', 'year': 'Year', 'generator': 'Generator'},
+    'df_supplied': {'month': 'Month', 'year': 'Year', 'generator': 'Generator'},
+    'run_time': {'required': ['Hours Operated'], 'month': 'Month', 'year': 'Year', 'generator': 'Generator'},
+    'df_stock': {'month': 'Month', 'year': 'Year'},
+    'power_df': {'required': ['Amount'], 'month': 'Month', 'year': 'Year'},
+}
+
+QUARANTINE_COLUMNS = ['Sheet', 'Row', 'Reason', 'Record']
+
+
+def _validate(name, frame, quarantined, aliases):
+    """Drop the rows of `frame` that fail VALIDATION_RULES[name], appending them to `quarantined`."""
+    rules = VALIDATION_RULES.get(name, {})
+    checks = {}
+    for col in rules.get('required', []):
+        if col in frame.columns:
+            checks[f"{col} missing or not a number"] = pd.to_numeric(frame[col], errors='coerce').isna()
+    if rules.get('month') in frame.columns:
+        checks["Month not a month name"] = ~frame[rules['month']].astype(str).isin(constants.MONTH_ORDER)
+    if rules.get('year') in frame.columns:
+        checks["Year not a year"] = ~frame[rules['year']].astype(str).str.fullmatch(r'(19|20)\d\d')
+    if rules.get('generator') in frame.columns:
+        # A new unit shouldn't drop its cost and fuel rows until someone updates the list
+        names = frame[rules['generator']].dropna()
+        unknown = sorted(set(names[~names.isin(aliases.generators)]) - {''})
+        if unknown:
+            print(f"Warning: {name} names generator(s) not in the alias table: {', '.join(unknown)}. "
+                  "The rows are kept; add them to \"generators\" in GRAVITAS_ALIASES_FILE.")
+    if not checks:
+        return frame
+
+    failed = pd.DataFrame(checks, index=frame.index)
+    bad = failed.any(axis=1)
+    if not bad.any():
+        return frame
+
+    # bool matrix . labels concatenates the label of every failed check per row
+    labels = pd.Series([f"{reason}; " for reason in checks], index=failed.columns)
+    rows = frame[bad]
+    quarantined.append(pd.DataFrame({
+        'Sheet': name,
+        'Row': rows.index + 2,  # spreadsheet row, below the header
+        'Reason': failed[bad].dot(labels).str.rstrip('; ').values,
+        'Record': rows.astype(str).agg(' | '.join, axis=1).values,
+    }))
+    return frame[~bad]
+
+
+def _schema_columns(schema):
+    """Every column named in a schema, in declaration order."""
+    columns = []
+    for entry in schema['required'] + schema.get('optional', []):
+        for col in (entry if isinstance(entry, tuple) else (entry,)):
+            if col not in columns:
+                columns.append(col)
+    return columns
+
+
+def _read_sheet(workbook, name):
+    """Read one sheet, loading only the columns its schema declares, and validate it."""
+    schema = SHEET_SCHEMAS[name]
+    usecols = None if schema.get('all_columns') else _schema_columns(schema)
+
+    if isinstance(workbook, (xlsx_reader.StreamingWorkbook, SheetFrames)):
+        frame = workbook.parse(schema['index'], usecols=usecols)
+    else:
+        wanted = set(usecols) if usecols else None
+        frame = workbook.parse(schema['index'], usecols=(lambda c: str(c).strip() in wanted) if wanted else None)
+
+    frame.columns = [c.strip() if isinstance(c, str) else c for c in frame.columns]
+
+    missing = []
+    for entry in schema['required']:
+        options = entry if isinstance(entry, tuple) else (entry,)
+        if not any(col in frame.columns for col in options):
+            missing.append(' or '.join(repr(col) for col in options))
+    if missing:
+        raise SchemaError(
+            f"Sheet {schema['index']} ({name}) is missing required column(s): {', '.join(missing)}. "
+            f"Found: {', '.join(map(str, frame.columns))}"
+        )
+
+    for col, dtype in schema.get('dtypes', {}).items():
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce').astype(dtype)
+
+    return frame
+
+
+class SheetFrames:
+    """Sheets already read into dataframes (from CSV exports), behind the workbook interface _read_sheet uses."""
+
+    def __init__(self, frames):
+        self.frames = frames   # {sheet index: DataFrame}
+
+    def parse(self, index, usecols=None):
+        frame = self.frames[index]
+        return frame[[c for c in frame.columns if str(c).strip() in usecols]] if usecols is not None else frame
+
+
+def _sheet_gids(gids):
+    """{sheet: gid} from a dict keyed by sheet (SHEET_SCHEMAS name) or a list in workbook order."""
+    if gids is None:
+        return None
+    if isinstance(gids, list):
+        by_index = {schema['index']: name for name, schema in SHEET_SCHEMAS.items()}
+        gids = {by_index[i]: gid for i, gid in enumerate(gids) if i in by_index}
+    unknown = set(gids) - set(SHEET_SCHEMAS)
+    missing = set(SHEET_SCHEMAS) - set(gids)
+    if unknown or missing:
+        raise ValueError(f"sheet_gids must name every sheet once: unknown {sorted(unknown)}, missing {sorted(missing)}")
+    return dict(gids)
+
+
+def _read_csv(name, body):
+    """Read one sheet's CSV export, keeping only the columns its schema declares."""
+    schema = SHEET_SCHEMAS[name]
+    wanted = None if schema.get('all_columns') else set(_schema_columns(schema))
+    return pd.read_csv(io.BytesIO(body), usecols=(lambda c: str(c).strip() in wanted) if wanted else None)
+
+
+def fetch_sheets(site):
+    """Fetch each of the site's sheets as a CSV export, concurrently and over pooled connections,
+    reading each as soon as it arrives, then clean them like a workbook."""
+    urls = {name: fetcher.csv_export_url(site.source_url, gid) for name, gid in site.sheet_gids.items()}
+    raw = fetcher.fetch_all(urls, _read_csv, breaker=site.breaker, pool=fetcher.pool)
+    return _parse_workbook(SheetFrames({SHEET_SCHEMAS[name]['index']: frame for name, frame in raw.items()}), site.aliases)
+
+
+def _empty_frames():
+    """Frames with the expected columns but no rows, so the app can boot without data."""
+    frames = {name: pd.DataFrame(columns=_schema_columns(schema)) for name, schema in SHEET_SCHEMAS.items()}
+    frames['df_agg'] = pd.DataFrame(columns=['Year', 'Month', 'Generator', 'Hours Operated'])
+    frames['df_cost_2025'] = frames['df_cost'].copy()
+    frames['df_rc_melt'] = frames['df_stock'].copy()
+    frames['df_quarantine'] = pd.DataFrame(columns=QUARANTINE_COLUMNS)
+    frames['df_downtime_events'] = analytics.build_downtime_events(frames['df_downTime'])
+    frames.update(_build_derived(frames))
+    return frames
+
+
+def _parse_workbook(df, aliases=None):
+    """Clean every sheet of the downloaded workbook. Returns a dict of dataframes keyed by global name.
+
+    Generator and location names are mapped to canonical ones with `aliases`
+    (normalization.AliasTable, the defaults when None).
+    """
+    aliases = aliases or normalization.default_aliases
+    quarantined = []
+
+    # --- Meter Data ---
+    df_meter = _read_sheet(df, 'df_meter')
+    if 'Total Revenue' in df_meter.columns:
+        df_meter['Total Revenue'] = df_meter['Total Revenue'].astype(str).str.replace(',', '', regex=False)
+        df_meter['Total Revenue'] = df_meter['Total Revenue'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
+        df_meter['Total Revenue'] = pd.to_numeric(df_meter['Total Revenue'], errors='coerce')
+
+    df_meter['Location'] = aliases.location_names(df_meter['Location'])
+
+    if 'Year' in df_meter.columns:
+        df_meter['Year'] = df_meter['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+    elif 'Date' in df_meter.columns:
+        df_meter['Date'] = pd.to_datetime(df_meter['Date'])
+        df_meter['Year'] = df_meter['Date'].dt.strftime('%Y')
+
+    if 'Month' in df_meter.columns:
+        df_meter['Month'] = df_meter['Month'].astype(str).str.strip()
+    df_meter = _validate('df_meter', df_meter, quarantined, aliases)
+    df_meter['Month'] = pd.Categorical(df_meter['Month'], categories=constants.MONTH_ORDER, ordered=True)
+
+    # --- Cost Breakdown ---
+    df_cost = _read_sheet(df, 'df_cost')
+    if 'Amount (NGN)' in df_cost.columns:
+        df_cost['Amount (NGN)'] = df_cost['Amount (NGN)'].astype(str).str.replace(',', '', regex=False)
+        df_cost['Amount (NGN)'] = df_cost['Amount (NGN)'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
+        df_cost['Amount (NGN)'] = pd.to_numeric(df_cost['Amount (NGN)'], errors='coerce')
+
+    df_cost['Generator'] = aliases.generator_names(df_cost['Generator'])
+
+    if 'Year' in df_cost.columns:
+        df_cost['Year'] = df_cost['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+    elif 'Date' in df_cost.columns:
+        df_cost['Date'] = pd.to_datetime(df_cost['Date'])
+        df_cost['Year'] = df_cost['Date'].dt.strftime('%Y')
+
+    if 'Month' in df_cost.columns:
+        df_cost['Month'] = df_cost['Month'].astype(str).str.strip()
+    elif 'Date' in df_cost.columns:
+        if df_cost['Date'].dtype == object:
+            df_cost['Date'] = pd.to_datetime(df_cost['Date'])
+        df_cost['Month'] = df_cost['Date'].dt.strftime('%B')
+
+    df_cost = _validate('df_cost', df_cost, quarantined, aliases)
+    df_cost['Generator'] = aliases.as_generators(df_cost['Generator'])
+    df_cost.drop(columns=['id'], inplace=True, errors='ignore')
+    df_cost.reset_index(drop= True, inplace=True)
+
+    df_cost_2025 = df_cost.copy()
+
+    # --- Downtime ---
+    df_downTime = _read_sheet(df, 'df_downTime')
+    df_downTime = df_downTime.sort_values(by='Duration_Hours', ascending=False)
+    df_downTime['Generator'] = aliases.generator_names(df_downTime['Generator'])
+
+    if 'Year' in df_downTime.columns:
+        df_downTime['Year'] = df_downTime['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+    elif 'Date' in df_downTime.columns:
+        df_downTime['Date'] = pd.to_datetime(df_downTime['Date'], errors='coerce')
+        df_downTime['Year'] = df_downTime['Date'].dt.strftime('%Y')
+
+    if 'Month' in df_downTime.columns:
+        df_downTime['Month'] = df_downTime['Month'].astype(str).str.strip()
+    elif 'Date' in df_downTime.columns:
+         df_downTime['Month'] = df_downTime['Date'].dt.strftime('%B')
+
+    df_downTime["Month"] = pd.Categorical(
+        df_downTime["Month"],
+        categories=constants.MONTH_ORDER,
+        ordered=True
+    )
+    df_downTime = _validate('df_downTime', df_downTime, quarantined, aliases)
+    df_downTime['Generator'] = aliases.as_generators(df_downTime['Generator'])
+
+    # Keep the individual events before collapsing to monthly sums
+    df_downtime_events = analytics.build_downtime_events(df_downTime)
+
+    group_cols = ["Year", "Month", "Generator"] if 'Year' in df_downTime.columns else ["Month", "Generator"]
+    df_downTime = df_downTime.groupby(group_cols, as_index=False, observed=False)["Duration_Hours"].sum()
+
+    # --- Runtime ---
+    run_time = _read_sheet(df, 'run_time')
+    if 'Date' in run_time.columns and run_time['Date'].dtype == object:
+        # CSV exports give the dates as text
+        run_time['Date'] = pd.to_datetime(run_time['Date'], errors='coerce')
+    if 'Year' in run_time.columns:
+        run_time['Year'] = run_time['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+    elif 'Date' in run_time.columns:
+        run_time['Date'] = pd.to_datetime(run_time['Date'])
+        run_time['Year'] = run_time['Date'].dt.strftime('%Y')
+
+    if 'Month' in run_time.columns:
+        run_time['Month'] = run_time['Month'].astype(str).str.strip()
+    elif 'Date' in run_time.columns:
+        if run_time['Date'].dtype == object:
+            run_time['Date'] = pd.to_datetime(run_time['Date'])
+        run_time['Month'] = run_time['Date'].dt.strftime('%B')
+
+    if 'Day' not in run_time.columns and 'Date' in run_time.columns:
+        if run_time['Date'].dtype == object:
+            run_time['Date'] = pd.to_datetime(run_time['Date'])
+        run_time['Day'] = run_time['Date'].dt.strftime('%A')
+
+    run_time['Generator'] = aliases.generator_names(run_time['Generator'])
+
+    run_time = _validate('run_time', run_time, quarantined, aliases)
+    run_time['Generator'] = aliases.as_generators(run_time['Generator'])
+
+    df_agg = run_time.groupby(['Year', 'Month', 'Generator'], as_index=False, observed=True)['Hours Operated'].sum()
+    df_agg['Month'] = pd.Categorical(df_agg['Month'], categories=constants.MONTH_ORDER, ordered=True)
+    df_agg = df_agg.sort_values(by='Month')
+
+    # --- Fuel Supplied ---
+    df_supplied = _read_sheet(df, 'df_supplied')
+
+    if 'Year' in df_supplied.columns:
+        df_supplied['Year'] = df_supplied['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+    elif 'Date' in df_supplied.columns:
+        df_supplied['Date'] = pd.to_datetime(df_supplied['Date'])
+        df_supplied['Year'] = df_supplied['Date'].dt.strftime('%Y')
+
+    if 'Month' in df_supplied.columns:
+        df_supplied['Month'] = df_supplied['Month'].astype(str).str.strip()
+    elif 'Date' in df_supplied.columns:
+        if df_supplied['Date'].dtype == object:
+            df_supplied['Date'] = pd.to_datetime(df_supplied['Date'])
+        df_supplied['Month'] = df_supplied['Date'].dt.strftime('%B')
+
+    if 'Generator' in df_supplied.columns:
+        df_supplied['Generator'] = aliases.generator_names(df_supplied['Generator'])
+
+    df_supplied = _validate('df_supplied', df_supplied, quarantined, aliases)
+    if 'Generator' in df_supplied.columns:
+        df_supplied['Generator'] = aliases.as_generators(df_supplied['Generator'])
+
+    # --- Stock ---
+    df_stock = _read_sheet(df, 'df_stock')
+    if 'Year' in df_stock.columns:
+        df_stock['Year'] = df_stock['Year'].astype(str).str.replace(r'\.0', '', regex=True)
+        if 'Month' in df_stock.columns:
+            # Ensure Month is standardized to Month Name (e.g. "January")
+            try:
+                temp_dates = pd.to_datetime(df_stock['Month'], errors='coerce')
+                # Replaced whole: Excel dates make this a datetime column that can't hold names
+                df_stock['Month'] = temp_dates.dt.strftime('%B').where(temp_dates.notna(), df_stock['Month'])
+            except Exception:
+                pass
+            df_stock['Month'] = df_stock['Month'].astype(str).str.strip()
+    else:
+        df_stock['Date_Obj'] = pd.to_datetime(df_stock['Month'])
+        df_stock['Month'] = df_stock['Date_Obj'].dt.strftime('%B')
+        df_stock['Year'] = df_stock['Date_Obj'].dt.strftime('%Y')
+
+    if 'Generator_Size' in df_stock.columns:
+        # Canonical spellings, but stock can list sizes the site doesn't run, so these stay plain strings
+        df_stock['Generator_Size'] = aliases.generator_names(df_stock['Generator_Size'].astype(str))
+
+    df_stock = _validate('df_stock', df_stock, quarantined, aliases)
+    df_rc_melt = df_stock.copy()
+
+    # --- Power Transaction ---
+    power_df = _read_sheet(df, 'power_df')
+    if 'Amount' in power_df.columns:
+        power_df['Amount'] = power_df['Amount'].astype(str).str.replace(',', '', regex=False)
+        power_df['Amount'] = power_df['Amount'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
+        power_df['Amount'] = pd.to_numeric(power_df['Amount'], errors='coerce')
+
+    power_df['Resident Address'] = aliases.location_names(power_df['Resident Address'])
+
+    # Prioritize existing Year/Month columns from source; blank cells stay missing so the date can fill them
+    if 'Year' in power_df.columns:
+        blank = power_df['Year'].isna()
+        power_df['Year'] = power_df['Year'].astype(str).str.replace(r'\.0', '', regex=True).str.strip()
+        power_df['Year'] = power_df['Year'].mask(blank | (power_df['Year'] == ''))
+
+    if 'Month' in power_df.columns:
+        blank = power_df['Month'].isna()
+        power_df['Month'] = power_df['Month'].astype(str).str.strip()
+        power_df['Month'] = power_df['Month'].mask(blank | (power_df['Month'] == ''))
+
+    if 'Transaction Date' in power_df.columns:
+        # Robust date parsing (still useful for filling gaps)
+        if not pd.api.types.is_datetime64_any_dtype(power_df['Transaction Date']):
+            # Try parsing with dayfirst=True (common in Nigeria)
+            temp_dates = pd.to_datetime(power_df['Transaction Date'].astype(str), dayfirst=True, errors='coerce')
+            # If too many failures (>80%), try standard parsing (Month-First)
+            if temp_dates.isna().mean() > 0.8:
+                temp_dates = pd.to_datetime(power_df['Transaction Date'].astype(str), errors='coerce')
+            power_df['Transaction Date'] = temp_dates
+
+        # Fill missing Year/Month from Transaction Date if needed
+        if 'Year' not in power_df.columns:
+            power_df['Year'] = power_df['Transaction Date'].dt.strftime('%Y')
+        else:
+            power_df['Year'] = power_df['Year'].fillna(power_df['Transaction Date'].dt.strftime('%Y'))
+
+        if 'Month' not in power_df.columns:
+            power_df['Month'] = power_df['Transaction Date'].dt.strftime('%B')
+        else:
+            power_df['Month'] = power_df['Month'].fillna(power_df['Transaction Date'].dt.strftime('%B'))
+
+    # Rows without a usable Month (the grouping key) are quarantined here
+    power_df = _validate('power_df', power_df, quarantined, aliases)
+
+    power_df.reset_index(drop=True, inplace=True)
+
+    # --- Electrical Inventory (Last Sheet) ---
+    df_electrical = _read_sheet(df, 'df_electrical')
+
+    return {
+        'df_meter': df_meter,
+        'df_cost': df_cost,
+        'df_cost_2025': df_cost_2025,
+        'df_downTime': df_downTime,
+        'df_downtime_events': df_downtime_events,
+        'run_time': run_time,
+        'df_agg': df_agg,
+        'df_supplied': df_supplied,
+        'df_stock': df_stock,
+        'df_rc_melt': df_rc_melt,
+        'power_df': power_df,
+        'df_electrical': df_electrical,
+        'df_quarantine': pd.concat(quarantined, ignore_index=True) if quarantined else pd.DataFrame(columns=QUARANTINE_COLUMNS),
+    }
+
+
+# Derived table -> the parsed tables it is computed from. A refresh reuses the previous
+# snapshot's table when none of these changed (by table_digests()).
+DERIVED_INPUTS = {
+    'df_compliance': ['run_time'],
+    'df_fuel_efficiency': ['df_supplied', 'df_agg', 'df_cost'],
+    'df_downtime_partitions': ['df_downtime_events'],
+    'df_stock_alerts': ['df_stock'],
+    'df_meter_anomalies': ['power_df'],
+    'time_series': ['power_df', 'run_time'],
+    'df_forecast': ['power_df', 'df_meter', 'df_supplied', 'df_cost_2025'],
+}
+
+
+def _build_derived(frames, site=None, refresh=False, digests=None):
+    """Precompute the analytics tables the callbacks read, once per data generation.
+
+    `refresh` is set on the refresh path, the only one allowed to use the forecasting process pool.
+    With the parsed tables' `digests`, tables whose inputs are unchanged since the site's
+    current snapshot are taken from it instead of being computed again.
+    """
+    schedule = site.schedule if site is not None else None
+    meter_to_name = site.meter_to_name if site is not None else None
+    aliases = site.aliases if site is not None else None
+    builders = {
+        'df_compliance': lambda: analytics.compute_schedule_compliance(frames['run_time'], schedule),
+        'df_fuel_efficiency': lambda: analytics.compute_fuel_efficiency(frames['df_supplied'], frames['df_agg'], frames['df_cost']),
+        'df_downtime_partitions': lambda: analytics.rollup_downtime_partitions(frames['df_downtime_events']),
+        'df_stock_alerts': lambda: analytics.compute_stock_alerts(frames['df_stock']),
+        'df_meter_anomalies': lambda: analytics.compute_meter_anomalies(frames['power_df'], meter_to_name),
+        'time_series': lambda: analytics.build_time_series(frames['power_df'], frames['run_time'], meter_to_name, aliases),
+        'df_forecast': lambda: forecasting.build_forecasts(frames, meter_to_name, parallel=refresh),
+    }
+
+    previous = site.snapshot if site is not None and site.snapshot is not None and site.snapshot.digests else None
+    derived, reused = {}, []
+    for name, build in builders.items():
+        if previous is not None and digests is not None and all(
+                previous.digests.get(table) == digests[table] for table in DERIVED_INPUTS[name]):
+            derived[name] = getattr(previous, name)
+            reused.append(name)
+        else:
+            derived[name] = build()
+    if reused:
+        print(f"[{site.id}] Inputs unchanged, reused: {', '.join(reused)}")
+    return derived
+
+
+class Snapshot:
+    """One site's dataframes and derived tables, published together.
+
+    Every table is an attribute (`snap.df_meter`, `snap.time_series`, ...).
+    A snapshot is never modified after it is published, so callbacks can
+    read it without locking while the site's next refresh is parsed.
+    """
+
+    def __init__(self, site, frames, as_of, generation, digests=None):
+        self.__dict__.update(frames)
+        self.site_id = site.id
+        self.meter_to_name = site.meter_to_name
+        self.locations = site.locations
+        self.aliases = site.aliases
+        self.as_of = as_of
+        self.generation = generation
+        self.digests = digests            # table_digests() of the parsed tables, None for history
+        self._table_bytes = None
+
+    @property
+    def table_bytes(self):
+        """Deep memory usage of each table in bytes (computed once)."""
+        if self._table_bytes is None:
+            sizes = {}
+            for name, value in vars(self).items():
+                if isinstance(value, pd.DataFrame):
+                    sizes[name] = int(value.memory_usage(deep=True).sum())
+                elif name == 'time_series':
+                    # {series: {granularity: DataFrame}}
+                    sizes[name] = sum(int(df.memory_usage(deep=True).sum())
+                                      for per_granularity in value.values() for df in per_granularity.values())
+            self._table_bytes = sizes
+        return self._table_bytes
+
+    @property
+    def memory_bytes(self):
+        return sum(self.table_bytes.values())
+
+
+class Site:
+    """A workbook source plus its refresh state and the snapshot currently served."""
+
+    def __init__(self, site_id, name, source_url, meter_to_name=None, locations=None, schedule=None, aliases=None,
+                 sheet_gids=None):
+        self.id = site_id
+        self.name = name
+        self.source_url = source_url
+        self.sheet_gids = _sheet_gids(sheet_gids)   # {sheet: gid}, or None to download the workbook
+        self.meter_to_name = meter_to_name if meter_to_name is not None else constants.METER_TO_NAME
+        self.locations = locations if locations is not None else constants.SUBSCRIBER_LOCATIONS
+        self.schedule = schedule if schedule is not None else constants.DAILY_SCHEDULE
+        self.aliases = aliases if aliases is not None else normalization.default_aliases
+        self.breaker = fetcher.CircuitBreaker(failure_threshold=3, cooldown=120)
+        self.refresh_lock = threading.Lock()   # held while this site is fetching/parsing
+        self.snapshot = None
+        self.last_attempt_time = None
+        self.last_error = None
+        self.pending = None                    # Future of a queued background refresh
+        # When the source last fetched cleanly (epoch seconds). In shared memory, so
+        # preloaded workers see the master confirm unchanged data without a reload
+        self.last_checked = multiprocessing.RawValue('d', 0.0)
+
+    @classmethod
+    def from_config(cls, entry):
+        source_url = entry.get('source_url') or (
+            f"https://docs.google.com/spreadsheets/d/{entry['sheet_id']}/export?format=xlsx")
+        meters = entry.get('meters')
+        if meters is not None:
+            # JSON keys are strings; meter numbers in the sheets are integers
+            meters = {int(k) if str(k).isdigit() else k: v for k, v in meters.items()}
+        schedule = entry.get('schedule')
+        if schedule is not None:
+            schedule = {int(day): gens for day, gens in schedule.items()}
+        aliases = entry.get('aliases')
+        if aliases is not None:
+            aliases = normalization.AliasTable.from_config(normalization.file_config, aliases)
+        return cls(entry['id'], entry.get('name', entry['id']), source_url, meters, entry.get('locations'), schedule, aliases,
+                   entry.get('sheet_gids'))
+
+    def refresh_due(self):
+        if self.last_attempt_time is None:
+            return True
+        interval = REFRESH_INTERVAL if self.last_error is None else FAILURE_RETRY_INTERVAL
+        return (datetime.now() - self.last_attempt_time).total_seconds() >= interval
+
+    def status(self):
+        """Summary of the data served for this site, for the UI and health checks."""
+        as_of = self.snapshot.as_of if self.snapshot is not None else None
+        checked = datetime.fromtimestamp(self.last_checked.value) if self.last_checked.value else as_of
+        if as_of is not None and checked < as_of:
+            checked = as_of
+        too_old = checked is not None and (datetime.now() - checked).total_seconds() > STALE_AFTER
+        return {
+            'site': self.id,
+            'as_of': as_of,
+            'checked': checked,
+            'generation': self.snapshot.generation if self.snapshot is not None else 0,
+            'stale': self.last_error is not None or too_old,
+            'error': self.last_error,
+            'refreshing': self.refresh_lock.locked(),
+            'breaker': self.breaker.state,
+            'memory_mb': round(self.snapshot.memory_bytes / 1e6, 1) if self.snapshot is not None else 0.0,
+            'quarantined': self.quarantine_counts(),
+        }
+
+    def quarantine_counts(self):
+        """Rows set aside by validation in the served snapshot, per sheet."""
+        if self.snapshot is None or self.snapshot.df_quarantine.empty:
+            return {}
+        return self.snapshot.df_quarantine['Sheet'].value_counts().to_dict()
+
+
+def _load_sites():
+    if SITES_FILE:
+        with open(SITES_FILE) as f:
+            entries = json.load(f)
+        return {entry['id']: Site.from_config(entry) for entry in entries}
+    return {'gravitas': Site('gravitas', 'Gravitas', SOURCE_URL, sheet_gids=json.loads(SHEET_GIDS) if SHEET_GIDS else None)}
+
+
+sites = _load_sites()
+DEFAULT_SITE_ID = next(iter(sites))
+source_breaker = sites[DEFAULT_SITE_ID].breaker
+
+# Past snapshots are the first thing evicted after cached results when memory is over budget
+_history = memory.LRUCache('history', HISTORY_CACHE_SIZE, kind=memory.SNAPSHOTS, sizeof=lambda snap: snap.memory_bytes)
+memory.track_snapshots(lambda: [site.snapshot for site in sites.values() if site.snapshot is not None])
+
+
+def get_site(site_id=None):
+    return sites.get(site_id) or sites[DEFAULT_SITE_ID]
+
+
+def get_snapshot(site_id=None, as_of=None):
+    """The snapshot served for `site_id` (the default site if None or unknown).
+
+    `as_of` is a key from `history()`; None or 'live' means the current data.
+    """
+    site = get_site(site_id)
+    if as_of and as_of != 'live':
+        try:
+            return _historical_snapshot(site.id, as_of)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"[{site.id}] Could not load snapshot {as_of}: {e}")
+    if site.snapshot is None:
+        # Nothing published yet (first load still running): serve empty tables
+        with data_lock:
+            if site.snapshot is None:
+                site.snapshot = Snapshot(site, _empty_frames(), None, 0)
+    return site.snapshot
+
+
+def read_workbook(source, reader=None, aliases=None):
+    """Open a downloaded workbook with the configured reader and parse every sheet."""
+    reader = reader or XLSX_READER
+    if reader == 'streaming':
+        with xlsx_reader.StreamingWorkbook(source) as workbook:
+            return _parse_workbook(workbook, aliases)
+    return _parse_workbook(pd.ExcelFile(source), aliases)
+
+
+def history(site_id=None):
+    """Stored past snapshots of a site as (key, taken at) pairs, newest first."""
+    if not snapshot_store.enabled():
+        return []
+    return snapshot_store.list_snapshots(get_site(site_id).id)
+
+
+def _historical_snapshot(site_id, key):
+    snap = _history.get((site_id, key))
+    if snap is None:
+        # Partitions are memory-mapped; only the derived tables are recomputed
+        site = sites[site_id]
+        frames, manifest = snapshot_store.load(site_id, key)
+        frames.setdefault('df_quarantine', pd.DataFrame(columns=QUARANTINE_COLUMNS))  # stored before validation existed
+        frames.update(_build_derived(frames, site))
+        snap = Snapshot(site, frames, datetime.fromisoformat(manifest['as_of']), manifest['generation'])
+        _history.put((site_id, key), snap)
+    return snap
+
+
+def _persist_history(site, sheets, as_of, generation):
+    # History is best effort: a full disk must not turn into a failed refresh
+    try:
+        key = snapshot_store.persist(site.id, sheets, as_of, generation)
+        if key is not None:
+            removed = snapshot_store.apply_retention(site.id)
+            print(f"[{site.id}] Stored snapshot {key}" + (f", {removed} expired" if removed else ""))
+    except Exception as e:
+        print(f"[{site.id}] Could not store snapshot: {e}")
+
+
+def table_digests(sheets):
+    """{table: hash of its columns, index and values} for the parsed tables; equal for identical data."""
+    digests = {}
+    for name, frame in sheets.items():
+        digest = hashlib.sha256(repr((list(frame.columns), [str(t) for t in frame.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        digests[name] = digest.hexdigest()
+    return digests
+
+
+def _swap_frames(site, frames, as_of, digests=None):
+    """Publish a freshly parsed set of dataframes as `site`'s snapshot."""
+    global last_refresh_time, data_generation
     with data_lock:
+        data_generation += 1
+        site.snapshot = Snapshot(site, frames, as_of, data_generation, digests)
+        if site.id == DEFAULT_SITE_ID:
+            globals().update(frames)
+            last_refresh_time = as_of
+    print(f"[{site.id}] Published generation {data_generation} ({site.snapshot.memory_bytes / 1e6:.1f} MB)")
+    memory.enforce()
+
+
+def _refresh_site(site):
+    """Fetch, parse and publish one site's workbook.
+
+    Fetching and parsing happen outside `data_lock`, so readers keep getting
+    the previous snapshot while a refresh is running. If the source is slow or
+    failing, the previous snapshot stays in place (stale) and the error is kept
+    in `site.last_error`. If nothing has ever loaded, empty frames are served.
+    If the data is unchanged, the current snapshot and generation are kept.
+    """
+    global last_attempt_time, last_error
+
+    with site.refresh_lock:
+        if not site.refresh_due():
+            return
+
+        current_time = datetime.now()
+        site.last_attempt_time = current_time
         try:
-            # Check if we need to refresh (5-minute interval)
-            current_time = datetime.now()
-            if (last_refresh_time is None or
-                (current_time - last_refresh_time).total_seconds() >= REFRESH_INTERVAL):
-               
-                print("Refreshing data from source...")
-               
-                url = "https://docs.google.com/spreadsheets/d/1LfdWF1pzfC8PGwD-pMgzHw8JIZtll74W8-39vNsKgGA/edit?usp=sharing"
-
-                sheet_id = "1LfdWF1pzfC8PGwD-pMgzHw8JIZtll74W8-39vNsKgGA"
-                excel_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
-                df = pd.ExcelFile(excel_url)
-
-                # --- Meter Data ---
-                df_meter = df.parse(0)
-                df_meter.columns = df_meter.columns.str.strip()
-                if 'Total Revenue' in df_meter.columns:
-                    df_meter['Total Revenue'] = df_meter['Total Revenue'].astype(str).str.replace(',', '', regex=False)
-                    df_meter['Total Revenue'] = df_meter['Total Revenue'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
-                    df_meter['Total Revenue'] = pd.to_numeric(df_meter['Total Revenue'], errors='coerce').fillna(0)
-
-                if 'Year' in df_meter.columns:
-                    df_meter['Year'] = df_meter['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                elif 'Date' in df_meter.columns:
-                    df_meter['Date'] = pd.to_datetime(df_meter['Date'])
-                    df_meter['Year'] = df_meter['Date'].dt.strftime('%Y')
-
-                if 'Month' in df_meter.columns:
-                    df_meter['Month'] = df_meter['Month'].astype(str).str.strip()
-                df_meter['Month'] = pd.Categorical(df_meter['Month'], categories=constants.MONTH_ORDER, ordered=True)
-
-                # --- Cost Breakdown ---
-                df_cost = df.parse(1)
-                df_cost.columns = df_cost.columns.str.strip()
-                if 'Amount (NGN)' in df_cost.columns:
-                    df_cost['Amount (NGN)'] = df_cost['Amount (NGN)'].astype(str).str.replace(',', '', regex=False)
-                    df_cost['Amount (NGN)'] = df_cost['Amount (NGN)'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
-                    df_cost['Amount (NGN)'] = pd.to_numeric(df_cost['Amount (NGN)'], errors='coerce').fillna(0)
-
-                df_cost['Generator'].replace(['new 80kva', 'both 80kva', 'old 80kva', 'new 200kva', '55Kva'],
-                                         ['80kva', '80kva', '80kva',  '200kva', '55kva' ], inplace= True)
-
-                # Normalize generator names to lowercase to ensure matching (e.g. '80KVA' -> '80kva')
-                if 'Generator' in df_cost.columns:
-                    df_cost['Generator'] = df_cost['Generator'].astype(str).str.strip().str.lower()
-
-                if 'Year' in df_cost.columns:
-                    df_cost['Year'] = df_cost['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                elif 'Date' in df_cost.columns:
-                    df_cost['Date'] = pd.to_datetime(df_cost['Date'])
-                    df_cost['Year'] = df_cost['Date'].dt.strftime('%Y')
-               
-                if 'Month' in df_cost.columns:
-                    df_cost['Month'] = df_cost['Month'].astype(str).str.strip()
-                elif 'Date' in df_cost.columns:
-                    if df_cost['Date'].dtype == object:
-                        df_cost['Date'] = pd.to_datetime(df_cost['Date'])
-                    df_cost['Month'] = df_cost['Date'].dt.strftime('%B')
-
-                df_cost.drop(columns=['id'], inplace=True, errors='ignore')
-                df_cost.reset_index(drop= True, inplace=True)
-               
-                df_cost_2025 = df_cost.copy()
-
-                # --- Downtime ---
-                df_downTime = df.parse(2)
-                df_downTime = df_downTime.sort_values(by='Duration_Hours', ascending=False)
-                df_downTime['Generator'] = df_downTime['Generator'].replace('88kva', '80kva')
-
-                # Normalize generator names
-                if 'Generator' in df_downTime.columns:
-                    df_downTime['Generator'] = df_downTime['Generator'].astype(str).str.strip().str.lower()
-
-                if 'Year' in df_downTime.columns:
-                    df_downTime['Year'] = df_downTime['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                elif 'Date' in df_downTime.columns:
-                    df_downTime['Date'] = pd.to_datetime(df_downTime['Date'], errors='coerce')
-                    df_downTime['Year'] = df_downTime['Date'].dt.strftime('%Y')
-               
-                if 'Month' in df_downTime.columns:
-                    df_downTime['Month'] = df_downTime['Month'].astype(str).str.strip()
-                elif 'Date' in df_downTime.columns:
-                     df_downTime['Month'] = df_downTime['Date'].dt.strftime('%B')
-
-                df_downTime["Month"] = pd.Categorical(
-                    df_downTime["Month"],
-                    categories=constants.MONTH_ORDER,
-                    ordered=True
-                )
-                group_cols = ["Year", "Month", "Generator"] if 'Year' in df_downTime.columns else ["Month", "Generator"]
-                df_downTime = df_downTime.groupby(group_cols, as_index=False)["Duration_Hours"].sum()
-
-                # --- Runtime ---
-                run_time = df.parse(4)
-                if 'Year' in run_time.columns:
-                    run_time['Year'] = run_time['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                elif 'Date' in run_time.columns:
-                    run_time['Date'] = pd.to_datetime(run_time['Date'])
-                    run_time['Year'] = run_time['Date'].dt.strftime('%Y')
-               
-                if 'Month' in run_time.columns:
-                    run_time['Month'] = run_time['Month'].astype(str).str.strip()
-                elif 'Date' in run_time.columns:
-                    if run_time['Date'].dtype == object:
-                        run_time['Date'] = pd.to_datetime(run_time['Date'])
-                    run_time['Month'] = run_time['Date'].dt.strftime('%B')
-               
-                if 'Day' not in run_time.columns and 'Date' in run_time.columns:
-                    if run_time['Date'].dtype == object:
-                        run_time['Date'] = pd.to_datetime(run_time['Date'])
-                    run_time['Day'] = run_time['Date'].dt.strftime('%A')
-                   
-                run_time['Generator'].replace(['20KVA', '200KVA', '80KVA', '55KVA'], ['20kva', '200kva', '80kva', '55kva'], inplace = True)
-               
-                # Normalize generator names
-                if 'Generator' in run_time.columns:
-                    run_time['Generator'] = run_time['Generator'].astype(str).str.strip().str.lower()
-
-                df_agg = run_time.groupby(['Year', 'Month', 'Generator'], as_index=False)['Hours Operated'].sum()
-                df_agg['Month'] = pd.Categorical(df_agg['Month'], categories=constants.MONTH_ORDER, ordered=True)
-                df_agg = df_agg.sort_values(by='Month')
-
-                # --- Fuel Supplied ---
-                df_supplied = df.parse(3)
-
-                if 'Year' in df_supplied.columns:
-                    df_supplied['Year'] = df_supplied['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                elif 'Date' in df_supplied.columns:
-                    df_supplied['Date'] = pd.to_datetime(df_supplied['Date'])
-                    df_supplied['Year'] = df_supplied['Date'].dt.strftime('%Y')
-
-                if 'Month' in df_supplied.columns:
-                    df_supplied['Month'] = df_supplied['Month'].astype(str).str.strip()
-                elif 'Date' in df_supplied.columns:
-                    if df_supplied['Date'].dtype == object:
-                        df_supplied['Date'] = pd.to_datetime(df_supplied['Date'])
-                    df_supplied['Month'] = df_supplied['Date'].dt.strftime('%B')
-
-                # --- Stock ---
-                df_stock = df.parse(5)
-                if 'Year' in df_stock.columns:
-                    df_stock['Year'] = df_stock['Year'].astype(str).str.replace(r'\.0', '', regex=True)
-                    if 'Month' in df_stock.columns:
-                        # Ensure Month is standardized to Month Name (e.g. "January")
-                        try:
-                            temp_dates = pd.to_datetime(df_stock['Month'], errors='coerce')
-                            mask = temp_dates.notna()
-                            df_stock.loc[mask, 'Month'] = temp_dates[mask].dt.strftime('%B')
-                        except Exception:
-                            pass
-                        df_stock['Month'] = df_stock['Month'].astype(str).str.strip()
-                else:
-                    df_stock['Date_Obj'] = pd.to_datetime(df_stock['Month'])
-                    df_stock['Month'] = df_stock['Date_Obj'].dt.strftime('%B')
-                    df_stock['Year'] = df_stock['Date_Obj'].dt.strftime('%Y')
-               
-                if 'Generator_Size' in df_stock.columns:
-                    df_stock['Generator_Size'] = df_stock['Generator_Size'].astype(str).str.strip().str.lower()
-
-                df_rc_melt = df_stock.copy()
-
-                # --- Power Transaction ---
-                power_df = df.parse(6)
-                power_df.columns = power_df.columns.str.strip()
-                if 'Amount' in power_df.columns:
-                    power_df['Amount'] = power_df['Amount'].astype(str).str.replace(',', '', regex=False)
-                    power_df['Amount'] = power_df['Amount'].astype(str).str.replace(r'[^\d.-]', '', regex=True)
-                    power_df['Amount'] = pd.to_numeric(power_df['Amount'], errors='coerce').fillna(0)
-
-                # Prioritize existing Year/Month columns from source
-                if 'Year' in power_df.columns:
-                    power_df['Year'] = power_df['Year'].astype(str).str.replace(r'\.0', '', regex=True).str.strip()
-                
-                if 'Month' in power_df.columns:
-                    power_df['Month'] = power_df['Month'].astype(str).str.strip()
-
-                if 'Transaction Date' in power_df.columns:
-                    # Robust date parsing (still useful for filling gaps)
-                    if not pd.api.types.is_datetime64_any_dtype(power_df['Transaction Date']):
-                        # Try parsing with dayfirst=True (common in Nigeria)
-                        temp_dates = pd.to_datetime(power_df['Transaction Date'].astype(str), dayfirst=True, errors='coerce')
-                        # If too many failures (>80%), try standard parsing (Month-First)
-                        if temp_dates.isna().mean() > 0.8:
-                            temp_dates = pd.to_datetime(power_df['Transaction Date'].astype(str), errors='coerce')
-                        power_df['Transaction Date'] = temp_dates
-
-                    # Fill missing Year/Month from Transaction Date if needed
-                    if 'Year' not in power_df.columns:
-                        power_df['Year'] = power_df['Transaction Date'].dt.strftime('%Y')
-                    else:
-                        power_df['Year'] = power_df['Year'].fillna(power_df['Transaction Date'].dt.strftime('%Y'))
-
-                    if 'Month' not in power_df.columns:
-                        power_df['Month'] = power_df['Transaction Date'].dt.strftime('%B')
-                    else:
-                        power_df['Month'] = power_df['Month'].fillna(power_df['Transaction Date'].dt.strftime('%B'))
-
-                # Only drop rows if we absolutely lack a Month (grouping key)
-                power_df = power_df.dropna(subset=['Month'])
-
-                power_df.reset_index(drop=True, inplace=True)
-
-                # --- Electrical Inventory (Last Sheet) ---
-                df_electrical = df.parse(7)
-               
-                last_refresh_time = current_time
-                print("Data refresh completed successfully")
-               
+            print(f"[{site.id}] Refreshing data from source...")
+            if site.sheet_gids:
+                frames = fetch_sheets(site)
+            else:
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as download:
+                    fetcher.fetch_with_retries(site.source_url, breaker=site.breaker, into=download, pool=fetcher.pool)
+                    frames = read_workbook(download, aliases=site.aliases)
+            if not frames['df_quarantine'].empty:
+                counts = frames['df_quarantine']['Sheet'].value_counts()
+                print(f"[{site.id}] Quarantined {counts.sum()} row(s) failing validation: "
+                      + ", ".join(f"{sheet} {n}" for sheet, n in counts.items()))
+            sheets = dict(frames)
+            digests = table_digests(sheets)
+            site.last_error = None
+            site.last_checked.value = current_time.timestamp()
+            if site.snapshot is not None and site.snapshot.digests == digests:
+                print(f"[{site.id}] Data unchanged, keeping generation {site.snapshot.generation}")
+            else:
+                frames.update(_build_derived(frames, site, refresh=True, digests=digests))
+                _swap_frames(site, frames, current_time, digests)
+                print(f"[{site.id}] Data refresh completed successfully")
+                _persist_history(site, sheets, current_time, site.snapshot.generation)
+                for hook in publish_hooks:
+                    hook(site)
+
         except Exception as e:
-            print(f"Error refreshing data: {e}")
+            site.last_error = str(e)
+            if site.snapshot is None or site.snapshot.as_of is None:
+                print(f"[{site.id}] Error refreshing data: {e} (no data loaded yet, serving empty frames)")
+                frames = _empty_frames()
+                with data_lock:
+                    site.snapshot = Snapshot(site, frames, None, 0)
+                    if site.id == DEFAULT_SITE_ID:
+                        globals().update(frames)
+            else:
+                print(f"[{site.id}] Error refreshing data: {e} (serving data as of {site.snapshot.as_of:%Y-%m-%d %H:%M})")
+
+        if site.id == DEFAULT_SITE_ID:
+            last_attempt_time = site.last_attempt_time
+            last_error = site.last_error
+
+
+def _executor():
+    # Bounded so a many-site process can't open a connection per site at once
+    global _refresh_executor
+    if _refresh_executor is None:
+        _refresh_executor = ThreadPoolExecutor(max_workers=max(1, min(REFRESH_WORKERS, len(sites))),
+                                               thread_name_prefix="data-refresh")
+    return _refresh_executor
+
+
+def load_all_data():
+    """Refresh every site that is due and wait for them to finish.
+
+    Sites are refreshed concurrently on a bounded pool, each under its own
+    lock, so one slow or large workbook doesn't hold up the others.
+    """
+    due = [site for site in sites.values() if site.refresh_due()]
+    if len(due) == 1:
+        _refresh_site(due[0])
+        return
+    for future in [_executor().submit(_refresh_site, site) for site in due]:
+        future.result()
+
+
+def request_refresh(site_id=None):
+    """Queue background refreshes for due sites (or just `site_id`), without blocking the caller.
+
+    Callbacks use this so a slow source never turns into a slow request: they
+    keep serving the current snapshot while the refresh runs.
+    """
+    if not AUTO_REFRESH:
+        return
+    targets = [get_site(site_id)] if site_id is not None else list(sites.values())
+    for site in targets:
+        if not site.refresh_due() or site.refresh_lock.locked():
+            continue
+        if site.pending is not None and not site.pending.done():
+            continue
+        site.pending = _executor().submit(_refresh_site, site)
+
+
+def wait_for_refreshes():
+    """Block until the refreshes queued by request_refresh() have finished."""
+    for site in sites.values():
+        if site.pending is not None:
+            site.pending.result()
+
+
+def after_fork(refresh=True):
+    """Reset process-local state in a freshly forked worker.
+
+    Locks may have been held by a master thread at fork time, so they are
+    recreated, and the refresh pool's threads don't survive the fork. With
+    `refresh=False` the worker keeps serving the data it inherited and leaves
+    refreshing to the master.
+    """
+    global data_lock, _refresh_executor, AUTO_REFRESH
+    data_lock = threading.Lock()
+    _refresh_executor = None
+    fetcher.after_fork()
+    forecasting.after_fork()
+    for site in sites.values():
+        site.refresh_lock = threading.Lock()
+        site.pending = None
+    AUTO_REFRESH = refresh
+
+
+def data_status(site_id=None):
+    """Summary of the data currently served for a site (the default site if None)."""
+    return get_site(site_id).status()
+
+
+def sites_status():
+    """data_status() for every site, keyed by site id."""
+    return {site_id: site.status() for site_id, site in sites.items()}
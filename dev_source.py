@@ -0,0 +1,230 @@
+"""Local stand-in for the Google Sheets export.
+
+Serves a synthetic workbook with the same sheet layout as the production
+spreadsheet, with optional artificial latency and failures, so the fetch
+layer in data_loader can be exercised without touching Google:
+
+    python dev_source.py --port 8765 --delay 5 --fail-rate 0.5
+    GRAVITAS_SOURCE_URL=http://127.0.0.1:8765/export?format=xlsx python app.py
+
+Like Google, it also serves each sheet on its own as
+/export?format=csv&gid=<gid>, where the gid is the sheet's position in the
+workbook, over keep-alive connections:
+
+    GRAVITAS_SOURCE_URL=http://127.0.0.1:8765/export?format=xlsx GRAVITAS_SHEET_GIDS='[0,1,2,3,4,5,6,7]' python app.py
+"""
+import argparse
+import io
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+import constants
+
+GENERATORS = ['80kva', '55kva', '200kva', '20kva']
+# Spellings found in the real sheets, so the normalization code gets exercised
+GENERATOR_SPELLINGS = {
+    'cost': ['80kva', 'new 80kva', 'old 80kva', '55Kva', '200kva', 'new 200kva', '20kva'],
+    'downtime': ['80kva', '88kva', '55kva', '200kva', '20kva'],
+    'runtime': ['80KVA', '55KVA', '200KVA', '20KVA'],
+}
+FILTER_TYPES = ['Oil Filter', 'Fuel Filter', 'Air Filter', 'Water Separator']
+ACTIVITIES = ['Fuel Purchase', 'Routine Maintenance', 'Corrective Maintenance']
+
+
+def build_frames(years=(2024, 2025), transactions_per_month=400, seed=7):
+    """Generate one dataframe per sheet, in workbook order."""
+    rng = np.random.default_rng(seed)
+    months = [(y, m) for y in years for m in range(1, 13)]
+    month_names = constants.MONTH_ORDER
+
+    # Sheet 0: meter readings
+    meter_locations = constants.GRAVITAS_REVENUE_SOURCES + ['Western Lodge', 'Canteen']
+    meter = pd.DataFrame([
+        {'Location': loc, 'Month': month_names[m - 1], 'Year': y,
+         'Total Revenue': f"{rng.uniform(50_000, 400_000):,.2f}"}
+        for y, m in months for loc in meter_locations
+    ])
+
+    # Sheet 1: cost breakdown
+    n_cost = len(months) * 12
+    cost_month = rng.integers(0, len(months), n_cost)
+    cost = pd.DataFrame({
+        'id': np.arange(n_cost),
+        'Year': [months[i][0] for i in cost_month],
+        'Month': [month_names[months[i][1] - 1] for i in cost_month],
+        'Generator': rng.choice(GENERATOR_SPELLINGS['cost'], n_cost),
+        'Type of Activity': rng.choice(ACTIVITIES, n_cost, p=[0.6, 0.25, 0.15]),
+        'Amount (NGN)': [f"₦{v:,.0f}" for v in rng.uniform(20_000, 900_000, n_cost)],
+    })
+
+    # Sheet 2: downtime events
+    n_down = len(months) * 6
+    down_dates = pd.Timestamp(f"{years[0]}-01-01") + pd.to_timedelta(rng.integers(0, 365 * len(years), n_down), unit='D')
+    downtime = pd.DataFrame({
+        'Date': down_dates,
+        'Year': down_dates.year,
+        'Month': down_dates.strftime('%B'),
+        'Generator': rng.choice(GENERATOR_SPELLINGS['downtime'], n_down),
+        'Duration_Hours': rng.gamma(1.5, 3.0, n_down).round(1),
+        'Reason': rng.choice(['Breakdown', 'Fuel shortage', 'Overload'], n_down),
+    }).sort_values('Date')
+
+    # Sheet 3: fuel supplied
+    supplied = pd.DataFrame([
+        {'Year': y, 'Month': month_names[m - 1],
+         'Fuel Purchased': round(rng.uniform(4_000, 9_000)), 'Total Fuel Used': round(rng.uniform(3_500, 8_500))}
+        for y, m in months
+    ])
+
+    # Sheet 4: daily runtime log
+    days = pd.date_range(f"{years[0]}-01-01", f"{years[-1]}-12-31", freq='D')
+    runtime = pd.DataFrame({
+        'Date': np.repeat(days, len(GENERATORS)),
+        'Generator': np.tile(GENERATOR_SPELLINGS['runtime'], len(days)),
+    })
+    runtime['Hours Operated'] = rng.uniform(0, 14, len(runtime)).round(1)
+    runtime['Day'] = runtime['Date'].dt.strftime('%A')
+    runtime['Month'] = runtime['Date'].dt.strftime('%B')
+    runtime['Year'] = runtime['Date'].dt.year
+
+    # Sheet 5: filter stock
+    stock = pd.DataFrame([
+        {'Month': pd.Timestamp(year=y, month=m, day=1), 'Year': y, 'Generator_Size': gen, 'Filter_Type': ft,
+         'Opening Stock': int(rng.integers(2, 12)), 'Received': int(rng.integers(0, 6)),
+         'Used': int(rng.integers(0, 5))}
+        for y, m in months for gen in GENERATORS for ft in FILTER_TYPES
+    ])
+    stock['Closing Stock'] = (stock['Opening Stock'] + stock['Received'] - stock['Used']).clip(lower=0)
+
+    # Sheet 6: prepaid power transactions
+    meters = list(constants.METER_TO_NAME.items())
+    n_tx = len(months) * transactions_per_month
+    tx_dates = pd.Timestamp(f"{years[0]}-01-01") + pd.to_timedelta(rng.integers(0, 365 * len(years), n_tx), unit='D')
+    picks = rng.integers(0, len(meters), n_tx)
+    power = pd.DataFrame({
+        'Transaction Date': tx_dates.strftime('%d/%m/%Y'),
+        'Meter Number': [meters[i][0] for i in picks],
+        'Resident Address': [meters[i][1] for i in picks],
+        'Amount': [f"{v:,.2f}" for v in rng.uniform(2_000, 60_000, n_tx)],
+        'Year': tx_dates.year,
+        'Month': tx_dates.strftime('%B'),
+    })
+
+    # Sheet 7: electrical inventory
+    electrical = pd.DataFrame({
+        'Item': ['Cable 16mm', 'Breaker 63A', 'Changeover', 'Fuse 32A', 'Contactor'],
+        'Quantity': rng.integers(1, 40, 5),
+        'Location': rng.choice(constants.SUBSCRIBER_LOCATIONS, 5),
+        'Status': rng.choice(['OK', 'Low'], 5),
+    })
+
+    return [meter, cost, downtime, supplied, runtime, stock, power, electrical]
+
+
+SHEET_NAMES = ['Meter', 'Cost', 'Downtime', 'Fuel Supplied', 'Runtime', 'Stock', 'Power Transaction', 'Electrical']
+
+
+def build_workbook(frames=None, **kwargs):
+    """Synthetic workbook as xlsx bytes."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        for name, frame in zip(SHEET_NAMES, frames or build_frames(**kwargs)):
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+def build_csv_sheets(frames=None, **kwargs):
+    """Synthetic sheets as {gid: csv bytes}, the gid being the sheet's position in the workbook."""
+    return {gid: frame.to_csv(index=False).encode() for gid, frame in enumerate(frames or build_frames(**kwargs))}
+
+
+class StandInServer(ThreadingHTTPServer):
+    """HTTP server returning `payload` (or a sheet of `sheets` for a CSV export) after `delay` seconds,
+    failing `fail_rate` of requests with `fail_status`."""
+
+    daemon_threads = True
+
+    def __init__(self, address, payload, delay=0.0, fail_rate=0.0, fail_status=503, sheets=None):
+        super().__init__(address, _Handler)
+        self.payload = payload
+        self.sheets = sheets or {}
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.requests_served = 0
+        self.connections = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, so clients can reuse connections
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        server.requests_served += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if random.random() < server.fail_rate:
+            self.send_error(server.fail_status)
+            return
+
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        if query.get('format') == ['csv']:
+            body = server.sheets.get(int(query.get('gid', ['0'])[0]))
+            if body is None:
+                self.send_error(404)
+                return
+            content_type = 'text/csv'
+        else:
+            body, content_type = server.payload, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. its read timeout fired)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_in_background(payload=None, port=0, sheets=None, **kwargs):
+    """Start a stand-in server on a daemon thread. Returns (server, url).
+
+    Without a `payload` the default synthetic workbook is served, along with its sheets as CSV exports.
+    """
+    if payload is None:
+        frames = build_frames()
+        payload, sheets = build_workbook(frames), sheets if sheets is not None else build_csv_sheets(frames)
+    server = StandInServer(('127.0.0.1', port), payload, sheets=sheets, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/export?format=xlsx"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument('--fail-status', type=int, default=503)
+    parser.add_argument('--transactions', type=int, default=400, help="power transactions per month")
+    args = parser.parse_args()
+
+    frames = build_frames(transactions_per_month=args.transactions)
+    workbook = build_workbook(frames)
+    server = StandInServer(('127.0.0.1', args.port), workbook, args.delay, args.fail_rate, args.fail_status,
+                           sheets=build_csv_sheets(frames))
+    print(f"Serving synthetic workbook ({len(workbook) / 1e6:.1f} MB) at http://127.0.0.1:{args.port}/export?format=xlsx")
+    server.serve_forever()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# --- Downsampling Configuration ---
+POINTS_PER_PIXEL = 1.0     # LTTB keeps the visual shape at about one point per pixel
+MIN_POINTS = 100
+DEFAULT_WIDTH = 1200       # used until the browser has reported the plot width
+
+
+def points_for_width(width_px=None):
+    """Maximum points per trace for a plot `width_px` pixels wide."""
+    width_px = width_px or DEFAULT_WIDTH
+    return max(MIN_POINTS, int(width_px * POINTS_PER_PIXEL))
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep.
+
+    `x` must be sorted and numeric (datetimes as int64 nanoseconds). The first
+    and last points are always kept; every bucket in between contributes the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket, which preserves peaks and troughs.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample_frame(frame, x_col, y_col, group_col=None, max_points=None):
+    """Apply LTTB to each `group_col` trace of a long-format frame, capping it at `max_points`."""
+    max_points = max_points or points_for_width()
+    if frame.empty:
+        return frame
+
+    def _reduce(trace):
+        if len(trace) <= max_points:
+            return trace
+        trace = trace.sort_values(x_col)
+        x = trace[x_col]
+        x = x.to_numpy(dtype='datetime64[ns]').astype(np.int64) if pd.api.types.is_datetime64_any_dtype(x) else x.to_numpy()
+        y = pd.to_numeric(trace[y_col], errors='coerce').fillna(0).to_numpy()
+        return trace.iloc[lttb(x, y, max_points)]
+
+    if group_col is None:
+        return _reduce(frame)
+    return pd.concat([_reduce(trace) for _, trace in frame.groupby(group_col, sort=False)], ignore_index=True)
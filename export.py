@@ -0,0 +1,135 @@
+"""Streaming file exports of the filtered tables behind the dashboard.
+
+Each writer is a generator yielding the file a chunk of rows at a time, so a
+response starts as soon as the first chunk is encoded and never holds more
+than one chunk of the encoded file in memory. Between chunks the worker
+thread is back on the socket, leaving the other gthread threads free to
+serve dashboard callbacks.
+
+    csv      text, header plus CHUNK_ROWS rows per chunk
+    parquet  one row group per chunk (needs pyarrow)
+    xlsx     write-only openpyxl workbook spooled to a temporary file, then
+             streamed from disk (XLSX is a zip, so it can't be emitted row by row)
+"""
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+import queries
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- Export Configuration ---
+CHUNK_ROWS = int(os.environ.get("GRAVITAS_EXPORT_CHUNK_ROWS", 5000))
+FILE_BLOCK_BYTES = 64 * 1024
+
+# view -> (title, query function, sidebar filters it accepts)
+VIEWS = {
+    'transactions': ("Transactions", queries.transactions, ['year', 'month', 'location']),
+    'meter-pivot': ("Meter pivot", queries.meter_pivot, ['year', 'month', 'location']),
+    'cost': ("Cost breakdown", queries.filtered_cost, ['year', 'month', 'generator']),
+    'stock': ("Stock inventory", queries.stock_inventory, ['year', 'month', 'generator', 'filter']),
+    'quarantine': ("Quarantined rows", queries.quarantined_rows, []),
+}
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def formats():
+    return ['csv', 'xlsx'] + (['parquet'] if pa is not None else [])
+
+
+def _chunks(frame):
+    for start in range(0, len(frame), CHUNK_ROWS):
+        yield frame.iloc[start:start + CHUNK_ROWS]
+
+
+# --- Writers ---
+def stream_csv(frame):
+    yield frame.iloc[:0].to_csv(index=False)
+    for chunk in _chunks(frame):
+        yield chunk.to_csv(index=False, header=False)
+
+
+class _Spool(io.RawIOBase):
+    """Write-only sink that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_ready(chunk):
+    # Free-form sheets mix numbers and text in one column; Parquet needs one type per column
+    mixed = [c for c in chunk.columns if chunk[c].dtype == object]
+    return chunk.astype({c: 'string' for c in mixed}) if mixed else chunk
+
+
+def stream_parquet(frame):
+    spool = _Spool()
+    schema = pa.Schema.from_pandas(_arrow_ready(frame.iloc[:0]), preserve_index=False)
+    with pq.ParquetWriter(spool, schema) as writer:
+        for chunk in _chunks(frame):
+            writer.write_table(pa.Table.from_pandas(_arrow_ready(chunk), schema=schema, preserve_index=False))
+            yield spool.drain()
+    yield spool.drain()  # footer
+
+
+def stream_xlsx(frame, title="Export"):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append([str(c) for c in frame.columns])
+    for chunk in _chunks(frame):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False):
+            sheet.append(list(row))
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while block := f.read(FILE_BLOCK_BYTES):
+                yield block
+    finally:
+        os.remove(path)
+
+
+def export_view(view, snap, fmt, **filters):
+    """Run `view` against a snapshot; returns a generator of the encoded file's chunks."""
+    title, query, _ = VIEWS[view]
+    frame = query(snap, **filters)
+    frame = frame.assign(**{c: frame[c].astype(str) for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)})
+    if fmt == 'parquet':
+        return stream_parquet(frame)
+    if fmt == 'xlsx':
+        return stream_xlsx(frame, title)
+    return stream_csv(frame)
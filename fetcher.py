@@ -0,0 +1,361 @@
+import asyncio
+import http.client
+import io
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Fetch Configuration ---
+CONNECT_TIMEOUT = 10    # seconds to establish the connection (incl. TLS handshake)
+READ_TIMEOUT = 60       # seconds to wait for any single read from the socket
+MAX_RETRIES = 3         # retries after the first attempt
+BACKOFF_BASE = 1.0      # seconds, doubled on every retry
+BACKOFF_MAX = 30.0
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+POOL_PER_HOST = 8       # idle keep-alive connections kept per host
+FETCH_CONCURRENCY = 8   # sheet exports downloaded and parsed at the same time
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class FetchError(Exception):
+    """Raised when the data source cannot be fetched."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CircuitOpenError(FetchError):
+    """Raised when the circuit breaker is refusing calls to the source."""
+
+    def __init__(self, message):
+        super().__init__(message, retryable=False)
+
+
+class CircuitBreaker:
+    """Stop calling a failing source for a cooldown period.
+
+    closed    -> calls go through, consecutive failures are counted
+    open      -> calls are refused until `cooldown` seconds have passed
+    half-open -> a single trial call is let through; success closes the
+                 breaker, failure opens it again
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=120):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), reused across requests and refreshes.
+
+    A connection goes back to the pool only after its response was read to
+    the end and the server didn't ask to close it.
+    """
+
+    def __init__(self, per_host=None):
+        self.per_host = POOL_PER_HOST if per_host is None else per_host
+        self.opened = 0                 # connections created, for tests and benchmarks
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """An idle connection to `key`, or None."""
+        with self._lock:
+            idle = self._idle.get(key)
+            return idle.pop() if idle else None
+
+    def put(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        """Close every idle connection (e.g. in a freshly forked process)."""
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+
+pool = ConnectionPool()  # shared by every site's refreshes
+
+
+def _connect(scheme, host, port, connect_timeout, pool=None):
+    if scheme == 'https':
+        conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout)
+    elif scheme == 'http':
+        conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+    else:
+        raise FetchError(f"Unsupported URL scheme: {scheme!r}", retryable=False)
+
+    try:
+        conn.connect()
+    except socket.timeout as e:
+        conn.close()
+        raise FetchError(f"Timed out connecting to {host}") from e
+    except Exception:
+        conn.close()
+        raise
+    if pool is not None:
+        pool.opened += 1
+    return conn
+
+
+def _request(conn, path, read_timeout):
+    # Connect timeout covers the handshake; from here on every socket read gets the read timeout
+    conn.sock.settimeout(read_timeout)
+    conn.request('GET', path, headers={'User-Agent': 'gravitas-dashboard', 'Accept-Encoding': 'identity'})
+    return conn.getresponse()
+
+
+def _release(conn, resp, key, pool):
+    """Return a connection whose response has been read to the end to `pool`, or close it."""
+    if pool is not None and not resp.will_close:
+        pool.put(key, conn)
+    else:
+        conn.close()
+
+
+def _open(url, connect_timeout, read_timeout, pool=None):
+    """Open a GET request, following redirects. Returns (connection, response, pool key)."""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        conn = pool.get(key) if pool is not None else None
+        resp = None
+        if conn is not None:
+            try:
+                resp = _request(conn, path, read_timeout)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed the idle connection; open a new one below
+                conn.close()
+            except Exception:
+                conn.close()
+                raise
+        if resp is None:
+            conn = _connect(parts.scheme, parts.hostname, parts.port, connect_timeout, pool)
+            try:
+                resp = _request(conn, path, read_timeout)
+            except Exception:
+                conn.close()
+                raise
+
+        if resp.status in REDIRECT_STATUSES:
+            location = resp.getheader('Location')
+            resp.read()
+            _release(conn, resp, key, pool)
+            if not location:
+                raise FetchError(f"HTTP {resp.status} without Location header", retryable=False)
+            url = urllib.parse.urljoin(url, location)
+            continue
+
+        if resp.status != 200:
+            conn.close()
+            raise FetchError(f"HTTP {resp.status} from {parts.hostname}", retryable=resp.status in RETRYABLE_STATUSES)
+
+        return conn, resp, key
+
+    raise FetchError(f"Too many redirects fetching {url}", retryable=False)
+
+
+def fetch_into(url, fileobj, connect_timeout=None, read_timeout=None, pool=None):
+    """Stream `url` into `fileobj` chunk by chunk, with separate connect and read timeouts.
+
+    With a ConnectionPool the request reuses an idle connection to the host
+    when there is one, and the connection is returned to it afterwards.
+    """
+    connect_timeout = CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+    read_timeout = READ_TIMEOUT if read_timeout is None else read_timeout
+
+    try:
+        conn, resp, key = _open(url, connect_timeout, read_timeout, pool)
+    except FetchError:
+        raise
+    except socket.timeout as e:
+        raise FetchError(f"Timed out waiting for source to respond: {e}") from e
+    except (OSError, http.client.HTTPException) as e:
+        raise FetchError(f"Connection to source failed: {e}") from e
+
+    complete = False
+    try:
+        while True:
+            chunk = resp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            fileobj.write(chunk)
+        complete = True
+        return fileobj
+    except socket.timeout as e:
+        raise FetchError(f"Timed out reading from source: {e}") from e
+    except (OSError, http.client.HTTPException) as e:
+        raise FetchError(f"Reading from source failed: {e}") from e
+    finally:
+        if complete:
+            _release(conn, resp, key, pool)
+        else:
+            conn.close()
+
+
+def fetch_bytes(url, connect_timeout=None, read_timeout=None, pool=None):
+    """Download `url` into memory."""
+    return fetch_into(url, io.BytesIO(), connect_timeout, read_timeout, pool).getvalue()
+
+
+def fetch_with_retries(url, breaker=None, retries=None, sleep=time.sleep, into=None, pool=None):
+    """Fetch `url` with bounded retries, exponential backoff and an optional circuit breaker.
+
+    Returns the body as bytes, or, when `into` is given, streams it into that
+    file object (rewound and truncated before every attempt) and returns it.
+    Connections come from `pool` when one is given.
+    """
+    retries = MAX_RETRIES if retries is None else retries
+
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError("Circuit breaker is open; not contacting source")
+
+    last_error = None
+    for attempt in range(retries + 1):
+        try:
+            if into is None:
+                data = fetch_bytes(url, pool=pool)
+            else:
+                into.seek(0)
+                into.truncate()
+                data = fetch_into(url, into, pool=pool)
+                data.seek(0)
+        except FetchError as e:
+            last_error = e
+            print(f"Fetch attempt {attempt + 1}/{retries + 1} failed: {e}")
+            if not e.retryable or attempt == retries:
+                break
+            # Full jitter so several workers don't retry in lockstep
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+            sleep(random.uniform(delay / 2, delay))
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return data
+
+    if breaker is not None:
+        breaker.record_failure()
+    raise last_error
+
+
+# --- Concurrent Sheet Exports ---
+_executor = None
+
+
+def _fetch_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY, thread_name_prefix="sheet-fetch")
+    return _executor
+
+
+def csv_export_url(source_url, gid):
+    """The CSV export of one sheet (tab `gid`) of the spreadsheet behind an export URL."""
+    parts = urllib.parse.urlsplit(source_url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query.update(format='csv', gid=str(gid))
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+async def fetch_parsed(urls, parse, retries=None, pool=None):
+    """Download every `urls` value concurrently and run `parse(name, body)` on each as soon as it arrives.
+
+    The blocking downloads and parses run on a shared thread pool, so one
+    sheet's parse overlaps the others' downloads. Returns {name: parsed};
+    the first failure is raised once every download has finished.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _fetch_executor()
+
+    async def fetch_one(name, url):
+        body = await loop.run_in_executor(executor, lambda: fetch_with_retries(url, retries=retries, pool=pool))
+        return name, await loop.run_in_executor(executor, parse, name, body)
+
+    results = await asyncio.gather(*(fetch_one(name, url) for name, url in urls.items()), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return dict(results)
+
+
+def fetch_all(urls, parse, breaker=None, retries=None, pool=None):
+    """fetch_parsed() from synchronous code, counted as one call against `breaker`."""
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError("Circuit breaker is open; not contacting source")
+    # A sheet that can't be parsed counts as a failure too; either way a
+    # half-open breaker's trial has to be finished, or it never lets another through
+    succeeded = False
+    try:
+        parsed = asyncio.run(fetch_parsed(urls, parse, retries, pool))
+        succeeded = True
+    finally:
+        if breaker is not None:
+            if succeeded:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+    return parsed
+
+
+def after_fork():
+    """Drop the parent's pooled connections and fetch threads in a freshly forked process."""
+    global _executor, pool
+    pool = ConnectionPool()
+    _executor = None
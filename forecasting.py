@@ -0,0 +1,181 @@
+"""Forecasts of monthly revenue, fuel used and cost, for the chart overlays.
+
+Each measure is summed per month and key into a matrix with one row per key:
+revenue per location, fuel used and cost per generator. Both models are
+fitted to every row at once with numpy:
+
+    seasonal naive         the same month a year earlier (the last month when
+                           there's less than a year of history)
+    exponential smoothing  Holt's linear trend, with alpha and beta picked per
+                           row from a grid by one-step-ahead squared error
+
+Each row uses the model with the lower error over its last BACKTEST_MONTHS,
+forecast from the months before them, for the next HORIZON_MONTHS. The
+fits take milliseconds for a site's few dozen series, so they run in the
+refresh thread; with GRAVITAS_FORECAST_PROCESSES set, a refresh fits the
+measures in parallel on a long-lived process pool instead. The result is
+stored in the snapshot as `snap.df_forecast`, so requests only read it.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import normalization
+
+# --- Forecast Configuration ---
+HORIZON_MONTHS = int(os.environ.get("GRAVITAS_FORECAST_MONTHS", 3))
+PROCESSES = int(os.environ.get("GRAVITAS_FORECAST_PROCESSES", 0))    # 0 fits in the refresh thread
+BACKTEST_MONTHS = 3
+SEASON = 12
+ALPHAS = np.linspace(0.1, 0.9, 9)
+BETAS = np.array([0.0, 0.05, 0.1, 0.2, 0.3])   # 0 is simple exponential smoothing (no trend)
+INTERVAL_Z = 1.28                               # 80% band
+
+FORECAST_COLUMNS = ['Measure', 'Key', 'Date', 'Year', 'Month', 'Forecast', 'Lower', 'Upper', 'Model']
+
+_pool = None
+
+
+# --- Models (rows are series, columns are consecutive months) ---
+def seasonal_naive(values, horizon):
+    months = values.shape[1]
+    if months >= SEASON:
+        return values[:, months - SEASON + np.arange(horizon) % SEASON]
+    return np.repeat(values[:, -1:], horizon, axis=1)
+
+
+def exponential_smoothing(values, horizon):
+    """Holt's linear trend for every row, with (alpha, beta) picked per row from the grid."""
+    grid_alpha, grid_beta = (g.ravel()[:, None] for g in np.meshgrid(ALPHAS, BETAS))
+    level = np.repeat(values[None, :, 0], len(grid_alpha), axis=0)
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    for t in range(1, values.shape[1]):
+        observed = values[:, t]
+        sse += (observed - level - trend) ** 2
+        new_level = grid_alpha * observed + (1 - grid_alpha) * (level + trend)
+        trend = grid_beta * (new_level - level) + (1 - grid_beta) * trend
+        level = new_level
+
+    best = sse.argmin(axis=0)
+    rows = np.arange(values.shape[0])
+    steps = np.arange(1, horizon + 1)
+    return level[best, rows][:, None] + trend[best, rows][:, None] * steps
+
+
+MODELS = {'Seasonal naive': seasonal_naive, 'Exponential smoothing': exponential_smoothing}
+
+
+def fit(matrix, measure, horizon=HORIZON_MONTHS):
+    """Forecast every row of `matrix` (keys x monthly Timestamps) `horizon` months ahead."""
+    if matrix.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+    values = matrix.to_numpy(dtype=np.float64)
+    names = list(MODELS)
+
+    # Backtest: forecast the last months from the ones before them, per row
+    if values.shape[1] > BACKTEST_MONTHS + 1:
+        train, held_out = values[:, :-BACKTEST_MONTHS], values[:, -BACKTEST_MONTHS:]
+        errors = np.stack([np.sqrt(((model(train, BACKTEST_MONTHS) - held_out) ** 2).mean(axis=1))
+                           for model in MODELS.values()])
+        choice = errors.argmin(axis=0)
+        rmse = errors[choice, np.arange(len(choice))]
+    else:
+        choice = np.full(len(values), names.index('Seasonal naive'))
+        rmse = values.std(axis=1)
+
+    forecasts = np.stack([model(values, horizon) for model in MODELS.values()])
+    forecast = np.clip(forecasts[choice, np.arange(len(choice))], 0, None)
+    band = INTERVAL_Z * rmse[:, None] * np.sqrt(np.arange(1, horizon + 1))
+
+    dates = pd.date_range(matrix.columns[-1], periods=horizon + 1, freq='MS')[1:]
+    result = pd.DataFrame({
+        'Measure': measure,
+        'Key': np.repeat(matrix.index.astype(str), horizon),
+        'Date': np.tile(dates, len(matrix)),
+        'Forecast': forecast.ravel(),
+        'Lower': np.clip(forecast - band, 0, None).ravel(),
+        'Upper': (forecast + band).ravel(),
+        'Model': np.repeat(np.array(names)[choice], horizon),
+    })
+    result['Year'] = result['Date'].dt.strftime('%Y')
+    result['Month'] = result['Date'].dt.strftime('%B')
+    return result[FORECAST_COLUMNS]
+
+
+# --- Monthly History ---
+def _monthly(frame, key, value):
+    """`value` summed per `key` and month, as a keys x months matrix with missing months as 0."""
+    if frame.empty or value not in frame.columns:
+        return pd.DataFrame()
+    dates = pd.to_datetime(frame['Year'].astype(str) + ' ' + frame['Month'].astype(str), format='%Y %B', errors='coerce')
+    keys = frame[key].astype(str) if isinstance(key, str) else key
+    amounts = pd.to_numeric(frame[value], errors='coerce').fillna(0)
+    return _all_months(amounts.groupby([keys.to_numpy(), dates.to_numpy()]).sum().unstack(fill_value=0))
+
+
+def _all_months(matrix):
+    if matrix.empty:
+        return matrix
+    months = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq='MS')
+    return matrix.reindex(columns=months).fillna(0)
+
+
+def monthly_history(frames, meter_to_name=None):
+    """{measure: keys x months matrix} from a snapshot's sheets."""
+    power_df, df_meter = frames['power_df'], frames['df_meter']
+    revenue = []
+    if not power_df.empty:
+        places = power_df['Resident Address']
+        if meter_to_name:
+            places = normalization.meter_names(power_df['Meter Number'], meter_to_name).fillna(places)
+        revenue.append(_monthly(power_df, places.astype(str), 'Amount'))
+    if not df_meter.empty:
+        revenue.append(_monthly(df_meter, 'Location', 'Total Revenue'))
+    revenue = [m for m in revenue if not m.empty]
+
+    supplied = frames['df_supplied']
+    fuel_key = 'Generator' if 'Generator' in supplied.columns else pd.Series('All', index=supplied.index)
+    return {
+        'Revenue': _all_months(pd.concat(revenue).groupby(level=0).sum()) if revenue else pd.DataFrame(),
+        'Fuel Used': _monthly(supplied, fuel_key, 'Total Fuel Used'),
+        'Cost': _monthly(frames['df_cost_2025'], 'Generator', 'Amount (NGN)'),
+    }
+
+
+def _process_pool():
+    """The pool shared by every refresh. Its processes come from a forkserver (spawned where there's
+    none), never forked from this multi-threaded process."""
+    global _pool
+    if _pool is None:
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _pool = ProcessPoolExecutor(max_workers=PROCESSES, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def build_forecasts(frames, meter_to_name=None, parallel=False):
+    """The df_forecast table: every measure's forecasts.
+
+    Only a refresh passes `parallel`, to use the process pool when
+    PROCESSES > 0; request threads (past snapshots) always fit in-process.
+    """
+    history = {measure: matrix for measure, matrix in monthly_history(frames, meter_to_name).items() if not matrix.empty}
+    if not history:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    # The frozen desktop build can't start worker processes from a bundled interpreter
+    if parallel and PROCESSES > 0 and len(history) > 1 and not getattr(sys, 'frozen', False):
+        results = list(_process_pool().map(fit, history.values(), history.keys()))
+    else:
+        results = [fit(matrix, measure) for measure, matrix in history.items()]
+    return pd.concat(results, ignore_index=True)
+
+
+def after_fork():
+    """Forget the parent's process pool in a freshly forked process."""
+    global _pool
+    _pool = None
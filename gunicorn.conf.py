@@ -0,0 +1,88 @@
+# Gunicorn configuration for the production container (`gunicorn app:server`).
+#
+# The dataset is loaded once in the master (preload_app) and shared with the
+# workers copy-on-write. Workers do not refresh data themselves: the master
+# refreshes on a timer and, when a new data generation lands, gracefully
+# replaces the workers (SIGHUP) so they fork from the fresh data.
+import gc
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+
+# update_chart is CPU-bound pandas/plotly work, so processes give the real
+# parallelism; a few threads per worker keep interval ticks and light
+# callbacks from queueing behind a slow one.
+workers = int(os.environ.get("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() != "false"
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = 2000
+max_requests_jitter = 200
+
+# Heartbeat files on tmpfs; Docker's overlay filesystem can stall them
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+
+    import data_loader
+    import warmup
+
+    # Workers fork from the master, so let them start with the first load done
+    # (app.py only queues it) and the chart cache warm
+    data_loader.wait_for_refreshes()
+    warmup.wait()
+
+    def refresh_loop():
+        while True:
+            failed = any(site.last_error is not None for site in data_loader.sites.values())
+            time.sleep(data_loader.FAILURE_RETRY_INTERVAL if failed else data_loader.REFRESH_INTERVAL)
+            generation = data_loader.data_generation
+            data_loader.load_all_data()
+            # The generation only moves when a site's data actually changed; a refresh
+            # that fetched identical data leaves the workers (and their caches) alone
+            if data_loader.data_generation != generation:
+                warmup.wait()
+                server.log.info("Data generation %s loaded, reloading workers", data_loader.data_generation)
+                os.kill(os.getpid(), signal.SIGHUP)
+
+    threading.Thread(target=refresh_loop, name="master-data-refresh", daemon=True).start()
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation so the
+    # workers' garbage collector doesn't touch (and un-share) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import background
+    import data_loader
+    import memory
+    import warmup
+    data_loader.after_fork(refresh=not server.cfg.preload_app)
+    background.after_fork()
+    memory.after_fork()
+    warmup.after_fork()
+
+
+def worker_exit(server, worker):
+    # Request counts are batched in memory; don't lose the last ones on a reload
+    import warmup
+    warmup.flush()
@@ -1,12 +1,65 @@
 from dash import dcc, html
+import background
 import data_loader
 import constants
+import server_setup
+
+# --- Refresh Polling ---
+REFRESH_POLL_MS = 300000   # how often an open page checks for new data
+STARTUP_POLL_MS = 2000     # ... while the first load is still running
+
+def filter_options(snap):
+    """Dropdown options for the sidebar filters, from one site's snapshot."""
+    gens = snap.run_time['Generator'].dropna().astype(str).unique().tolist()
+    gens = sorted(gens, key=lambda x: x.lower())  # case-insensitive sort
+    return {
+        'location': [{"label": loc, "value": loc} for loc in snap.locations],
+        'year': [{'label': y, 'value': y} for y in sorted(snap.df_cost['Year'].unique(), reverse=True)],
+        'month': [{"label": m, "value": m} for m in snap.run_time["Month"].unique()],
+        'generator': [{"label": gen, "value": gen} for gen in gens],
+        'filter': [{"label": fil, "value": fil} for fil in snap.df_rc_melt['Filter_Type'].unique().tolist()],
+    }
+
+
+def poll_interval(site_id=None):
+    """Milliseconds between data checks: short until the site's first load has landed."""
+    return REFRESH_POLL_MS if data_loader.data_status(site_id)['as_of'] is not None else STARTUP_POLL_MS
+
+
+def asof_options(site_id=None):
+    """'Live' followed by the site's stored snapshots, newest first."""
+    options = [{'label': 'Live data', 'value': 'live'}]
+    options += [{'label': taken.strftime('%d %b %Y, %H:%M'), 'value': key} for key, taken in data_loader.history(site_id)]
+    return options
+
 
 def create_layout(app):
+    options = filter_options(data_loader.get_snapshot())
+
+    # Site selector (hidden when only one site is configured)
+    site_dropdown = dcc.Dropdown(
+        id='site_filter',
+        options=[{'label': site.name, 'value': site_id} for site_id, site in data_loader.sites.items()],
+        value=data_loader.DEFAULT_SITE_ID,
+        clearable=False,
+        style={'width': '90%', 'marginTop': '10px', "marginLeft": "5%",
+               'display': 'block' if len(data_loader.sites) > 1 else 'none'}
+    )
+
+    # Time travel: show a stored past snapshot instead of the live data
+    asof_dropdown = dcc.Dropdown(
+        id='asof_filter',
+        options=asof_options(),
+        value='live',
+        clearable=False,
+        style={'width': '90%', 'marginTop': '10px', "marginLeft": "5%",
+               'display': 'block' if data_loader.snapshot_store.enabled() else 'none'}
+    )
+
     # Location filter
     metr_loc = dcc.Dropdown(
             id='location_filter',
-            options=[{"label": loc, "value": loc} for loc in constants.SUBSCRIBER_LOCATIONS],
+            options=options['location'],
             value=[],
             placeholder="Select Location",
             multi=True,
@@ -14,11 +67,10 @@ def create_layout(app):
         )
 
     # Year filter
-    available_years = sorted(data_loader.df_cost['Year'].unique(), reverse=True)
     year_dropdown = dcc.Dropdown(
         id='year_filter',
-        options=[{'label': y, 'value': y} for y in available_years],
-        value=[available_years[0]] if available_years else [],
+        options=options['year'],
+        value=[options['year'][0]['value']] if options['year'] else [],
         placeholder="Select Year",
         multi=True,
         style={'width': '90%', 'marginTop': '10px', "marginLeft": "5%"}
@@ -27,31 +79,34 @@ def create_layout(app):
     # Month filter
     mtr_month = dcc.Dropdown(
             id='month_filter',
-            options=[{"label": m, "value": m} for m in data_loader.run_time["Month"].unique()],
+            options=options['month'],
             value=[],
             placeholder="Select Month",
             multi=True,
             style={'width': '90%', 'marginTop': '30%', "marginLeft": "5%"}
         )
 
-    # Generator dropdown (safe sort)
-    gens = data_loader.run_time['Generator'].dropna().astype(str).unique().tolist()
-    gens = sorted(gens, key=lambda x: x.lower())  # case-insensitive sort
-
-    filter_list = data_loader.df_rc_melt['Filter_Type'].unique().tolist()
-
     gen_dropdown = dcc.Dropdown(
         id='generator_type',
-        options=[{"label": gen, "value": gen} for gen in gens],
+        options=options['generator'],
         value=[],
         placeholder="Select Generator Type",
         multi=True,
         style={'width': '90%', 'marginTop': '30%', "marginLeft": "5%"}
     )
 
+    # Time granularity for the revenue and runtime trends
+    granularity_dropdown = dcc.Dropdown(
+        id='granularity',
+        options=[{'label': label, 'value': value} for value, label in constants.GRANULARITY_LABELS.items()],
+        value='month',
+        clearable=False,
+        style={'width': '90%', 'marginTop': '30%', "marginLeft": "5%"}
+    )
+
     filter_dropdown = dcc.Dropdown(
         id='filter_type',
-        options=[{"label": fil, "value": fil} for fil in filter_list],
+        options=options['filter'],
         value=[],
         placeholder="Filter Type",
         multi=True,
@@ -64,19 +119,23 @@ def create_layout(app):
         # Sidebar
         html.Div([
             html.Img(
-                src=app.get_asset_url('images/Gracefield_logo.png'),
+                src=server_setup.asset_url(app, 'images/Gracefield_logo.png'),
                 className="logo",
                 alt="Gracefield logo"
             ),
+            site_dropdown,
+            asof_dropdown,
             year_dropdown,
             mtr_month,
             metr_loc,
             gen_dropdown,
+            granularity_dropdown,
             html.Div([filter_dropdown], id='filter-dropdown-container'),
             html.Button("Power Analytics", id="tab1-btn", className="tab-btn active-tab",
                     style={"marginLeft": "1.5rem", "marginTop": "4rem"}),
             html.Button("Operations", id="tab2-btn", className="tab-btn",
-                    style={"marginLeft": "1.5rem", "marginTop": "4rem"})
+                    style={"marginLeft": "1.5rem", "marginTop": "4rem"}),
+            html.Div(id='export_links', className='export-links')
         ], id="sidebar", className="sidebar"),
     
         # Main Content
@@ -84,12 +143,19 @@ def create_layout(app):
             # Header section for KPIs
             html.Div([
                 html.H2("Power Dashboard", className="title", style={'textAlign': 'left'}),
+                html.Div(id='data_status', className='data-status'),
+                html.Div(
+                    [html.Progress(id='chart_progress', value='0', max='1')]
+                    + ([html.Button("Cancel", id='cancel_chart_job', className='job-cancel')] if background.manager else []),
+                    id='chart_job', className='chart-job', style={'display': 'none'},
+                ),
                 # KPIs  
                 html.Div([html.Div("💼", className="kpi-icon"), html.Div([html.P("Revenue", className="kpi-label"), html.H3(id="total_revenue", className="kpi-value")], className="kpi-text")], className="kpi-card"),
                 html.Div([html.Div("⏱️", className="kpi-icon"), html.Div([html.P("Operated Hours", className="kpi-label"), html.H3(id="operated_hours", className="kpi-value")], className="kpi-text")], className="kpi-card"),
-                html.Div([html.Div("⏸️", className="kpi-icon"), html.Div([html.P("Unplanned Outage", className="kpi-label"), html.H3(id="unplanned_outage", className="kpi-value")], className="kpi-text")], className="kpi-card"),
+                html.Div([html.Div("⏸️", className="kpi-icon"), html.Div([html.P("Unplanned Outage", className="kpi-label"), html.H3(id="unplanned_outage", className="kpi-value")], className="kpi-text")], id="unplanned_outage_card", className="kpi-card", n_clicks=0, style={'cursor': 'pointer'}),
                 html.Div([html.Div("🧾", className="kpi-icon"), html.Div([html.P("Total Cost", className="kpi-label"), html.H3(id="total_cost_kpi", className="kpi-value")], className="kpi-text")], className="kpi-card"),
                 html.Div([html.Div("📈", className="kpi-icon"), html.Div([html.P("%Revenue Change", className="kpi-label"), html.H3(id="revenue_change_kpi", className="kpi-value")], className="kpi-text")], className="kpi-card"),
+                html.Div([html.Div("📅", className="kpi-icon"), html.Div([html.P("Schedule Compliance", className="kpi-label"), html.H3(id="schedule_compliance_kpi", className="kpi-value")], className="kpi-text")], className="kpi-card"),
             ], className="header", style={'display': 'flex', 'gap': '20px', 'alignItems': 'center', 'flexWrap': 'wrap'}),
 
             # Tab 1: Power Analytics
@@ -111,14 +177,27 @@ def create_layout(app):
                         dcc.Tab(label='Stock Inventory', style={'padding': '4px', 'height': '32px', 'fontSize': '12px'}, selected_style={'padding': '4px', 'height': '32px', 'fontSize': '12px', 'backgroundColor': '#C7A64F', 'color': 'white', 'borderTop': '3px solid #C7A64F'}, children=[
                             html.Div(id='stock_table_container', style={"width": "100%", "height": "100%", "overflow": "auto", "padding": "5px"})
                         ]),
+                        dcc.Tab(label='Reorder Alerts', id='stock_alerts_tab', style={'padding': '4px', 'height': '32px', 'fontSize': '12px'}, selected_style={'padding': '4px', 'height': '32px', 'fontSize': '12px', 'backgroundColor': '#C7A64F', 'color': 'white', 'borderTop': '3px solid #C7A64F'}, children=[
+                            html.Div(id='stock_alerts_container', style={"width": "100%", "height": "100%", "overflow": "auto", "padding": "5px"})
+                        ]),
+                        dcc.Tab(label='Meter Alerts', id='meter_alerts_tab', style={'padding': '4px', 'height': '32px', 'fontSize': '12px'}, selected_style={'padding': '4px', 'height': '32px', 'fontSize': '12px', 'backgroundColor': '#C7A64F', 'color': 'white', 'borderTop': '3px solid #C7A64F'}, children=[
+                            html.Div(id='meter_alerts_container', style={"width": "100%", "height": "100%", "overflow": "auto", "padding": "5px"})
+                        ]),
                         dcc.Tab(label='Electrical Inventory', style={'padding': '4px', 'height': '32px', 'fontSize': '12px'}, selected_style={'padding': '4px', 'height': '32px', 'fontSize': '12px', 'backgroundColor': '#C7A64F', 'color': 'white', 'borderTop': '3px solid #C7A64F'}, children=[
                             html.Div(id='electrical_table_container', style={"width": "100%", "height": "100%", "overflow": "auto", "padding": "5px"})
                         ])
                     ], style={'height': '32px'}, colors={"border": "#d6d6d6", "primary": "#C7A64F", "background": "#f9f9f9"})
                 ], className="card-3"),
                 html.Div([dcc.Graph(id='downtime_chart', className='downtime-chart', config={"responsive": True}, style={"width": "100%", "height": "100%", "flex": "1 1 auto"})], className="card-4"),
+                html.Div([dcc.Graph(id='fuel_efficiency_chart', className='fuel-efficiency-chart', config={"responsive": True}, style={"width": "100%", "height": "100%", "flex": "1 1 auto"})], className="card-4"),
+                html.Div([dcc.Graph(id='compliance_chart', className='compliance-chart', config={"responsive": True}, style={"width": "100%", "height": "100%", "flex": "1 1 auto"})], className="card-5"),
+                html.Div([
+                    html.Div(id='downtime_drilldown_title', style={'textAlign': 'center', 'padding': '6px', 'fontWeight': 'bold', 'fontSize': '12px', 'color': '#111827'}),
+                    html.Div(id='downtime_drilldown', style={"width": "100%", "height": "100%", "overflow": "auto", "padding": "5px"})
+                ], className="card-3"),
             ], id="tab-2", className="section", style={"display": "none"}),
         
-            dcc.Interval(id='data-refresh-interval', interval=300000, n_intervals=0),
+            dcc.Interval(id='data-refresh-interval', interval=poll_interval(), n_intervals=0),
+            dcc.Store(id='plot_width'),
         ], className="main-content")
     ], className="app-grid")
@@ -0,0 +1,255 @@
+"""Load test: simulated users driving the dashboard's callbacks.
+
+Starts the synthetic source (see dev_source.py) and the app, then runs
+`--users` concurrent users for `--duration` seconds. Each user replays a
+realistic session against /_dash-update-component: changing the year, month,
+location, generator and filter type dropdowns, switching tabs and letting the
+refresh interval tick, with a think time between actions. Background
+callbacks are polled the way the browser polls them, so a latency covers the
+whole wait for a chart.
+
+    python loadtest.py --users 20 --duration 60
+    python loadtest.py --server dev --users 5
+    python loadtest.py --url http://127.0.0.1:8050 --pid 1234   # an app that's already running
+
+Reports throughput, p50/p95/p99 latency per callback and how the server's
+memory (the process and its children, e.g. gunicorn workers) grew. Needs
+the packages in requirements-dev.txt.
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import psutil
+import requests
+
+# --- Session Mix ---
+ACTIONS = {'filter': 0.6, 'tab': 0.2, 'tick': 0.2}   # relative weights of what a user does next
+FILTER_IDS = ['year_filter', 'month_filter', 'location_filter', 'generator_type', 'filter_type']
+CHART_OUTPUT = 'revenue_cost_chart'     # identifies update_chart in the dependency list
+TABS_OUTPUT = 'tab-1'                   # identifies switch_tabs
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(server_kind, source_url, workers):
+    """Start the app against `source_url`; returns (process, base url, log path)."""
+    port = _free_port()
+    env = dict(os.environ, GRAVITAS_SOURCE_URL=source_url, PORT=str(port))
+    env.setdefault('GRAVITAS_SNAPSHOT_DIR', '')  # history isn't under test
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    if server_kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:server']
+    else:
+        command = [sys.executable, 'app.py']
+
+    fd, log_path = tempfile.mkstemp(prefix='loadtest-', suffix='.log')
+    process = subprocess.Popen(command, env=env, stdout=fd, stderr=subprocess.STDOUT, cwd=os.path.dirname(os.path.abspath(__file__)))
+    os.close(fd)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup, see {log_path}")
+        try:
+            if requests.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return process, url, log_path
+        except (requests.ConnectionError, requests.Timeout):
+            pass  # not listening yet, or the gunicorn master is still warming the cache
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"App not ready after 120s, see {log_path}")
+
+
+def _collect_props(node, found):
+    """Map component id -> props for every component in the layout JSON."""
+    if isinstance(node, dict):
+        props = node.get('props', {})
+        if isinstance(props, dict) and isinstance(props.get('id'), str):
+            found[props['id']] = props
+        for value in (props.values() if isinstance(props, dict) else []):
+            _collect_props(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_props(item, found)
+    return found
+
+
+class Target:
+    """What the users need to know about the app: callback specs and dropdown choices."""
+
+    def __init__(self, url):
+        self.url = url
+        deps = requests.get(f"{url}/_dash-dependencies", timeout=30).json()
+        self.chart = next(d for d in deps if f'{CHART_OUTPUT}.figure' in d['output'])
+        self.tabs = next(d for d in deps if f'{TABS_OUTPUT}.style' in d['output'])
+        props = _collect_props(requests.get(f"{url}/_dash-layout", timeout=30).json(), {})
+        self.choices = {
+            fid: [o['value'] if isinstance(o, dict) else o for o in props.get(fid, {}).get('options', [])]
+            for fid in FILTER_IDS
+        }
+
+
+def _body(dep, values, changed):
+    outputs = [dict(zip(['id', 'property'], o.split('.'))) for o in dep['output'].strip('.').split('...')]
+    return {
+        'output': dep['output'],
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': [{'id': i['id'], 'property': i['property'], 'value': values.get(i['id'])} for i in dep['inputs']],
+        'state': [{'id': s['id'], 'property': s['property'], 'value': values.get(s['id'])} for s in dep.get('state', [])],
+        'changedPropIds': changed,
+    }
+
+
+def call(session, url, dep, values, changed):
+    """One callback round trip, polling background jobs to completion. Returns True on success."""
+    endpoint = f"{url}/_dash-update-component"
+    body = _body(dep, values, changed)
+    response = session.post(endpoint, json=body, timeout=120)
+    if response.status_code == 200 and 'cacheKey' in response.json():
+        # Background callback: poll with the job handles until the result is in
+        handles = {'cacheKey': response.json()['cacheKey'], 'job': response.json()['job']}
+        poll_every = dep.get('background', {}).get('interval', 1000) / 1000
+        while True:
+            time.sleep(poll_every)
+            response = session.post(endpoint, params=handles, json=body, timeout=120)
+            if response.status_code != 200 or 'response' in response.json():
+                break
+    return response.status_code in (200, 204)
+
+
+def user_session(target, deadline, think, seed, results):
+    rng = random.Random(seed)
+    session = requests.Session()
+    values = {'data-refresh-interval': 0, 'tab1-btn': 0, 'tab2-btn': 0, 'granularity': 'month'}
+
+    while time.time() < deadline:
+        action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if action == 'tab':
+            button = rng.choice(['tab1-btn', 'tab2-btn'])
+            values[button] += 1
+            name, dep, changed = 'switch_tabs', target.tabs, [f'{button}.n_clicks']
+        else:
+            if action == 'tick':
+                values['data-refresh-interval'] += 1
+                changed = ['data-refresh-interval.n_intervals']
+            else:
+                fid = rng.choice(FILTER_IDS)
+                options = target.choices[fid]
+                values[fid] = rng.sample(options, rng.randint(0, min(3, len(options))))
+                changed = [f'{fid}.value']
+            name, dep = 'update_chart', target.chart
+
+        started = time.perf_counter()
+        try:
+            ok = call(session, target.url, dep, values, changed)
+        except requests.RequestException:
+            ok = False
+        results[name].append((time.perf_counter() - started, ok))
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+
+def _tree_rss_mb(process):
+    total = 0
+    for p in [process] + process.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total / 1e6
+
+
+def sample_memory(pid, stop, samples, every=0.5):
+    process = psutil.Process(pid)
+    while not stop.is_set():
+        samples.append(_tree_rss_mb(process))
+        stop.wait(every)
+
+
+def report(results, elapsed, memory):
+    print(f"\n{'callback':<14} {'requests':>9} {'errors':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    everything = []
+    for name, rows in sorted(results.items()) + [('all', None)]:
+        rows = rows if rows is not None else everything
+        if not rows:
+            continue
+        if name != 'all':
+            everything.extend(rows)
+        latencies = np.array([seconds for seconds, _ in rows]) * 1000
+        errors = sum(1 for _, ok in rows if not ok)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{name:<14} {len(rows):>9} {errors:>7} {len(rows) / elapsed:>7.1f} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+
+    if memory:
+        print(f"\nServer RSS: start {memory[0]:.0f} MB, end {memory[-1]:.0f} MB, "
+              f"peak {max(memory):.0f} MB, growth {memory[-1] - memory[0]:+.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run")
+    parser.add_argument('--think', type=float, default=1.0, help="mean seconds a user waits between actions (0 for none)")
+    parser.add_argument('--server', choices=['gunicorn', 'dev'], default='gunicorn', help="how to start the app")
+    parser.add_argument('--workers', type=int, help="gunicorn workers (default: gunicorn.conf.py's)")
+    parser.add_argument('--transactions', type=int, default=400, help="synthetic power transactions per month")
+    parser.add_argument('--url', help="test an already running app instead of starting one")
+    parser.add_argument('--pid', type=int, help="with --url: the app's process id, to report its memory")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        url, pid = args.url.rstrip('/'), args.pid
+    else:
+        import dev_source
+        frames = dev_source.build_frames(transactions_per_month=args.transactions)
+        _, source_url = dev_source.serve_in_background(dev_source.build_workbook(frames), sheets=dev_source.build_csv_sheets(frames))
+        print(f"Starting app ({args.server}) against synthetic source {source_url}")
+        process, url, log_path = start_app(args.server, source_url, args.workers)
+        pid = process.pid
+        print(f"App ready at {url} (log: {log_path})")
+
+    try:
+        target = Target(url)
+        memory, stop = [], threading.Event()
+        if pid:
+            threading.Thread(target=sample_memory, args=(pid, stop, memory), daemon=True).start()
+
+        print(f"Running {args.users} users for {args.duration:.0f}s...")
+        results = defaultdict(list)
+        started = time.time()
+        users = [
+            threading.Thread(target=user_session, args=(target, started + args.duration, args.think, args.seed + i, results))
+            for i in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.time() - started
+        stop.set()
+        report(results, elapsed, memory)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(30)
+
+
+if __name__ == "__main__":
+    main()
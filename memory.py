@@ -0,0 +1,216 @@
+"""Memory accounting and budgets for the loaded snapshots and in-process caches.
+
+Everything the app keeps in memory per process is either a site's live
+snapshot (see data_loader.Snapshot) or an entry in an LRUCache registered
+here: update_chart's results, API query results and past snapshots loaded
+for the "as of" selector. Each cache entry's deep size is measured once, when
+it's stored, so the totals are cheap to keep.
+
+Two budgets, per process (every gunicorn worker has its own caches):
+
+    GRAVITAS_CACHE_BUDGET_MB   the result caches together
+    GRAVITAS_MEMORY_BUDGET_MB  live snapshots plus every cache
+
+When a budget is exceeded, the least recently used result is evicted from
+the largest result cache, then the least recently used past snapshot, until
+the total fits. Live snapshots are never evicted. 0 turns a budget off.
+`report()` is served on /memoryz.
+"""
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# --- Memory Budget Configuration ---
+MEMORY_BUDGET_MB = float(os.environ.get("GRAVITAS_MEMORY_BUDGET_MB", 0))   # 0: no limit
+CACHE_BUDGET_MB = float(os.environ.get("GRAVITAS_CACHE_BUDGET_MB", 0))     # 0: no limit
+
+RESULTS = 'results'       # cache kinds, in eviction order
+SNAPSHOTS = 'snapshots'
+
+_caches = []
+_live_snapshots = tuple         # returns the live snapshots; set by data_loader via track_snapshots()
+_enforce_lock = threading.Lock()
+evictions = Counter()           # entries evicted to meet a budget, per cache
+
+
+# --- Sizes ---
+def deep_size(value, seen=None):
+    """Approximate bytes held by `value`, following containers and counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if hasattr(value, 'to_plotly_json'):
+        # plotly figures keep their traces and layout as nested dicts
+        return sys.getsizeof(value) + deep_size(value.to_plotly_json(), seen)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    return size
+
+
+def _rss_bytes():
+    """Resident memory of this process, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# --- Caches ---
+class LRUCache:
+    """A thread-safe least-recently-used map that knows the deep size of its entries."""
+
+    def __init__(self, name, max_entries, kind=RESULTS, sizeof=deep_size):
+        self.name = name
+        self.max_entries = max_entries
+        self.kind = kind
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._entries = OrderedDict()   # key -> (value, bytes)
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        """Store `value`, drop the oldest entries past max_entries, then apply the budgets."""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+        enforce()
+
+    def evict_oldest(self):
+        """Drop the least recently used entry; returns False when the cache is empty."""
+        with self._lock:
+            if not self._entries:
+                return False
+            self.nbytes -= self._entries.popitem(last=False)[1][1]
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def entries(self):
+        """(key, bytes) for every entry, least recently used first."""
+        with self._lock:
+            return [(key, size) for key, (_, size) in self._entries.items()]
+
+    def status(self):
+        status = {'kind': self.kind, 'entries': len(self), 'max_entries': self.max_entries, 'mb': _mb(self.nbytes)}
+        if self.kind == SNAPSHOTS:
+            status['items'] = {'/'.join(map(str, key)): _mb(size) for key, size in self.entries()}
+        return status
+
+
+def track_snapshots(provider):
+    """Count the snapshots returned by `provider()` (data_loader's live ones) against the budget."""
+    global _live_snapshots
+    _live_snapshots = provider
+
+
+# --- Budgets ---
+def _cache_bytes(kind=None):
+    return sum(cache.nbytes for cache in _caches if kind is None or cache.kind == kind)
+
+
+def total_bytes():
+    return sum(snap.memory_bytes for snap in _live_snapshots()) + _cache_bytes()
+
+
+def _evict_one(kinds):
+    """Evict the oldest entry of the largest non-empty cache of the first kind that has one."""
+    for kind in kinds:
+        candidates = sorted((c for c in _caches if c.kind == kind and len(c)), key=lambda c: c.nbytes, reverse=True)
+        for cache in candidates:
+            if cache.evict_oldest():
+                evictions[cache.name] += 1
+                return cache.name
+    return None
+
+
+def enforce():
+    """Evict cached results, then past snapshots, until both budgets are met."""
+    if not MEMORY_BUDGET_MB and not CACHE_BUDGET_MB:
+        return
+    with _enforce_lock:
+        evicted = Counter()
+        if CACHE_BUDGET_MB:
+            while _cache_bytes(RESULTS) > CACHE_BUDGET_MB * 1e6:
+                name = _evict_one([RESULTS])
+                if name is None:
+                    break
+                evicted[name] += 1
+        if MEMORY_BUDGET_MB:
+            while total_bytes() > MEMORY_BUDGET_MB * 1e6:
+                name = _evict_one([RESULTS, SNAPSHOTS])
+                if name is None:
+                    print(f"Memory: live snapshots alone ({_mb(total_bytes())} MB) exceed the "
+                          f"{MEMORY_BUDGET_MB:.0f} MB budget")
+                    break
+                evicted[name] += 1
+        if evicted:
+            summary = ', '.join(f"{count} from {name}" for name, count in evicted.items())
+            print(f"Memory: evicted {summary}, now {_mb(total_bytes())} MB")
+
+
+# --- Report ---
+def _mb(nbytes):
+    return round(nbytes / 1e6, 2)
+
+
+def report():
+    """Deep size of every live snapshot table and every cache, with the budgets (the /memoryz body)."""
+    live = {}
+    for snap in _live_snapshots():
+        live[snap.site_id] = {
+            'generation': snap.generation,
+            'as_of': snap.as_of.isoformat() if snap.as_of else None,
+            'mb': _mb(snap.memory_bytes),
+            'tables': {name: _mb(size) for name, size in sorted(snap.table_bytes.items(), key=lambda item: -item[1])},
+        }
+    rss = _rss_bytes()
+    return {
+        'total_mb': _mb(total_bytes()),
+        'rss_mb': _mb(rss) if rss is not None else None,
+        'budget_mb': MEMORY_BUDGET_MB or None,
+        'cache_budget_mb': CACHE_BUDGET_MB or None,
+        'live': live,
+        'caches': {cache.name: dict(cache.status(), evicted=evictions[cache.name]) for cache in _caches},
+    }
+
+
+def after_fork():
+    """Recreate the locks in a freshly forked worker (the cached entries are kept)."""
+    global _enforce_lock
+    _enforce_lock = threading.Lock()
+    for cache in _caches:
+        cache._lock = threading.Lock()
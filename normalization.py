@@ -0,0 +1,120 @@
+"""Canonical generator and location names, from one alias table.
+
+The defaults live in constants (GENERATORS, GENERATOR_ALIASES,
+LOCATION_ALIASES, TREND_LOCATION_GROUPS, TREND_EXCLUDED_LOCATIONS). A JSON
+file named by GRAVITAS_ALIASES_FILE, and an "aliases" entry per site in the
+sites file, can add to them without a code change:
+
+    {
+        "generators": ["20kva", "55kva", "80kva", "200kva", "100kva"],
+        "generator_aliases": {"new 100kva": "100kva"},
+        "location_aliases": {"Tuck shop": "Tuck-shop"},
+        "trend_location_groups": {"Rosewood A": "Rosewood", "Rosewood B": "Rosewood"},
+        "trend_excluded_locations": ["Head Office"]
+    }
+
+Names are matched ignoring case and extra whitespace. A column is mapped
+by looking up each distinct value once and gathering the results by the
+value codes, so the cost doesn't grow with string work per row. Every
+sheet's generator column ends up in the same CategoricalDtype, so joins and
+groupbys across sheets compare integer codes.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import constants
+
+ALIASES_FILE = os.environ.get("GRAVITAS_ALIASES_FILE")
+
+
+def _key(value):
+    return ' '.join(str(value).split()).lower()
+
+
+def _map_distinct(series, lookup):
+    """Apply `lookup` to each distinct value of `series` once; missing values stay missing."""
+    codes, uniques = pd.factorize(series)
+    mapped = np.array([lookup(value) for value in uniques] + [None], dtype=object)
+    return pd.Series(mapped[codes], index=series.index, name=series.name)  # code -1 picks the trailing None
+
+
+def meter_numbers(series):
+    """Meter numbers as text, whether the sheet stored them as text, integers or floats (1234.0)."""
+    return series.astype(str).str.replace(r'\.0$', '', regex=True)
+
+
+def meter_names(series, meter_to_name):
+    """The subscriber name of each meter number in `series`; missing where `meter_to_name` has none."""
+    names = dict(zip(meter_numbers(pd.Series(list(meter_to_name), dtype=object)), meter_to_name.values()))
+    return meter_numbers(series).map(names)
+
+
+class AliasTable:
+    """Compiled alias lookups plus the shared generator dtype."""
+
+    def __init__(self, generators, generator_aliases, location_aliases, trend_groups, trend_excluded, known_locations=()):
+        self.generators = [_key(g) for g in generators]
+        self.generator_dtype = pd.CategoricalDtype(self.generators)
+
+        self._generators = {g: g for g in self.generators}
+        self._generators.update({_key(alias): _key(name) for alias, name in generator_aliases.items()})
+
+        # Known spellings map to themselves, so case and spacing differences collapse too
+        self._locations = {_key(name): name for name in known_locations}
+        self._locations.update({_key(alias): name for alias, name in location_aliases.items()})
+
+        self.trend_groups = dict(trend_groups)
+        self.trend_excluded = list(trend_excluded)
+
+    @classmethod
+    def from_config(cls, *configs):
+        """The defaults from constants, extended by each config dict in turn."""
+        settings = {
+            'generators': list(constants.GENERATORS),
+            'generator_aliases': dict(constants.GENERATOR_ALIASES),
+            'location_aliases': dict(constants.LOCATION_ALIASES),
+            'trend_location_groups': dict(constants.TREND_LOCATION_GROUPS),
+            'trend_excluded_locations': list(constants.TREND_EXCLUDED_LOCATIONS),
+        }
+        for config in configs:
+            for name, value in (config or {}).items():
+                if name not in settings:
+                    raise ValueError(f"Unknown alias setting '{name}'")
+                if isinstance(settings[name], dict):
+                    settings[name].update(value)
+                else:
+                    settings[name] += [v for v in value if v not in settings[name]]
+
+        known = constants.SUBSCRIBER_LOCATIONS + constants.GRAVITAS_REVENUE_SOURCES + list(constants.METER_TO_NAME.values())
+        return cls(settings['generators'], settings['generator_aliases'], settings['location_aliases'],
+                   settings['trend_location_groups'], settings['trend_excluded_locations'], known)
+
+    def generator_names(self, series):
+        """Canonical generator names; unknown spellings come back cleaned (lowercase) for validation to report."""
+        return _map_distinct(series, lambda v: self._generators.get(_key(v), _key(v)))
+
+    def as_generators(self, series):
+        """Canonical names in the shared generator dtype; unknown names are added as extra categories."""
+        unknown = sorted(set(series.dropna()) - set(self.generators) - {''})
+        if unknown:
+            return series.astype(pd.CategoricalDtype(self.generators + unknown))
+        return series.astype(self.generator_dtype)
+
+    def location_names(self, series):
+        """Canonical location names; unknown names are only stripped."""
+        return _map_distinct(series, lambda v: self._locations.get(_key(v), str(v).strip()))
+
+
+def _read_config():
+    if not ALIASES_FILE:
+        return {}
+    with open(ALIASES_FILE) as f:
+        return json.load(f)
+
+
+file_config = _read_config()
+# Defaults plus GRAVITAS_ALIASES_FILE; sites add their own entries on top (Site.from_config)
+default_aliases = AliasTable.from_config(file_config)
@@ -0,0 +1,196 @@
+import pandas as pd
+import constants
+import normalization
+
+
+# --- Filtering ---
+def filter_frame(df, years=None, months=None, **columns):
+    """Apply the sidebar filters to one table.
+
+    Year and Month are skipped when the table has no such column, the same
+    way update_chart treats them; `columns` maps other column names to the
+    values to keep (e.g. Generator=['80kva']). Empty selections keep
+    everything.
+    """
+    if years and 'Year' in df.columns:
+        df = df[df['Year'].isin(years)]
+    if months and 'Month' in df.columns:
+        df = df[df['Month'].isin(months)]
+    for column, values in columns.items():
+        if values:
+            df = df[df[column].isin(values)]
+    return df
+
+
+def _order_months(df):
+    df = df.copy()
+    df['Month'] = pd.Categorical(df['Month'], categories=constants.MONTH_ORDER, ordered=True)
+    return df.sort_values('Month').reset_index(drop=True)
+
+
+# --- Revenue ---
+def revenue_by_month(snap, years=None, months=None):
+    """Transaction revenue plus meter revenue per month (the Revenue bars of the margin chart)."""
+    trans = filter_frame(snap.power_df, years, months)
+    trans = pd.to_numeric(trans['Amount'], errors='coerce').fillna(0).groupby(trans['Month']).sum()
+
+    meter = filter_frame(snap.df_meter, years, months)
+    meter = pd.to_numeric(meter['Total Revenue'], errors='coerce').fillna(0).groupby(meter['Month']).sum()
+
+    revenue = pd.DataFrame({'Transactions': trans, 'Meter': meter}).fillna(0)
+    revenue['Revenue'] = revenue['Transactions'] + revenue['Meter']
+    revenue.index.name = 'Month'
+    return _order_months(revenue.reset_index())
+
+
+def transactions(snap, years=None, months=None, locations=None):
+    """Raw subscriber transactions, with meter numbers mapped to names and addresses."""
+    trans = filter_frame(snap.power_df, years, months).copy()
+    trans['Meter Name'] = normalization.meter_names(trans['Meter Number'], snap.meter_to_name)
+    trans['Resident Address'] = trans['Meter Name'].fillna(trans['Resident Address'])
+    trans['Amount'] = pd.to_numeric(trans['Amount'], errors='coerce').fillna(0)
+    trans = filter_frame(trans, **{'Resident Address': locations})
+    return trans
+
+
+def meter_pivot(snap, years=None, months=None, locations=None):
+    """Transaction revenue per meter, one column per address (empty where a meter isn't at that address)."""
+    trans = transactions(snap, years, months, locations)
+    if trans.empty:
+        return pd.DataFrame(columns=['Meter Number'])
+    pivots = [
+        pd.pivot_table(rows, values='Amount', index='Meter Number', columns='Resident Address', aggfunc='sum')
+        for _, rows in trans.groupby('Resident Address', sort=False)
+    ]
+    return pd.concat(pivots, axis=0).reset_index()
+
+
+def revenue_by_location(snap, years=None, months=None, locations=None):
+    """Transaction revenue per subscriber address and meter, with meter numbers mapped to names."""
+    trans = transactions(snap, years, months, locations)
+    return (trans.groupby(['Resident Address', 'Meter Number'], as_index=False)
+                 .agg(Revenue=('Amount', 'sum'), Transactions=('Amount', 'size'))
+                 .sort_values('Revenue', ascending=False)
+                 .reset_index(drop=True))
+
+
+def meter_anomalies(snap, locations=None, meters=None, flagged=False):
+    """Per-meter revenue checks for the latest month (computed at refresh), flagged meters first."""
+    anomalies = snap.df_meter_anomalies
+    if meters:
+        anomalies = anomalies[anomalies.index.isin([str(m) for m in meters])]
+    if locations:
+        anomalies = anomalies[anomalies['Subscriber'].isin(locations)]
+    if flagged:
+        anomalies = anomalies[anomalies['Anomaly']]
+    return anomalies.reset_index().sort_values(['Anomaly', 'Z-Score'], ascending=[False, True], na_position='last').reset_index(drop=True)
+
+
+# --- Cost ---
+def filtered_cost(snap, years=None, months=None, generators=None):
+    cost = filter_frame(snap.df_cost_2025, years, months, Generator=generators).copy()
+    cost['Amount (NGN)'] = pd.to_numeric(cost['Amount (NGN)'], errors='coerce').fillna(0)
+    return cost
+
+
+def cost_by_generator(snap, years=None, months=None, generators=None):
+    """Spend per generator and activity type."""
+    cost = filtered_cost(snap, years, months, generators)
+    return (cost.groupby(['Generator', 'Type of Activity'], as_index=False, observed=True)['Amount (NGN)'].sum()
+                .sort_values('Amount (NGN)', ascending=False)
+                .reset_index(drop=True))
+
+
+def cost_breakdown(snap, years=None, months=None, generators=None):
+    """Fuel, routine and corrective maintenance totals (the Cost Breakdown chart)."""
+    cost = filtered_cost(snap, years, months, generators)
+    activity = cost['Type of Activity']
+    maintenance = activity.str.contains('maintenance', case=False, na=False)
+    totals = {
+        'Fuel': cost.loc[activity.str.contains('Fuel', case=False, na=False), 'Amount (NGN)'].sum(),
+        'Routine Maintenance': cost.loc[maintenance & activity.str.contains('Routine', case=False, na=False), 'Amount (NGN)'].sum(),
+        'Corrective Maintenance': cost.loc[maintenance & activity.str.contains('Corrective', case=False, na=False), 'Amount (NGN)'].sum(),
+    }
+    return pd.DataFrame({
+        'Category': list(totals),
+        'Cost': list(totals.values()),
+        'Type': ['Fuel', 'Routine', 'Corrective'],
+    }).sort_values('Cost', ascending=False).reset_index(drop=True)
+
+
+def margin_by_month(snap, years=None, months=None, generators=None):
+    """Revenue, cost, profit and gross margin per month (the Revenue vs Cost chart)."""
+    revenue = revenue_by_month(snap, years, months)[['Month', 'Revenue']]
+    cost = filtered_cost(snap, years, months, generators)
+    cost = cost.groupby('Month', as_index=False)['Amount (NGN)'].sum().rename(columns={'Amount (NGN)': 'Total_Cost'})
+
+    revenue['Month'] = revenue['Month'].astype(str)
+    margin = revenue.merge(cost, on='Month', how='outer').fillna(0)
+    margin['Profit'] = margin['Revenue'] - margin['Total_Cost']
+    margin['Margin_Percent'] = (margin['Profit'] / margin['Revenue'] * 100).fillna(0)
+    return _order_months(margin)
+
+
+# --- Stock ---
+def stock_inventory(snap, years=None, months=None, generators=None, filter_types=None):
+    """Filter stock rows (the Stock table)."""
+    return filter_frame(snap.df_rc_melt, years, months, Generator_Size=generators, Filter_Type=filter_types)
+
+
+def stock_alerts(snap, generators=None, filter_types=None):
+    """Reorder alerts per generator size and filter type, most urgent first (projected at refresh)."""
+    alerts = snap.df_stock_alerts
+    if generators:
+        alerts = alerts[alerts.index.isin(generators, level='Generator_Size')]
+    if filter_types:
+        alerts = alerts[alerts.index.isin(filter_types, level='Filter_Type')]
+    return alerts.reset_index().sort_values(['Status', 'Months Left'], na_position='last').reset_index(drop=True)
+
+
+# --- Forecast ---
+FORECAST_TOTAL_COLUMNS = ['Label', 'Forecast', 'Lower', 'Upper']
+
+
+def forecast(snap, locations=None, generators=None):
+    """Forecast rows for the months after the data: revenue per location, fuel used and cost per generator."""
+    rows = snap.df_forecast
+    if locations:
+        rows = rows[(rows['Measure'] != 'Revenue') | rows['Key'].isin(locations)]
+    if generators:
+        rows = rows[(rows['Measure'] == 'Revenue') | rows['Key'].isin(generators)]
+    return rows.reset_index(drop=True)
+
+
+def forecast_by_month(snap, measure, years=None, months=None, keys=None):
+    """`measure`'s forecast summed over `keys` (all when empty) per month, to draw after a one-year view.
+
+    Empty unless exactly one year and no months are selected, and the data
+    ends in that year. Months running into the next year are labelled with
+    the year so they sort after December on the month-name axis.
+    """
+    rows = filter_frame(snap.df_forecast, Measure=[measure], Key=keys)
+    if rows.empty or months or not years or len(years) != 1:
+        return pd.DataFrame(columns=FORECAST_TOTAL_COLUMNS)
+    if (rows['Date'].min() - pd.DateOffset(months=1)).strftime('%Y') != years[0]:
+        return pd.DataFrame(columns=FORECAST_TOTAL_COLUMNS)
+
+    totals = rows.groupby('Date', as_index=False)[['Forecast', 'Lower', 'Upper']].sum()
+    same_year = totals['Date'].dt.strftime('%Y') == years[0]
+    totals['Label'] = totals['Date'].dt.strftime('%B').where(same_year, totals['Date'].dt.strftime('%B %Y'))
+    return totals[FORECAST_TOTAL_COLUMNS]
+
+
+# --- Validation ---
+def quarantined_rows(snap):
+    """Rows that failed validation at the last refresh, with the reasons."""
+    return snap.df_quarantine
+
+
+# --- Runtime ---
+def runtime_share(snap, years=None, months=None, generators=None):
+    """Hours operated per generator and its share of total runtime (the Generator Usage chart)."""
+    runtime = filter_frame(snap.df_agg, years, months, Generator=generators)
+    hours = runtime.groupby('Generator', as_index=False, observed=True)['Hours Operated'].sum()
+    total = hours['Hours Operated'].sum()
+    hours['Percentage'] = hours['Hours Operated'] / total * 100 if total > 0 else 0
+    return hours.sort_values('Hours Operated', ascending=False).reset_index(drop=True)
@@ -0,0 +1,87 @@
+import os
+
+from flask import jsonify, request
+from flask_compress import Compress
+
+import data_loader
+import memory
+
+# --- HTTP Configuration ---
+ASSET_MAX_AGE = 3600                  # un-fingerprinted assets: revalidate hourly
+FINGERPRINTED_MAX_AGE = 31536000      # assets requested with ?m=<mtime> never change
+
+
+def asset_url(app, path):
+    """URL for a file in assets/ with its modification time appended, so it can be cached for a year."""
+    full_path = os.path.join(app.config.assets_folder, path)
+    try:
+        version = int(os.path.getmtime(full_path))
+    except OSError:
+        return app.get_asset_url(path)
+    return f"{app.get_asset_url(path)}?m={version}"
+
+
+def configure_server(app):
+    """Compression and caching headers for everything served by `app.server`."""
+    server = app.server
+
+    # Brotli for browsers that accept it, gzip otherwise. Callback responses
+    # (six figures plus two tables of JSON) shrink by roughly 10x.
+    server.config.update(
+        COMPRESS_ALGORITHM=['br', 'gzip'],
+        COMPRESS_ALGORITHM_STREAMING=['br', 'deflate'],
+        COMPRESS_BR_LEVEL=5,
+        COMPRESS_LEVEL=6,
+        COMPRESS_MIN_SIZE=500,
+    )
+    Compress(server)
+
+    assets_prefix = app.get_asset_url('')
+
+    @server.after_request
+    def set_cache_headers(response):
+        path = request.path
+        if path.startswith(assets_prefix):
+            # Flask marks static files no-cache by default; replace that with a max-age
+            response.cache_control.no_cache = None
+            # Dash adds ?m=<mtime> to the css/js it injects; asset_url() does the same for images
+            if 'm' in request.args:
+                response.cache_control.public = True
+                response.cache_control.max_age = FINGERPRINTED_MAX_AGE
+                response.cache_control.immutable = True
+            else:
+                response.cache_control.public = True
+                response.cache_control.max_age = ASSET_MAX_AGE
+        elif path.endswith('_dash-update-component'):
+            # Callback output depends on the request body and the data generation
+            response.cache_control.no_store = True
+        return response
+
+    @server.route('/healthz')
+    def healthz():
+        """Liveness: the process is up and serving requests."""
+        return jsonify(status='ok')
+
+    @server.route('/readyz')
+    def readyz():
+        """Readiness: 200 once the default site's data has been loaded, 503 before that."""
+        sites = {
+            site_id: {
+                'data_as_of': status['as_of'].isoformat() if status['as_of'] else None,
+                'checked_at': status['checked'].isoformat() if status['checked'] else None,
+                'generation': status['generation'],
+                'stale': status['stale'],
+                'error': status['error'],
+                'memory_mb': status['memory_mb'],
+                'quarantined': status['quarantined'],
+            }
+            for site_id, status in data_loader.sites_status().items()
+        }
+        default = sites[data_loader.DEFAULT_SITE_ID]
+        body = dict(default, ready=default['data_as_of'] is not None, sites=sites)
+        return jsonify(body), (200 if body['ready'] else 503)
+
+    @server.route('/memoryz')
+    def memoryz():
+        """Deep size of each live snapshot table and each cache in this process, with the memory budgets."""
+        return jsonify(memory.report())
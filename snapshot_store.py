@@ -0,0 +1,219 @@
+"""On-disk history of the parsed workbook, one manifest per data generation.
+
+Every sheet table is split into partitions (one per Year/Month where the
+table has those columns) and each partition is written once, as an
+uncompressed Arrow IPC file named after the SHA-256 of its bytes. A
+manifest lists the partitions that make up each table at a point in time,
+so a refresh that only changed one month stores one new partition, and a
+refresh that changed nothing stores nothing at all.
+
+Every partition of a table is written with the table's one Arrow schema,
+so months where a free-form column is empty (null) or mixes numbers and
+text still concatenate when the snapshot is loaded.
+
+Loading a past snapshot memory-maps its partition files instead of
+re-downloading and re-parsing the workbook. Converting the tables to pandas
+still copies them onto the heap, so a loaded snapshot takes about as much
+memory as a live one; what's saved is the download and the parse.
+
+    <GRAVITAS_SNAPSHOT_DIR>/<site>/blobs/<sha256>.arrow
+    <GRAVITAS_SNAPSHOT_DIR>/<site>/manifests/<YYYYmmddTHHMMSS>.json
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # history is optional; the live dashboard doesn't need it
+    pa = None
+
+# --- Snapshot Configuration ---
+SNAPSHOT_DIR = os.environ.get("GRAVITAS_SNAPSHOT_DIR", "snapshots")  # empty disables history
+KEEP_ALL_HOURS = int(os.environ.get("GRAVITAS_SNAPSHOT_KEEP_ALL_HOURS", 48))    # every snapshot this recent is kept
+KEEP_DAILY_DAYS = int(os.environ.get("GRAVITAS_SNAPSHOT_KEEP_DAILY_DAYS", 60))  # then the last one of each day
+KEEP_WEEKLY_WEEKS = int(os.environ.get("GRAVITAS_SNAPSHOT_KEEP_WEEKLY_WEEKS", 52))  # then the last one of each week
+
+PARTITION_KEYS = ['Year', 'Month']
+KEY_FORMAT = '%Y%m%dT%H%M%S'
+
+_write_lock = threading.Lock()
+
+
+def enabled():
+    return pa is not None and bool(SNAPSHOT_DIR)
+
+
+def _site_dir(site_id, *parts):
+    return os.path.join(SNAPSHOT_DIR, site_id, *parts)
+
+
+def _with_schema(frame):
+    """(frame, schema): the whole table's Arrow schema, which every one of its partitions is written with.
+
+    Free-form sheets (stock, electrical) can mix numbers and text in one
+    column; those columns are stored as text, in every partition alike.
+    """
+    keep_index = frame.index.name is not None
+    try:
+        schema = pa.Schema.from_pandas(frame, preserve_index=keep_index)
+        pa.Table.from_pandas(frame, schema=schema, preserve_index=keep_index)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        frame = frame.copy()
+        for col in frame.columns[frame.dtypes == object]:
+            frame[col] = frame[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        schema = pa.Schema.from_pandas(frame, preserve_index=keep_index)
+    return frame, schema
+
+
+def _write_partition(site_id, frame, schema):
+    """Store one partition if it isn't stored yet; returns its content hash."""
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=frame.index.name is not None)
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    payload = sink.getvalue()
+
+    digest = hashlib.sha256(payload).hexdigest()
+    path = _site_dir(site_id, 'blobs', f"{digest}.arrow")
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    return digest
+
+
+def _partitions(frame):
+    if frame.empty or not all(k in frame.columns for k in PARTITION_KEYS):
+        yield frame
+        return
+    keys = frame[PARTITION_KEYS].astype(str)
+    for _, rows in frame.groupby([keys[k] for k in PARTITION_KEYS], sort=False, observed=True):
+        # Row positions aren't part of the content; a named index (e.g. event start times) is
+        yield rows if frame.index.name is not None else rows.reset_index(drop=True)
+
+
+def _manifest_paths(site_id):
+    folder = _site_dir(site_id, 'manifests')
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.json'))
+
+
+def _read_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def persist(site_id, frames, as_of, generation):
+    """Write `frames` (the parsed sheets) as a snapshot taken at `as_of`.
+
+    Returns the snapshot key, or None when nothing changed since the latest
+    stored snapshot (or history is disabled).
+    """
+    if not enabled():
+        return None
+
+    with _write_lock:
+        os.makedirs(_site_dir(site_id, 'blobs'), exist_ok=True)
+        os.makedirs(_site_dir(site_id, 'manifests'), exist_ok=True)
+
+        tables = {}
+        for name, frame in frames.items():
+            if not isinstance(frame, pd.DataFrame):
+                continue
+            frame, schema = _with_schema(frame)
+            tables[name] = {
+                'index': frame.index.name,
+                'partitions': [_write_partition(site_id, part, schema) for part in _partitions(frame)],
+            }
+
+        previous = _manifest_paths(site_id)
+        if previous and _read_manifest(previous[-1])['tables'] == tables:
+            return None
+
+        key = as_of.strftime(KEY_FORMAT)
+        manifest = {'site': site_id, 'as_of': as_of.isoformat(), 'generation': generation, 'tables': tables}
+        path = _site_dir(site_id, 'manifests', f"{key}.json")
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+        return key
+
+
+def list_snapshots(site_id):
+    """Stored snapshot keys for a site with their timestamps, newest first."""
+    keys = [os.path.basename(path)[:-len('.json')] for path in _manifest_paths(site_id)]
+    return [(key, datetime.strptime(key, KEY_FORMAT)) for key in reversed(keys)]
+
+
+def load(site_id, key):
+    """Rebuild the sheet tables of a stored snapshot from its memory-mapped partitions.
+
+    Returns (frames, manifest).
+    """
+    datetime.strptime(key, KEY_FORMAT)  # keys come from the browser; reject anything that isn't a timestamp
+    manifest = _read_manifest(_site_dir(site_id, 'manifests', f"{key}.json"))
+    frames = {}
+    for name, entry in manifest['tables'].items():
+        parts = []
+        for digest in entry['partitions']:
+            with pa.memory_map(_site_dir(site_id, 'blobs', f"{digest}.arrow")) as source:
+                parts.append(pa.ipc.open_file(source).read_all())
+        # Permissive, for partitions stored before every partition shared its table's schema
+        table = pa.concat_tables(parts, promote_options='permissive') if len(parts) > 1 else parts[0]
+        frame = table.to_pandas(split_blocks=True)
+        if entry['index'] is None:
+            frame = frame.reset_index(drop=True)
+        frames[name] = frame
+    return frames, manifest
+
+
+def apply_retention(site_id, now=None):
+    """Thin out old snapshots and delete partitions no snapshot uses any more.
+
+    Everything from the last KEEP_ALL_HOURS is kept, then the latest snapshot
+    of each day up to KEEP_DAILY_DAYS, then of each ISO week up to
+    KEEP_WEEKLY_WEEKS; older snapshots are removed. Returns the number of
+    snapshots removed.
+    """
+    if not enabled():
+        return 0
+    now = now or datetime.now()
+
+    with _write_lock:
+        keep, seen_buckets, removed = [], set(), 0
+        for key, taken in list_snapshots(site_id):  # newest first
+            age = now - taken
+            if age <= timedelta(hours=KEEP_ALL_HOURS):
+                bucket = key
+            elif age <= timedelta(days=KEEP_DAILY_DAYS):
+                bucket = ('day', taken.date())
+            elif age <= timedelta(weeks=KEEP_WEEKLY_WEEKS):
+                bucket = ('week', taken.isocalendar()[:2])
+            else:
+                bucket = None
+
+            if bucket is not None and bucket not in seen_buckets:
+                seen_buckets.add(bucket)
+                keep.append(key)
+            else:
+                os.remove(_site_dir(site_id, 'manifests', f"{key}.json"))
+                removed += 1
+
+        if removed:
+            referenced = set()
+            for key in keep:
+                for entry in _read_manifest(_site_dir(site_id, 'manifests', f"{key}.json"))['tables'].values():
+                    referenced.update(entry['partitions'])
+            blob_dir = _site_dir(site_id, 'blobs')
+            for name in os.listdir(blob_dir):
+                if name.endswith('.arrow') and name[:-len('.arrow')] not in referenced:
+                    os.remove(os.path.join(blob_dir, name))
+        return removed
@@ -0,0 +1,101 @@
+"""Startup profile: how long the app takes to start serving, and which imports cost the most.
+
+Starts the synthetic source (see dev_source.py), then imports `app` in a
+fresh interpreter with `-X importtime`, `--runs` times, and reports:
+
+    import       seconds until `app` is imported, i.e. the server could start listening
+    first data   seconds until the first refresh has been published
+    slowest imports by cumulative time, from the last run
+
+Exits with status 1 when the median import time is over the budget, so a
+heavy module creeping back onto the startup path fails the build:
+
+    python startup_profile.py
+    python startup_profile.py --budget 1.5 --top 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BUDGET_SECONDS = float(os.environ.get("GRAVITAS_STARTUP_BUDGET", 2.0))
+RESULT_PREFIX = 'startup-profile:'
+
+
+def measure():
+    """Import the app in this process and print the timings."""
+    started = time.perf_counter()
+    import app  # noqa: F401
+    imported = time.perf_counter() - started
+
+    import data_loader
+    data_loader.wait_for_refreshes()
+    loaded = time.perf_counter() - started
+    print(RESULT_PREFIX + json.dumps({'import': round(imported, 3), 'first_data': round(loaded, 3)}))
+
+
+def slowest_imports(importtime_log, top):
+    """(cumulative seconds, module) for the `top` slowest imports in `-X importtime` output."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1e6, name.rstrip()))
+    rows.sort(reverse=True)
+    return [(seconds, name) for seconds, name in rows if name.strip() != 'app'][:top]
+
+
+def run_once(source_url):
+    env = dict(os.environ, GRAVITAS_SOURCE_URL=source_url, GRAVITAS_CACHE_WARMING='false')
+    env.setdefault('GRAVITAS_SNAPSHOT_DIR', '')  # history isn't under test
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--measure'],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    result = next((line[len(RESULT_PREFIX):] for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)), None)
+    if process.returncode != 0 or result is None:
+        raise RuntimeError(f"App failed to start:\n{process.stdout}\n{process.stderr[-2000:]}")
+    return json.loads(result), process.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=BUDGET_SECONDS, help="maximum median import seconds")
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters to time")
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list")
+    parser.add_argument('--transactions', type=int, default=400, help="synthetic power transactions per month")
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure()
+        return
+
+    import dev_source
+    frames = dev_source.build_frames(transactions_per_month=args.transactions)
+    _, source_url = dev_source.serve_in_background(dev_source.build_workbook(frames), sheets=dev_source.build_csv_sheets(frames))
+
+    runs = []
+    for _ in range(args.runs):
+        timings, importtime_log = run_once(source_url)
+        runs.append(timings)
+
+    print(f"\n{'slowest imports':<50} {'cumulative ms':>14}")
+    for seconds, name in slowest_imports(importtime_log, args.top):
+        print(f"{name:<50} {seconds * 1000:>14.0f}")
+
+    imported = statistics.median(run['import'] for run in runs)
+    first_data = statistics.median(run['first_data'] for run in runs)
+    print(f"\nimport {imported:.2f}s, first data {first_data:.2f}s (median of {len(runs)} runs), budget {args.budget:.2f}s")
+    if imported > args.budget:
+        print(f"FAIL: startup is {imported - args.budget:.2f}s over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GRAVITAS_SNAPSHOT_DIR', '')   # history isn't under test
+
+import data_loader  # noqa: E402
+import dev_source  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def frames():
+    return dev_source.build_frames(transactions_per_month=50)
+
+
+@pytest.fixture
+def source(frames):
+    """The synthetic source serving the workbook and its sheets as CSV exports: (server, url)."""
+    server, url = dev_source.serve_in_background(dev_source.build_workbook(frames), sheets=dev_source.build_csv_sheets(frames))
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def site(source, monkeypatch):
+    """A site loaded from the synthetic source, served as the only (default) site."""
+    _, url = source
+    site = data_loader.Site('test', 'Test', url)
+    monkeypatch.setattr(data_loader, 'sites', {'test': site})
+    monkeypatch.setattr(data_loader, 'DEFAULT_SITE_ID', 'test')
+    data_loader._refresh_site(site)
+    return site
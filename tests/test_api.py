@@ -0,0 +1,75 @@
+import types
+
+import flask
+import pytest
+
+import api
+import dev_source
+
+COST_SHEET = dev_source.SHEET_NAMES.index('Cost')
+
+
+@pytest.fixture
+def client(site):
+    app = types.SimpleNamespace(server=flask.Flask(__name__))
+    api.register_api(app)
+    return app.server.test_client()
+
+
+def test_unchanged_data_gets_304(client):
+    first = client.get('/api/v1/cost/generators?year=2025')
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get('/api/v1/cost/generators?year=2025', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and not again.data
+
+    other_filter = client.get('/api/v1/cost/generators?year=2024', headers={'If-None-Match': first.headers['ETag']})
+    assert other_filter.status_code == 200
+
+
+def test_new_generation_changes_the_etag(client, site, source, frames):
+    server, _ = source
+    etag = client.get('/api/v1/cost/generators').headers['ETag']
+
+    sheets = [frame.copy() for frame in frames]
+    sheets[COST_SHEET] = sheets[COST_SHEET].iloc[:-1]
+    server.payload = dev_source.build_workbook(sheets)
+    site.last_attempt_time = None
+    api.data_loader._refresh_site(site)
+
+    response = client.get('/api/v1/cost/generators', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+
+def test_pages_cover_the_result_once(client):
+    full = client.get('/api/v1/revenue/locations').get_json()
+    assert full['total'] > 3
+
+    rows, offset, pages = [], 0, 0
+    while offset is not None:
+        page = client.get(f'/api/v1/revenue/locations?limit=3&offset={offset}')
+        body = page.get_json()
+        assert page.headers['X-Total-Count'] == str(full['total'])
+        assert ('Link' in page.headers) == (body['next_offset'] is not None)
+        rows += body['rows']
+        offset = body['next_offset']
+        pages += 1
+
+    assert rows == full['rows']
+    assert pages == -(-full['total'] // 3)
+
+
+def test_link_header_keeps_the_filters(client):
+    link = client.get('/api/v1/revenue/locations?year=2025&limit=1').headers['Link']
+    assert 'year=2025' in link and 'offset=1' in link and link.endswith('rel="next"')
+
+
+@pytest.mark.parametrize('query, status', [
+    ('/api/v1/no/such', 404),
+    ('/api/v1/revenue/monthly?limit=-1', 400),
+    ('/api/v1/revenue/monthly?offset=x', 400),
+    ('/api/v1/revenue/monthly?format=xml', 400),
+    ('/api/v1/revenue/monthly?site=elsewhere', 404),
+])
+def test_bad_requests_are_rejected(client, query, status):
+    assert client.get(query).status_code == status
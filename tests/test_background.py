@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: background.ENABLED is read at import, and the app registers its callbacks once
+CHECK = """
+import json, os
+import dev_source
+server, url = dev_source.serve_in_background()
+os.environ['GRAVITAS_SOURCE_URL'] = url
+import app, background
+deps = app.server.test_client().get('/_dash-dependencies').get_json()
+chart = next(dep for dep in deps if 'revenue_cost_chart.figure' in dep['output'])
+print('REGISTERED', json.dumps({'manager': background.manager is not None, 'background': chart.get('background')}))
+"""
+
+
+def test_chart_callback_registers_as_background_job(tmp_path):
+    env = dict(os.environ, GRAVITAS_BACKGROUND_CALLBACKS='true', GRAVITAS_JOB_DIR=str(tmp_path),
+               GRAVITAS_CACHE_WARMING='false', GRAVITAS_SNAPSHOT_DIR='')
+    result = subprocess.run([sys.executable, '-c', CHECK], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+
+    line = next(line for line in result.stdout.splitlines() if line.startswith('REGISTERED '))
+    registered = json.loads(line.split(' ', 1)[1])
+    assert registered['manager']
+    assert registered['background'] == {'interval': 500}
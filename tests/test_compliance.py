@@ -0,0 +1,45 @@
+import pandas as pd
+
+import analytics
+
+MONDAYS_ONLY = {0: {'80kva': 10}}
+
+
+def _run_time(rows):
+    return pd.DataFrame(rows, columns=['Date', 'Generator', 'Hours Operated'])
+
+
+def test_each_day_is_classified_against_the_schedule():
+    run_time = _run_time([
+        ('2025-03-03', '80kva', 10),    # Monday, as scheduled
+        ('2025-03-04', '80kva', 3),     # Tuesday, not scheduled
+        ('2025-03-17', '80kva', 12),    # Monday, over
+    ])
+
+    compliance = analytics.compute_schedule_compliance(run_time, MONDAYS_ONLY)
+
+    status = compliance.set_index(compliance['Date'].dt.strftime('%Y-%m-%d'))['Status'].to_dict()
+    assert status == {
+        '2025-03-03': 'On schedule',
+        '2025-03-04': 'Unscheduled',
+        '2025-03-10': 'Under-run',      # Monday in the log's range with no run at all
+        '2025-03-17': 'Over-run',
+    }
+
+
+def test_variance_within_tolerance_is_on_schedule():
+    run_time = _run_time([('2025-03-03', '80kva', 10.4), ('2025-03-10', '80kva', 9.4)])
+
+    compliance = analytics.compute_schedule_compliance(run_time, MONDAYS_ONLY, tolerance=0.5)
+
+    assert compliance['Status'].tolist() == ['On schedule', 'Under-run']
+
+
+def test_summary_counts_days_per_generator():
+    run_time = _run_time([('2025-03-03', '80kva', 10), ('2025-03-10', '80kva', 4), ('2025-03-04', '55kva', 2)])
+
+    summary = analytics.summarize_compliance(analytics.compute_schedule_compliance(run_time, MONDAYS_ONLY))
+
+    row = summary.set_index('Generator').loc['80kva']
+    assert (row['Scheduled Days'], row['On Schedule'], row['Under-run']) == (2, 1, 1)
+    assert row['Variance'] == -6
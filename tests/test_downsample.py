@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import downsample
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1001, 3), (5000, 999)])
+def test_lttb_keeps_threshold_points_including_the_ends(n, threshold):
+    x = np.arange(n)
+    y = np.sin(x / 20.0)
+
+    keep = downsample.lttb(x, y, threshold)
+
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[537] = 50.0
+    assert 537 in downsample.lttb(np.arange(1000), y, 50)
+
+
+@pytest.mark.parametrize('threshold', [2, 1000, 5000])
+def test_short_series_are_left_alone(threshold):
+    assert len(downsample.lttb(np.arange(1000), np.ones(1000), threshold)) == 1000
+
+
+def test_frame_is_capped_per_trace():
+    periods = pd.date_range('2020-01-01', periods=800, freq='D')
+    frame = pd.concat([
+        pd.DataFrame({'Period': periods, 'Key': 'long', 'Value': np.random.default_rng(0).random(800)}),
+        pd.DataFrame({'Period': periods[:50], 'Key': 'short', 'Value': 1.0}),
+    ])
+
+    reduced = downsample.downsample_frame(frame, 'Period', 'Value', 'Key', max_points=120)
+
+    counts = reduced.groupby('Key').size()
+    assert counts['long'] == 120 and counts['short'] == 50
+    long = reduced[reduced['Key'] == 'long']
+    assert long['Period'].iloc[0] == periods[0] and long['Period'].iloc[-1] == periods[-1]
+
+
+def test_points_follow_the_plot_width():
+    assert downsample.points_for_width(1600) == 1600
+    assert downsample.points_for_width(10) == downsample.MIN_POINTS
+    assert downsample.points_for_width(None) == downsample.DEFAULT_WIDTH
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+import data_loader
+import dev_source
+import fetcher
+
+
+def _no_sleep(seconds):
+    pass
+
+
+@pytest.fixture
+def failing_source():
+    server, url = dev_source.serve_in_background(b'unused', fail_rate=1.0)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_then_gives_up(failing_source):
+    server, url = failing_source
+    with pytest.raises(fetcher.FetchError):
+        fetcher.fetch_with_retries(url, retries=2, sleep=_no_sleep)
+    assert server.requests_served == 3
+
+
+def test_read_timeout_is_retried(monkeypatch):
+    monkeypatch.setattr(fetcher, 'READ_TIMEOUT', 0.1)
+    server, url = dev_source.serve_in_background(b'workbook', delay=0.5)
+    try:
+        with pytest.raises(fetcher.FetchError) as error:
+            fetcher.fetch_with_retries(url, retries=1, sleep=_no_sleep)
+        assert error.value.retryable
+        assert server.requests_served == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_breaker_opens_after_threshold(failing_source):
+    server, url = failing_source
+    breaker = fetcher.CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(3):
+        with pytest.raises(fetcher.FetchError):
+            fetcher.fetch_with_retries(url, breaker=breaker, retries=0)
+    assert breaker.state == 'open'
+
+    with pytest.raises(fetcher.CircuitOpenError):
+        fetcher.fetch_with_retries(url, breaker=breaker, retries=0)
+    assert server.requests_served == 3   # refused without contacting the source
+
+
+def test_breaker_lets_one_trial_through_after_cooldown(failing_source):
+    server, url = failing_source
+    breaker = fetcher.CircuitBreaker(failure_threshold=1, cooldown=0.2)
+    with pytest.raises(fetcher.FetchError):
+        fetcher.fetch_with_retries(url, breaker=breaker, retries=0)
+    assert breaker.state == 'open'
+
+    time.sleep(0.3)
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()   # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    time.sleep(0.3)
+    server.fail_rate = 0.0
+    assert fetcher.fetch_with_retries(url, breaker=breaker, retries=0) == b'unused'
+    assert breaker.state == 'closed'
+
+
+def test_last_good_snapshot_is_served_while_source_fails(source, monkeypatch):
+    monkeypatch.setattr(fetcher, 'MAX_RETRIES', 0)
+    server, url = source
+    site = data_loader.Site('test', 'Test', url)
+    data_loader._refresh_site(site)
+    good = site.snapshot
+    assert good.as_of is not None and site.last_error is None
+
+    server.fail_rate = 1.0
+    site.last_attempt_time = None
+    data_loader._refresh_site(site)
+
+    assert site.snapshot is good
+    status = site.status()
+    assert status['stale'] and status['error']
+    assert status['as_of'] == good.as_of
@@ -0,0 +1,37 @@
+import pandas as pd
+
+import analytics
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June']
+
+
+def _tables(used, hours):
+    supplied = pd.DataFrame({'Year': '2025', 'Month': MONTHS, 'Generator': '80kva',
+                             'Fuel Purchased': [200.0] * 6, 'Total Fuel Used': used})
+    agg = pd.DataFrame({'Year': '2025', 'Month': MONTHS, 'Generator': '80kva', 'Hours Operated': hours})
+    cost = pd.DataFrame({'Year': '2025', 'Month': MONTHS, 'Generator': '80kva',
+                         'Type of Activity': ['Fuel purchase', 'Fuel', 'Fuel', 'Fuel', 'Fuel', 'Servicing'],
+                         'Amount (NGN)': [200000.0] * 6})
+    return supplied, agg, cost
+
+
+def test_ratios_per_month():
+    table = analytics.compute_fuel_efficiency(*_tables([100.0] * 6, [10.0] * 6)).set_index('Month')
+
+    january = table.loc['January']
+    assert january['Litres per Hour'] == 10
+    assert january['Cost per Hour'] == 20000
+    assert january['Cost per Litre'] == 1000
+    assert table.loc['June', 'Fuel Cost'] == 0     # only fuel spend counts
+    assert not table['Anomaly'].any()
+
+
+def test_outlier_month_and_missing_runtime_are_flagged():
+    used = [100.0, 105.0, 95.0, 100.0, 300.0, 50.0]
+    hours = [10.0, 10.0, 10.0, 10.0, 10.0, 0.0]
+
+    reasons = analytics.compute_fuel_efficiency(*_tables(used, hours)).set_index('Month')['Anomaly Reason']
+
+    assert reasons['May'] == 'Consumption high for runtime'
+    assert reasons['June'] == 'Fuel used with no runtime logged'
+    assert (reasons[['January', 'February', 'March', 'April']] == '').all()
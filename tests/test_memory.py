@@ -0,0 +1,95 @@
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import memory
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    """No registered caches or live snapshots but the test's own; both budgets off."""
+    monkeypatch.setattr(memory, '_caches', [])
+    monkeypatch.setattr(memory, 'evictions', memory.Counter())
+    monkeypatch.setattr(memory, 'MEMORY_BUDGET_MB', 0)
+    monkeypatch.setattr(memory, 'CACHE_BUDGET_MB', 0)
+    live = []
+    monkeypatch.setattr(memory, '_live_snapshots', lambda: live)
+    return live
+
+
+def _cache(name, kind=memory.RESULTS, max_entries=10):
+    # Values are their own size in bytes
+    return memory.LRUCache(name, max_entries, kind=kind, sizeof=lambda value: value)
+
+
+def test_least_recently_used_entry_goes_first(isolated):
+    cache = _cache('results', max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert [key for key, _ in cache.entries()] == ['a', 'c']
+    assert cache.nbytes == 4
+
+
+def test_replacing_an_entry_updates_its_size(isolated):
+    cache = _cache('results')
+    cache.put('a', 100)
+    cache.put('a', 30)
+    assert len(cache) == 1 and cache.nbytes == 30
+
+
+def test_cache_budget_evicts_from_the_largest_results_cache(isolated, monkeypatch):
+    monkeypatch.setattr(memory, 'CACHE_BUDGET_MB', 1)
+    small, large = _cache('small'), _cache('large')
+    history = _cache('history', kind=memory.SNAPSHOTS)
+    small.put('s1', 200_000)
+    history.put('h1', 900_000)              # not a result: the cache budget leaves it alone
+    large.put('l1', 400_000)
+    large.put('l2', 400_000)
+    small.put('s2', 200_000)                # 1.2 MB of results
+
+    assert [key for key, _ in large.entries()] == ['l2']
+    assert len(small) == 2 and len(history) == 1
+    assert memory.evictions['large'] == 1
+
+
+def test_memory_budget_evicts_results_then_past_snapshots(isolated, monkeypatch):
+    isolated.append(types.SimpleNamespace(memory_bytes=500_000))
+    results = _cache('results')
+    history = _cache('history', kind=memory.SNAPSHOTS)
+    results.put('r1', 100_000)
+    history.put('h1', 300_000)
+    history.put('h2', 300_000)
+    results.put('r2', 100_000)
+
+    monkeypatch.setattr(memory, 'MEMORY_BUDGET_MB', 1)
+    memory.enforce()
+
+    assert len(results) == 0
+    assert [key for key, _ in history.entries()] == ['h2']
+    assert memory.total_bytes() <= 1_000_000
+
+
+def test_live_snapshots_are_never_evicted(isolated, monkeypatch, capsys):
+    isolated.append(types.SimpleNamespace(memory_bytes=2_000_000))
+    results = _cache('results')
+    results.put('r1', 100)
+
+    monkeypatch.setattr(memory, 'MEMORY_BUDGET_MB', 1)
+    memory.enforce()
+
+    assert len(results) == 0 and len(isolated) == 1
+    assert 'exceed' in capsys.readouterr().out
+
+
+def test_deep_size_counts_shared_objects_once():
+    frame = pd.DataFrame({'x': np.arange(1000, dtype='int64')})
+    single = memory.deep_size(frame)
+
+    assert single >= 8000
+    assert memory.deep_size({'a': frame, 'b': frame}) < 2 * single
+    assert memory.deep_size([np.zeros(100)]) >= 800
@@ -0,0 +1,34 @@
+import pandas as pd
+
+import analytics
+
+
+def _transactions(dates, amounts, **columns):
+    return pd.DataFrame(dict({
+        'Transaction Date': pd.to_datetime(dates),
+        'Meter Number': ['1001'] * len(dates),
+        'Resident Address': ['Block A'] * len(dates),
+        'Amount': amounts,
+    }, **columns))
+
+
+def _duplicates(power_df):
+    return analytics.compute_meter_anomalies(power_df, {}).loc['1001', 'Duplicates']
+
+
+def test_same_day_repeats_at_different_times_are_not_duplicates():
+    power_df = _transactions(['2025-03-04 09:15', '2025-03-04 18:40'], [5000, 5000])
+    assert _duplicates(power_df) == 0
+
+
+def test_same_timestamp_and_amount_is_a_duplicate():
+    power_df = _transactions(['2025-03-04 09:15', '2025-03-04 09:15'], [5000, 5000])
+    assert _duplicates(power_df) == 1
+
+
+def test_transaction_ids_decide_when_present():
+    repeat = _transactions(['2025-03-04', '2025-03-04'], [5000, 5000], **{'Receipt No': ['R-1', 'R-2']})
+    double_entry = _transactions(['2025-03-04', '2025-03-05'], [5000, 5000], **{'Receipt No': ['R-1', 'R-1']})
+
+    assert _duplicates(repeat) == 0
+    assert _duplicates(double_entry) == 1
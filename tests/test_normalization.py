@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+import normalization
+
+
+def test_meter_names_ignore_float_storage():
+    numbers = pd.Series([1234.0, '1234', 5678, None], dtype=object)
+
+    names = normalization.meter_names(numbers, {1234: 'Block A', '5678.0': 'Block B'})
+
+    assert names.tolist()[:3] == ['Block A', 'Block A', 'Block B']
+    assert pd.isna(names.iloc[3])
+
+
+def test_generator_spellings_collapse_to_canonical_names():
+    names = normalization.default_aliases.generator_names(pd.Series(['New 80KVA', ' 55kva ', '200  KVA', '88kva', None]))
+
+    assert names.tolist()[:2] == ['80kva', '55kva']
+    assert names.iloc[3] == '80kva'
+    assert names.iloc[2] == '200 kva'      # unknown: only cleaned
+    assert names.iloc[4] is None
+
+
+def test_location_spellings_collapse_to_known_names():
+    names = normalization.default_aliases.location_names(pd.Series(['9 Mobile', 'tuck-SHOP ', 'Nowhere Lane ']))
+
+    assert names.tolist() == ['9mobile', 'Tuck-shop', 'Nowhere Lane']
+
+
+def test_config_extends_the_defaults():
+    aliases = normalization.AliasTable.from_config(
+        {'generators': ['100kva'], 'generator_aliases': {'New 100KVA': '100kva'}},
+        {'trend_excluded_locations': ['Kiosk']},
+    )
+
+    assert aliases.generator_names(pd.Series(['new 100kva', 'New 80KVA'])).tolist() == ['100kva', '80kva']
+    assert '100kva' in aliases.generators and '20kva' in aliases.generators
+    assert 'Kiosk' in aliases.trend_excluded and 'Providus' in aliases.trend_excluded
+
+
+def test_unknown_setting_is_rejected():
+    with pytest.raises(ValueError):
+        normalization.AliasTable.from_config({'generator_alias': {}})
+
+
+def test_sheets_share_one_generator_dtype():
+    aliases = normalization.default_aliases
+    first = aliases.as_generators(pd.Series(['80kva', '20kva']))
+    second = aliases.as_generators(pd.Series(['200kva']))
+    unknown = aliases.as_generators(pd.Series(['80kva', 'new 100kva']))
+
+    assert first.dtype == second.dtype == aliases.generator_dtype
+    assert unknown.tolist() == ['80kva', 'new 100kva']
+    assert list(unknown.cat.categories[:len(aliases.generators)]) == aliases.generators
@@ -0,0 +1,54 @@
+import data_loader
+import dev_source
+
+COST_SHEET = dev_source.SHEET_NAMES.index('Cost')
+
+
+def _refresh(site):
+    site.last_attempt_time = None
+    data_loader._refresh_site(site)
+
+
+def test_unchanged_data_keeps_generation(source):
+    _, url = source
+    site = data_loader.Site('test', 'Test', url)
+    _refresh(site)
+    snapshot, generation = site.snapshot, data_loader.data_generation
+
+    _refresh(site)
+
+    assert data_loader.data_generation == generation
+    assert site.snapshot is snapshot
+    assert site.status()['checked'] > snapshot.as_of
+
+
+def test_changed_data_bumps_generation(source, frames):
+    server, url = source
+    site = data_loader.Site('test', 'Test', url)
+    _refresh(site)
+    generation = data_loader.data_generation
+
+    sheets = [frame.copy() for frame in frames]
+    sheets[COST_SHEET] = sheets[COST_SHEET].iloc[:-1]
+    server.payload = dev_source.build_workbook(sheets)
+    _refresh(site)
+
+    assert data_loader.data_generation == generation + 1
+    assert site.snapshot.generation == data_loader.data_generation
+
+
+def test_tables_with_unchanged_inputs_are_reused(source, frames):
+    server, url = source
+    site = data_loader.Site('test', 'Test', url)
+    _refresh(site)
+    before = site.snapshot
+
+    sheets = [frame.copy() for frame in frames]
+    sheets[COST_SHEET] = sheets[COST_SHEET].iloc[:-1]
+    server.payload = dev_source.build_workbook(sheets)
+    _refresh(site)
+
+    after = site.snapshot
+    assert after.df_downtime_partitions is before.df_downtime_partitions
+    assert after.df_stock_alerts is before.df_stock_alerts
+    assert after.df_fuel_efficiency is not before.df_fuel_efficiency
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+import dash
+import pytest
+
+import data_loader
+import server_setup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def unloaded(source, monkeypatch):
+    _, url = source
+    site = data_loader.Site('test', 'Test', url)
+    monkeypatch.setattr(data_loader, 'sites', {'test': site})
+    monkeypatch.setattr(data_loader, 'DEFAULT_SITE_ID', 'test')
+    app = dash.Dash(__name__)
+    app.layout = dash.html.Div()
+    server_setup.configure_server(app)
+    return site, app.server.test_client()
+
+
+def test_healthz_answers_before_data_loads(unloaded):
+    _, client = unloaded
+    response = client.get('/healthz')
+    assert response.status_code == 200 and response.get_json() == {'status': 'ok'}
+
+
+def test_readyz_waits_for_the_first_load(unloaded):
+    site, client = unloaded
+
+    before = client.get('/readyz')
+    assert before.status_code == 503 and not before.get_json()['ready']
+
+    data_loader._refresh_site(site)
+    after = client.get('/readyz')
+    body = after.get_json()
+    assert after.status_code == 200 and body['ready']
+    assert body['sites']['test']['generation'] == site.snapshot.generation
+    assert not body['stale'] and body['data_as_of'] and body['checked_at']
+
+
+def test_readyz_reports_a_failing_refresh_as_stale(unloaded, source, monkeypatch):
+    site, client = unloaded
+    data_loader._refresh_site(site)
+    monkeypatch.setattr(data_loader.fetcher, 'MAX_RETRIES', 0)
+    source[0].fail_rate = 1.0
+    site.last_attempt_time = None
+    data_loader._refresh_site(site)
+
+    body = client.get('/readyz').get_json()
+    assert body['ready'] and body['stale'] and body['error']
+
+
+def test_heavy_modules_stay_off_the_startup_path():
+    # Nothing listens on port 9, so the first refresh fails fast and parses nothing
+    env = dict(os.environ, GRAVITAS_SOURCE_URL='http://127.0.0.1:9/workbook.xlsx', GRAVITAS_CACHE_WARMING='false')
+    check = "import sys, app; print('LOADED', *sorted(m for m in ('plotly.express', 'openpyxl') if m in sys.modules), file=sys.stderr)"
+    result = subprocess.run([sys.executable, '-c', check], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    assert next(line for line in result.stderr.splitlines() if line.startswith('LOADED')) == 'LOADED'
@@ -0,0 +1,57 @@
+import io
+
+import pandas as pd
+import pytest
+
+import data_loader
+import dev_source
+import fetcher
+
+GIDS = list(range(len(dev_source.SHEET_NAMES)))
+
+
+def _site(url):
+    return data_loader.Site('test', 'Test', url, sheet_gids=GIDS)
+
+
+def test_csv_exports_match_workbook(source):
+    server, url = source
+    from_csv = data_loader.fetch_sheets(_site(url))
+    from_xlsx = data_loader.read_workbook(io.BytesIO(server.payload))
+
+    assert server.requests_served == len(GIDS)
+    for name, frame in from_xlsx.items():
+        pd.testing.assert_frame_equal(from_csv[name].reset_index(drop=True), frame.reset_index(drop=True),
+                                      check_dtype=False, obj=name)
+
+
+def test_connections_are_reused_between_fetches(source):
+    server, url = source
+    server.delay = 0.1   # so every request of a fetch is in flight at once
+    pool = fetcher.ConnectionPool()
+    urls = {gid: fetcher.csv_export_url(url, gid) for gid in GIDS}
+
+    fetcher.fetch_all(urls, lambda name, body: len(body), pool=pool)
+    opened = server.connections
+    fetcher.fetch_all(urls, lambda name, body: len(body), pool=pool)
+
+    assert server.connections == opened
+
+
+def test_parse_error_finishes_half_open_trial(source):
+    _, url = source
+    breaker = fetcher.CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    urls = {gid: fetcher.csv_export_url(url, gid) for gid in GIDS}
+
+    def broken(name, body):
+        raise ValueError("unparseable sheet")
+
+    assert breaker.state == 'half-open'
+    with pytest.raises(ValueError):
+        fetcher.fetch_all(urls, broken, breaker=breaker, pool=fetcher.ConnectionPool())
+    assert not breaker.trial_running
+
+    # The next trial is let through and closes the breaker
+    fetcher.fetch_all(urls, lambda name, body: len(body), breaker=breaker, pool=fetcher.ConnectionPool())
+    assert breaker.state == 'closed'
@@ -0,0 +1,52 @@
+import pytest
+
+import data_loader
+import dev_source
+
+
+@pytest.fixture
+def two_sites(source, monkeypatch):
+    _, url = source
+    failing, failing_url = dev_source.serve_in_background(b'unused', fail_rate=1.0)
+    north = data_loader.Site.from_config({'id': 'north', 'source_url': url, 'meters': {'1001': 'Block A'},
+                                          'schedule': {'0': {'80kva': 10}}})
+    south = data_loader.Site.from_config({'id': 'south', 'source_url': failing_url})
+    monkeypatch.setattr(data_loader, 'sites', {'north': north, 'south': south})
+    monkeypatch.setattr(data_loader, 'DEFAULT_SITE_ID', 'north')
+    monkeypatch.setattr(data_loader, '_refresh_executor', None)
+    monkeypatch.setattr(data_loader.fetcher, 'MAX_RETRIES', 0)
+    yield north, south
+    failing.shutdown()
+    failing.server_close()
+
+
+def test_site_config_is_parsed():
+    site = data_loader.Site.from_config({'id': 'east', 'sheet_id': 'abc', 'meters': {'1001': 'Block A', 'X-7': 'Kiosk'},
+                                         'schedule': {'6': {'200kva': 7}}})
+
+    assert site.source_url == 'https://docs.google.com/spreadsheets/d/abc/export?format=xlsx'
+    assert site.meter_to_name == {1001: 'Block A', 'X-7': 'Kiosk'}
+    assert site.schedule == {6: {'200kva': 7}}
+
+
+def test_failing_site_does_not_hold_up_the_others(two_sites):
+    north, south = two_sites
+
+    data_loader.load_all_data()
+
+    assert north.snapshot.as_of is not None and north.last_error is None
+    assert south.snapshot.as_of is None and south.last_error is not None
+    statuses = data_loader.sites_status()
+    assert not statuses['north']['stale'] and statuses['south']['stale']
+
+
+def test_snapshots_are_per_site(two_sites):
+    north, south = two_sites
+
+    data_loader.load_all_data()
+
+    assert data_loader.get_snapshot('north') is north.snapshot
+    assert data_loader.get_snapshot('south') is south.snapshot
+    assert data_loader.get_snapshot('unknown') is north.snapshot
+    assert north.snapshot.meter_to_name == {1001: 'Block A'}
+    assert south.snapshot.power_df.empty and not north.snapshot.power_df.empty
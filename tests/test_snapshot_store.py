@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import snapshot_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _stock():
+    # A free-form sheet: Remarks is empty in January, Qty mixes numbers and text in February
+    return pd.DataFrame({
+        'Year': ['2025', '2025', '2025'],
+        'Month': ['January', 'February', 'February'],
+        'Remarks': [None, 'late', None],
+        'Qty': [1, '2 boxes', 3],
+    })
+
+
+def test_mixed_partitions_round_trip(store):
+    frames = {'df_stock': _stock()}
+    key = snapshot_store.persist('site', frames, datetime(2025, 3, 1, 12), 1)
+
+    loaded, manifest = snapshot_store.load('site', key)
+
+    assert len(manifest['tables']['df_stock']['partitions']) == 2
+    stock = loaded['df_stock']
+    assert stock['Remarks'].tolist() == [None, 'late', None]
+    assert stock['Qty'].tolist() == ['1', '2 boxes', '3']
+
+
+def test_named_index_round_trips(store):
+    events = pd.DataFrame({'Year': ['2025', '2025'], 'Month': ['January', 'February'], 'Hours': [1.5, 2.0]},
+                          index=pd.DatetimeIndex(['2025-01-03', '2025-02-07'], name='Start'))
+    key = snapshot_store.persist('site', {'events': events}, datetime(2025, 3, 1, 12), 1)
+
+    loaded, _ = snapshot_store.load('site', key)
+
+    pd.testing.assert_frame_equal(loaded['events'], events, check_index_type=False, check_freq=False)
+
+
+def test_unchanged_data_stores_nothing(store):
+    frames = {'df_stock': _stock()}
+    assert snapshot_store.persist('site', frames, datetime(2025, 3, 1, 12), 1) is not None
+    assert snapshot_store.persist('site', frames, datetime(2025, 3, 1, 13), 2) is None
+
+
+def test_changed_month_stores_one_partition(store):
+    first = _stock()
+    snapshot_store.persist('site', {'df_stock': first}, datetime(2025, 3, 1, 12), 1)
+    second = first.copy()
+    second.loc[2, 'Remarks'] = 'damaged'
+    snapshot_store.persist('site', {'df_stock': second}, datetime(2025, 3, 1, 13), 2)
+
+    (newer, _), (older, _) = snapshot_store.list_snapshots('site')
+    new_parts = snapshot_store._read_manifest(snapshot_store._site_dir('site', 'manifests', f"{newer}.json"))['tables']['df_stock']['partitions']
+    old_parts = snapshot_store._read_manifest(snapshot_store._site_dir('site', 'manifests', f"{older}.json"))['tables']['df_stock']['partitions']
+    assert new_parts[0] == old_parts[0] and new_parts[1] != old_parts[1]
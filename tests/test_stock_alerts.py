@@ -0,0 +1,64 @@
+import pandas as pd
+
+import analytics
+
+MONTHS = ['January', 'February', 'March', 'April']
+
+
+def _sheet(levels, received=None):
+    """Stock sheet rows for one 80kva filter type per entry of `levels` ({filter type: month-end levels})."""
+    rows = []
+    for filter_type, stock in levels.items():
+        for i, level in enumerate(stock):
+            rows.append({'Year': '2025', 'Month': MONTHS[i], 'Generator_Size': '80kva', 'Filter_Type': filter_type,
+                         'Closing Stock': level, 'Received': (received or {}).get((filter_type, i), 0)})
+    return pd.DataFrame(rows)
+
+
+def _alerts(levels, received=None):
+    return analytics.compute_stock_alerts(_sheet(levels, received)).xs('80kva')
+
+
+def test_status_thresholds():
+    # Reorder point is use over lead time plus safety: 1.5 months
+    alerts = _alerts({
+        'Oil': [20, 18, 16, 14],        # 2 a month, 7 months left
+        'Fuel': [9, 7, 5, 3],           # 2 a month, exactly at the reorder point
+        'Air': [10, 7, 4],              # 3 a month, below it
+        'Water': [5, 2, 0],
+        'Spare': [8, 8, 8],             # not used
+    })
+
+    assert alerts['Status'].to_dict() == {'Air': 'Reorder', 'Fuel': 'Reorder', 'Oil': 'OK', 'Spare': 'OK', 'Water': 'Out of stock'}
+    assert alerts.loc['Oil', 'Months Left'] == 7
+    assert pd.isna(alerts.loc['Spare', 'Months Left'])
+
+
+def test_reorder_quantity_tops_up_to_cover():
+    alerts = _alerts({'Air': [10, 7, 4], 'Oil': [20, 18, 16, 14]})
+
+    assert alerts.loc['Air', 'Reorder Qty'] == 5    # 3 months of use at 3 a month, 4 in hand
+    assert alerts.loc['Oil', 'Reorder Qty'] == 0
+
+
+def test_received_stock_counts_as_use():
+    # 10 in hand, 5 delivered, 12 left at month end: 3 used
+    alerts = _alerts({'Oil': [10, 12]}, received={('Oil', 1): 5})
+
+    assert alerts.loc['Oil', 'Monthly Use'] == 3
+
+
+def test_depletion_date_runs_from_the_next_month():
+    alerts = _alerts({'Oil': [20, 18, 16, 14]})
+
+    assert alerts.loc['Oil', 'Depletion Date'] == (pd.Timestamp('2025-05-01') + pd.Timedelta(days=7 * 30.44)).normalize()
+
+
+def test_sheet_without_levels_gives_no_alerts():
+    sheet = _sheet({'Oil': [1, 2]}).drop(columns='Closing Stock')
+    assert analytics.compute_stock_alerts(sheet).empty
+
+
+def test_single_month_has_no_rate():
+    alerts = _alerts({'Oil': [4]})
+    assert alerts.loc['Oil', 'Monthly Use'] == 0 and alerts.loc['Oil', 'Status'] == 'OK'
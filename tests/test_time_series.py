@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import analytics
+
+
+@pytest.fixture(scope='module')
+def series():
+    # One hour a day for one generator, all of 2024 and the first half of 2025
+    days = pd.date_range('2024-01-01', '2025-06-30', freq='D')
+    run_time = pd.DataFrame({'Date': days, 'Generator': '80kva', 'Hours Operated': 1.0})
+    return analytics.resample_series(run_time, 'Date', 'Generator', 'Hours Operated')
+
+
+def _select(series, granularity, **filters):
+    return analytics.select_series(series, granularity, key_col='Generator', **filters)
+
+
+def test_every_granularity_covers_every_day(series):
+    for granularity in series:
+        assert _select(series, granularity)['Hours Operated'].sum() == 547
+
+
+@pytest.mark.parametrize('granularity', ['day', 'week', 'month', 'quarter'])
+def test_month_filter_keeps_exactly_the_selected_days(series, granularity):
+    selected = _select(series, granularity, years=['2025'], months=['February'])
+    assert selected['Hours Operated'].sum() == 28
+
+
+def test_quarter_sums_only_the_selected_months(series):
+    selected = _select(series, 'quarter', months=['February', 'May'])
+
+    assert selected['Period'].tolist() == [pd.Timestamp(q) for q in ['2024-01-01', '2024-04-01', '2025-01-01', '2025-04-01']]
+    assert selected['Hours Operated'].tolist() == [29, 31, 28, 31]
+
+
+def test_week_straddling_the_year_is_split_by_the_year_filter(series):
+    selected = _select(series, 'week', years=['2025'])
+
+    # 30 Dec 2024 is a Monday; only the 2025 days of that week are counted
+    assert selected['Period'].iloc[0] == pd.Timestamp('2024-12-30')
+    assert selected['Hours Operated'].iloc[0] == 5
+
+
+def test_unfiltered_quarters_are_the_cached_series(series):
+    assert _select(series, 'quarter') is series['quarter']
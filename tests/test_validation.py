@@ -0,0 +1,20 @@
+import io
+
+import data_loader
+import dev_source
+
+COST_SHEET = dev_source.SHEET_NAMES.index('Cost')
+
+
+def test_unknown_generator_rows_are_kept(frames, capsys):
+    sheets = [frame.copy() for frame in frames]
+    cost = sheets[COST_SHEET]
+    cost.loc[cost.index[:5], 'Generator'] = 'New 100KVA'
+
+    baseline = data_loader.read_workbook(io.BytesIO(dev_source.build_workbook(frames)))
+    parsed = data_loader.read_workbook(io.BytesIO(dev_source.build_workbook(sheets)))
+
+    assert parsed['df_cost']['Amount (NGN)'].sum() == baseline['df_cost']['Amount (NGN)'].sum()
+    assert (parsed['df_cost']['Generator'] == 'new 100kva').sum() == 5
+    assert not (parsed['df_quarantine']['Sheet'] == 'df_cost').any()
+    assert 'new 100kva' in capsys.readouterr().out
@@ -0,0 +1,213 @@
+"""Cache warming for the main dashboard view (update_chart).
+
+update_chart's outputs are kept in memory per site, data generation and
+sidebar filters, so a view is computed once per generation. Every request
+also counts its filter combination. When a site publishes a new generation,
+the common views and the MOST_REQUESTED combinations are computed for it on
+a background thread. The common views are the default year on its own, with
+each single month and with each generator. The first user after a refresh
+then gets a cached view instead of paying for it.
+
+With gunicorn the master warms the cache before it (re)forks the workers, so
+every worker starts with it. Request counts are batched in memory and added
+every FLUSH_SECONDS to a small diskcache store that all workers share, or
+stay in memory without diskcache.
+"""
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent import futures
+
+import data_loader
+import layout
+import memory
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# --- Cache Warming Configuration ---
+ENABLED = os.environ.get("GRAVITAS_CACHE_WARMING", "true").lower() != "false"
+CACHE_SIZE = int(os.environ.get("GRAVITAS_CHART_CACHE_SIZE", 48))           # chart results kept in memory
+MOST_REQUESTED = int(os.environ.get("GRAVITAS_WARM_MOST_REQUESTED", 12))    # popular combinations warmed per generation
+COUNTS_DIR = os.environ.get("GRAVITAS_WARM_COUNTS_DIR", os.path.join(tempfile.gettempdir(), "gravitas-warmup"))
+TRACKED = 500          # distinct combinations whose request counts are kept
+WIDTH_STEP = 200       # plot widths are rounded up to this, so similar windows share results
+WARM_TIMEOUT = 300     # seconds the gunicorn master waits for warming before forking workers
+FLUSH_SECONDS = 30     # request counts are batched in memory this long before going to the shared store
+
+_compute = None
+_results = memory.LRUCache('charts', CACHE_SIZE)
+_lock = threading.Lock()
+_local_counts = Counter()     # every count without diskcache, else the ones not yet flushed
+_last_flush = time.monotonic()
+_executor = None
+_pending = []
+
+
+def _open_counts():
+    if diskcache is None:
+        return None
+    try:
+        return diskcache.Cache(COUNTS_DIR)
+    except Exception as e:
+        print(f"Cache warming: counting requests in memory ({e})")
+        return None
+
+
+_counts_store = _open_counts()
+
+
+def chart_filters(locations, months, years, generators, filter_types, granularity, plot_width):
+    """update_chart's sidebar state as a hashable key.
+
+    The plot width only sets how far day/week/quarter series are downsampled,
+    so monthly views share one key (and the warmed result) at every width.
+    """
+    granularity = granularity or 'month'
+    if granularity != 'month' and plot_width:
+        width = math.ceil(plot_width / WIDTH_STEP) * WIDTH_STEP
+    else:
+        width = None
+    return (tuple(locations or ()), tuple(months or ()), tuple(years or ()), tuple(generators or ()),
+            tuple(filter_types or ()), granularity, width)
+
+
+# --- Request Counts ---
+def record(site_id, filters):
+    """Count a request; with diskcache the counts are written to the shared store every FLUSH_SECONDS."""
+    with _lock:
+        _local_counts[(site_id, filters)] += 1
+        due = _counts_store is not None and time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def flush():
+    """Add the counts batched in this process to the shared store."""
+    global _last_flush
+    if _counts_store is None:
+        return
+    with _lock:
+        batch = Counter(_local_counts)
+        _local_counts.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return
+    try:
+        with _counts_store.transact():
+            counts = _counts_store.get('counts', Counter())
+            counts.update(batch)
+            if len(counts) > 2 * TRACKED:
+                counts = Counter(dict(counts.most_common(TRACKED)))
+            _counts_store.set('counts', counts)
+    except Exception as e:
+        # Counting only steers warming; it must never fail a request
+        print(f"Cache warming: could not record requests ({e})")
+
+
+def most_requested(site_id, n):
+    """The site's `n` most requested filter combinations, most requested first."""
+    with _lock:
+        counts = Counter(_local_counts)
+    if _counts_store is not None:
+        counts.update(_counts_store.get('counts', Counter()))
+    return [filters for (site, filters), _ in counts.most_common() if site == site_id][:n]
+
+
+# --- Results ---
+def _cached(snap, filters, set_progress=lambda value: None):
+    key = (snap.site_id, snap.generation, snap.as_of, filters)
+    outputs = _results.get(key)
+    if outputs is not None:
+        return outputs
+
+    locations, months, years, generators, filter_types, granularity, width = filters
+    outputs = _compute(snap, list(locations), list(months), list(years), list(generators), list(filter_types),
+                       granularity, width, set_progress)
+
+    _results.put(key, outputs)
+    return outputs
+
+
+def chart(snap, filters, set_progress=lambda value: None):
+    """update_chart's outputs for `snap` and `filters` (from chart_filters), counting the request."""
+    record(snap.site_id, filters)
+    return _cached(snap, filters, set_progress)
+
+
+# --- Warming ---
+def common_views(snap):
+    """The default view (latest year) on its own, with each single month and with each generator."""
+    options = layout.filter_options(snap)
+    years = (options['year'][0]['value'],) if options['year'] else ()
+    views = [((), (), years, (), (), 'month', None)]
+    views += [((), (option['value'],), years, (), (), 'month', None) for option in options['month']]
+    views += [((), (), years, (option['value'],), (), 'month', None) for option in options['generator']]
+    return views
+
+
+def warm(site_id):
+    """Compute the common and most requested views for a site's live snapshot."""
+    snap = data_loader.get_snapshot(site_id)
+    if snap.as_of is None:
+        return
+    views = common_views(snap)
+    views += [filters for filters in most_requested(site_id, MOST_REQUESTED) if filters not in views]
+
+    started = time.perf_counter()
+    warmed = 0
+    for filters in views:
+        if data_loader.get_snapshot(site_id).generation != snap.generation:
+            break  # a newer generation landed and scheduled its own warming
+        try:
+            _cached(snap, filters)
+            warmed += 1
+        except Exception as e:
+            print(f"[{site_id}] Cache warming failed for {filters}: {e}")
+    print(f"[{site_id}] Warmed {warmed} chart views for generation {snap.generation} in {time.perf_counter() - started:.1f}s")
+
+
+def schedule(site):
+    """Warm `site`'s new generation in the background (a data_loader publish hook)."""
+    global _executor
+    if not ENABLED or _compute is None:
+        return
+    with _lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-warm")
+        _pending.append(_executor.submit(warm, site.id))
+
+
+def wait(timeout=WARM_TIMEOUT):
+    """Block until scheduled warming has finished, or `timeout` seconds."""
+    with _lock:
+        pending = list(_pending)
+        _pending.clear()
+    futures.wait(pending, timeout)
+
+
+def register(compute):
+    """Use `compute` (callbacks.chart_outputs) for chart results and warm every site that's already loaded."""
+    global _compute
+    _compute = compute
+    if schedule not in data_loader.publish_hooks:
+        data_loader.publish_hooks.append(schedule)
+    for site in data_loader.sites.values():
+        if site.snapshot is not None:
+            schedule(site)
+
+
+def after_fork():
+    """Reset process-local state in a freshly forked worker (the warm results are kept)."""
+    global _lock, _executor, _last_flush
+    _lock = threading.Lock()
+    _executor = None
+    _pending.clear()
+    if _counts_store is not None:
+        _local_counts.clear()   # the master's unflushed counts would be flushed once per worker
+        _last_flush = time.monotonic()
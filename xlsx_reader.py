@@ -0,0 +1,92 @@
+import pandas as pd
+
+
+class StreamingWorkbook:
+    """Row-streaming replacement for the part of `pd.ExcelFile` that data_loader uses.
+
+    `pd.ExcelFile.parse` builds a list of every row of a sheet before creating
+    the DataFrame. Here the workbook is opened in openpyxl's read-only mode and
+    each sheet is read row by row into per-column lists, keeping only the
+    requested columns, so peak memory follows the size of the parsed output
+    rather than the size of the whole workbook.
+    """
+
+    def __init__(self, source):
+        import openpyxl  # only needed once a refresh runs, so it stays off the startup path
+
+        self.book = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+
+    @property
+    def sheet_names(self):
+        return self.book.sheetnames
+
+    def parse(self, sheet, usecols=None):
+        """Read one sheet (by index or name) into a DataFrame.
+
+        Header handling follows pandas: blank headers become 'Unnamed: <n>',
+        duplicates get a '.<n>' suffix and fully blank rows are skipped.
+        `usecols` is an optional list of header names (matched after
+        stripping whitespace); names not present in the sheet are ignored.
+        """
+        ws = self.book.worksheets[sheet] if isinstance(sheet, int) else self.book[sheet]
+        rows = ws.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        names = _header_names(header)
+
+        if usecols is None:
+            keep = list(range(len(names)))
+        else:
+            wanted = {str(c).strip() for c in usecols}
+            keep = [i for i, name in enumerate(names) if str(name).strip() in wanted]
+
+        columns = [[] for _ in keep]
+        for row in rows:
+            if row is None or all(v is None or v == '' for v in row):
+                continue
+            width = len(row)
+            for out, i in zip(columns, keep):
+                out.append(_convert_cell(row[i]) if i < width else None)
+
+        frame = pd.DataFrame({names[i]: values for i, values in zip(keep, columns)})
+        return frame.infer_objects()
+
+    def close(self):
+        self.book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _header_names(header):
+    # Drop trailing blank header cells (formatting-only columns)
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or value == '' else value
+        if isinstance(name, float) and name.is_integer():
+            name = int(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _convert_cell(value):
+    # Same conversions pandas applies to openpyxl cells
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value